@@ -0,0 +1,72 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.test.simple import DjangoTestSuiteRunner
+
+from chroma_core.lib.cache import ObjectCache
+from chroma_core.models import ManagedFilesystem, ManagedMgs, ManagedOst
+from benchmark.generic import GenericBenchmark
+
+
+class AvailableActionsBenchmark(GenericBenchmark):
+    """Time the JobScheduler available_transitions and available_jobs calls which the
+    action API makes for each page of visible objects, for a list of hosts and OSTs."""
+
+    def __init__(self, objects=1000, hosts=50, repeat=5):
+        self.object_count = objects
+        self.host_count = hosts
+        self.repeat = repeat
+        self.test_runner = DjangoTestSuiteRunner()
+        self.prepare()
+
+    def prepare(self):
+        from south.management.commands import patch_for_test_db_setup
+        from tests.unit.chroma_core.helpers import load_default_profile, synthetic_host, synthetic_volume_full
+
+        self.test_runner.setup_test_environment()
+        # This is necessary to ensure that we use django.core.syncdb()
+        # instead of south's hacked syncdb()
+        patch_for_test_db_setup()
+        self.old_db_config = self.test_runner.setup_databases()
+
+        load_default_profile()
+        hosts = [synthetic_host("bench%04d" % n) for n in range(self.host_count)]
+        mgs, mounts = ManagedMgs.create_for_volume(synthetic_volume_full(hosts[0]).id, name="MGS")
+        fs = ManagedFilesystem.objects.create(mgs=mgs, name="benchfs")
+        osts = [
+            ManagedOst.create_for_volume(synthetic_volume_full(hosts[n % len(hosts)]).id, filesystem=fs)[0]
+            for n in range(self.object_count - len(hosts))
+        ]
+
+        self.object_list = [(ContentType.objects.get_for_model(obj).id, obj.id) for obj in hosts + osts]
+
+    def _timed(self, label, fn):
+        intervals = []
+        for _ in range(self.repeat):
+            start = time.time()
+            fn()
+            intervals.append(time.time() - start)
+        print("%s: best %.3fs, mean %.3fs" % (label, min(intervals), sum(intervals) / len(intervals)))
+
+    def run(self):
+        from chroma_core.services.job_scheduler.job_scheduler import JobScheduler
+
+        ObjectCache.clear()
+        job_scheduler = JobScheduler()
+
+        print("%d objects" % len(self.object_list))
+        self._timed("available_transitions", lambda: job_scheduler.available_transitions(self.object_list))
+        self._timed("available_jobs", lambda: job_scheduler.available_jobs(self.object_list))
+        self._timed(
+            "available_transitions one object at a time",
+            lambda: [job_scheduler.available_transitions([obj]) for obj in self.object_list],
+        )
+
+    def cleanup(self):
+        self.test_runner.teardown_databases(self.old_db_config)
+        self.test_runner.teardown_test_environment()
@@ -0,0 +1,136 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import hashlib
+import json
+import threading
+import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+import settings
+from chroma_core.plugins import block_devices
+from benchmark.generic import GenericBenchmark
+
+
+class AggregatorHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        etag = self.server.etag
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.payload)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(self.server.payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DeviceAggregatorBenchmark(GenericBenchmark):
+    """Serve a synthetic device aggregator payload over HTTP and time get_devices for every
+    host in it, as the linux plugin calls it when all the hosts start agent sessions, against
+    fetching and parsing the whole payload for each host."""
+
+    def __init__(self, hosts=500, devices=100):
+        self.fqdns = ["oss%04d.example.com" % n for n in range(hosts)]
+        self.device_count = devices
+
+        self.server = HTTPServer(("127.0.0.1", 0), AggregatorHandler)
+        self.server.use_etag = False
+        self._set_payload(0)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.url = "http://127.0.0.1:%s/device-aggregator" % self.server.server_port
+
+    def _host_devices(self, generation, fqdn):
+        devs = {}
+        for n in range(self.device_count):
+            major_minor = "8:%d" % n
+            devs[major_minor] = {
+                "major_minor": major_minor,
+                "path": "/dev/sd%d" % n,
+                "paths": ["/dev/sd%d" % n, "/dev/disk/by-id/scsi-%s-%d-%d" % (fqdn, n, generation)],
+                "serial_80": "SERIAL80-%d" % n,
+                "serial_83": "SERIAL83-%s-%d" % (fqdn, n),
+                "size": 1073741824,
+                "filesystem_type": None,
+                "parent": None,
+                "partition_number": None,
+                "is_ro": False,
+            }
+
+        return {
+            "devs": devs,
+            "vgs": {},
+            "lvs": {},
+            "zfspools": {},
+            "zfsdatasets": {},
+            "local_fs": {},
+            "mds": {},
+            "mpath": {},
+        }
+
+    def _set_payload(self, generation):
+        payload = json.dumps(dict((fqdn, self._host_devices(generation, fqdn)) for fqdn in self.fqdns))
+        self.server.payload = payload
+        self.server.etag = '"%s"' % hashlib.sha1(payload).hexdigest() if self.server.use_etag else None
+
+    def _uncached(self, fqdn):
+        return json.loads(requests.get(self.url).text)[fqdn]
+
+    def _time(self, label, get_devices):
+        begin = time.time()
+        for fqdn in self.fqdns:
+            assert get_devices(fqdn)["devs"]
+        interval = time.time() - begin
+
+        print(
+            "%s: %.2fs for %d hosts (%.2fms per host)"
+            % (label, interval, len(self.fqdns), interval * 1000 / len(self.fqdns))
+        )
+
+    def run(self):
+        url = settings.DEVICE_AGGREGATOR_URL
+        settings.DEVICE_AGGREGATOR_URL = self.url
+        try:
+            self._run()
+        finally:
+            settings.DEVICE_AGGREGATOR_URL = url
+            block_devices._snapshot = None
+
+    def _run(self):
+        print("%d hosts, %d bytes of aggregator content" % (len(self.fqdns), len(self.server.payload)))
+
+        self._time("parse per host", self._uncached)
+
+        block_devices._snapshot = None
+        self._time("snapshot", block_devices.get_devices)
+        self._set_payload(1)
+        self._time("snapshot, content changed before first host", block_devices.get_devices)
+
+        self.server.use_etag = True
+        self._set_payload(2)
+        self._time("snapshot with ETag", block_devices.get_devices)
+
+        max_age = settings.DEVICE_AGGREGATOR_MAX_AGE
+        self._set_payload(3)
+        self._time(
+            "snapshot reused for %ss, as by session starts" % max_age,
+            lambda fqdn: block_devices.get_devices(fqdn, max_age),
+        )
+
+    def cleanup(self):
+        self.server.shutdown()
+        self.server.server_close()
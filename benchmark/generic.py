@@ -3,5 +3,14 @@
 # license that can be found in the LICENSE file.
 
 
+import resource
+
+
+def rss_bytes():
+    "Return the resident set size of this process."
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
 class GenericBenchmark(object):
     pass
@@ -0,0 +1,107 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import random
+import time
+import Queue
+
+import gevent
+import gevent.event
+
+from chroma_core.services.http_agent.queues import HostQueueCollection
+from benchmark.generic import GenericBenchmark, rss_bytes
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100.0))
+    return sorted_values[index]
+
+
+class HttpAgentTxBenchmark(GenericBenchmark):
+    """Simulate many agents long-polling HostQueueCollection in the way that
+    MessageView.get does, while messages are sent to random hosts, and report
+    the delivery latency and the memory used per waiting agent."""
+
+    def __init__(self, agents=1000, rate=1000, duration=10, batch=100, poll_timeout=30):
+        self.agent_count = agents
+        self.rate = rate
+        self.duration = duration
+        self.batch = batch
+        self.poll_timeout = poll_timeout
+
+        self.queues = HostQueueCollection()
+        self.latencies = []
+        self.responses = 0
+        self._stopping = gevent.event.Event()
+
+    def _agent(self, fqdn):
+        queues = self.queues.get(fqdn)
+        while not self._stopping.is_set():
+            with queues.tx_lock:
+                if not queues.wait_tx(self.poll_timeout):
+                    continue
+
+                received_at = time.time()
+                for _ in range(self.batch):
+                    try:
+                        message = queues.get_tx()
+                    except Queue.Empty:
+                        break
+                    self.latencies.append(received_at - message["body"])
+            self.responses += 1
+
+    def _send(self, fqdns):
+        interval = 0.01
+        per_interval = max(1, int(self.rate * interval))
+        end = time.time() + self.duration
+        sent = 0
+        while time.time() < end:
+            for fqdn in random.sample(fqdns, min(per_interval, len(fqdns))):
+                self.queues.send(
+                    {
+                        "fqdn": fqdn,
+                        "type": "DATA",
+                        "plugin": "bench",
+                        "session_id": None,
+                        "session_seq": None,
+                        "body": time.time(),
+                    }
+                )
+                sent += 1
+            gevent.sleep(interval)
+        return sent
+
+    def run(self):
+        fqdns = ["agent%04d.bench" % i for i in range(self.agent_count)]
+
+        rss_before = rss_bytes()
+        agents = [gevent.spawn(self._agent, fqdn) for fqdn in fqdns]
+        # Let every agent reach its long-poll wait
+        gevent.sleep(1)
+        rss_waiting = rss_bytes()
+
+        start = time.time()
+        sent = self._send(fqdns)
+        # Allow the final messages to be delivered
+        gevent.sleep(1)
+        interval = time.time() - start
+
+        self._stopping.set()
+        for fqdn in fqdns:
+            self.queues.get(fqdn)._tx_ready.set()
+        gevent.joinall(agents, timeout=5)
+
+        latencies = sorted(self.latencies)
+        print(
+            "%d agents: %d messages sent, %d delivered in %d responses over %.1fs"
+            % (self.agent_count, sent, len(latencies), self.responses, interval)
+        )
+        print(
+            "delivery latency: p50 %.2fms, p99 %.2fms, max %.2fms"
+            % (_percentile(latencies, 50) * 1000, _percentile(latencies, 99) * 1000, (latencies or [0])[-1] * 1000)
+        )
+        print("memory per waiting agent: %.1f KB" % ((rss_waiting - rss_before) / 1024.0 / self.agent_count))
@@ -0,0 +1,92 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import itertools
+import json
+import time
+
+from chroma_core.models import LogMessage, AlertState, ClientConnectEvent, SyslogEvent
+from chroma_core.services.syslog import ingest_log_lines
+from chroma_core.services.syslog.parser import LogMessageParser, find_one_in_many
+from benchmark.generic import GenericBenchmark
+
+SAMPLE_MESSAGES = [
+    "kernel: eth0: link up, 1000Mbps, full-duplex",
+    " Lustre: 5629:0:(ldlm_lib.c:877:target_handle_connect()) lustre-MDT0000: connection from 26959b68-1208-1fca-1f07-da2dc872c55f@192.168.122.218@tcp t0 exp 0000000000000000 cur 1317994929 last 0",
+    " Lustre: 5629:0:(sec.c:1474:sptlrpc_import_sec_adapt()) import lustre-MDT0000->NET_0x20000c0a87ada_UUID netid 20000: select flavor null",
+    "[1234.5] LustreError: 11-0: lustre-OST0000-osc-MDT0000: Communicating with 10.0.0.1@tcp, operation ost_connect failed with -16.",
+    "systemd[1]: Started Session 42 of user root.",
+    "[1234.6] Lustre: lustre-OST0000: Recovery over after 0:30, of 8 clients 8 recovered and 0 were evicted.",
+    "sshd[1234]: Accepted publickey for root from 10.0.0.2 port 52122 ssh2",
+    "crond[2345]: (root) CMD (run-parts /etc/cron.hourly)",
+]
+
+
+class JournalIngestBenchmark(GenericBenchmark):
+    """Replay journal entries through the systemd_journal service's classification, and
+    optionally its database ingestion, reporting lines per second."""
+
+    def __init__(self, journal=None, lines=1000000, batch=100, fqdn=None):
+        self.journal = journal
+        self.lines = lines
+        self.batch = batch
+        self.fqdn = fqdn
+
+    def _log_lines(self):
+        """The captured journal, one JSON entry (as sent by the agent) or plain message per line,
+        or sample messages when there is none"""
+        if self.journal:
+            with open(self.journal) as f:
+                for line in itertools.islice(f, self.lines):
+                    line = line.rstrip("\n")
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield {"message": line}
+        else:
+            for message in itertools.islice(itertools.cycle(SAMPLE_MESSAGES), self.lines):
+                yield {"message": message}
+
+    def _report(self, label, count, interval):
+        print("%s: %d lines in %.2fs, %.0f lines/s" % (label, count, interval, count / interval))
+
+    def run_classify(self):
+        messages = [log_line["message"] for log_line in self._log_lines()]
+        parser = LogMessageParser()
+
+        begin = time.time()
+        for message in messages:
+            LogMessage.get_message_class(message)
+            find_one_in_many(message, parser.selectors.keys())
+        self._report("regex per class, then find per selector", len(messages), time.time() - begin)
+
+        begin = time.time()
+        for message in messages:
+            parser.classify(message)
+        self._report("compiled classifier", len(messages), time.time() - begin)
+
+    def run_ingest(self):
+        """Ingest the journal into the database in batches, as the service does, then remove it"""
+        defaults = {"severity": 6, "facility": 0, "source": "kernel", "datetime": "2018-01-01T00:00:00.000000+00:00"}
+        log_lines = [dict(defaults, **log_line) for log_line in self._log_lines()]
+        parser = LogMessageParser()
+        last_log_message = LogMessage.objects.order_by("-id").values_list("id", flat=True)[:1]
+        last_event = AlertState.objects.order_by("-id").values_list("id", flat=True)[:1]
+        last_log_message = last_log_message[0] if last_log_message else 0
+        last_event = last_event[0] if last_event else 0
+
+        begin = time.time()
+        for i in range(0, len(log_lines), self.batch):
+            ingest_log_lines(parser, self.fqdn, log_lines[i : i + self.batch])
+        self._report("ingested in batches of %d" % self.batch, len(log_lines), time.time() - begin)
+
+        LogMessage.objects.filter(id__gt=last_log_message).delete()
+        for event_class in [ClientConnectEvent, SyslogEvent]:
+            event_class.objects.filter(id__gt=last_event).delete()
+
+    def run(self):
+        self.run_classify()
+        if self.fqdn:
+            self.run_ingest()
@@ -0,0 +1,92 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import random
+import time
+
+from chroma_core.models import StateLock
+from chroma_core.services.job_scheduler.command_plan import CommandPlan
+from chroma_core.services.job_scheduler.lock_cache import LockCache
+from benchmark.generic import GenericBenchmark
+
+
+class SyntheticJob(object):
+    def __init__(self, id):
+        self.id = id
+
+
+class SyntheticItem(object):
+    def __init__(self, id):
+        self.id = id
+
+    def __str__(self):
+        return "item %s" % self.id
+
+
+class LockCacheBenchmark(GenericBenchmark):
+    """Load a LockCache with synthetic StateLocks and time the operations which
+    command planning and job completion perform on it."""
+
+    def __init__(self, locks=10000, items=500, reads_per_job=2, seed=0):
+        self.lock_count = locks
+        self.item_count = items
+        self.reads_per_job = reads_per_job
+        self.random = random.Random(seed)
+
+    def _job_locks(self, job, items):
+        locks = [StateLock(job=job, locked_item=self.random.choice(items), write=True)]
+        for _ in range(self.reads_per_job):
+            locks.append(StateLock(job=job, locked_item=self.random.choice(items), write=False))
+        return locks
+
+    def _timed(self, label, count, fn):
+        start = time.time()
+        fn()
+        interval = time.time() - start
+        print("%s: %d in %.3f sec (%.1f/sec)" % (label, count, interval, count / interval if interval else 0))
+
+    def run(self):
+        # Don't publish synthetic locks to the lock change receivers
+        receivers = LockCache.lock_change_receivers
+        LockCache.lock_change_receivers = []
+        try:
+            self._run()
+        finally:
+            LockCache.lock_change_receivers = receivers
+
+    def _run(self):
+        lock_cache = LockCache()
+        command_plan = CommandPlan(lock_cache, None)
+        items = [SyntheticItem(id) for id in range(self.item_count)]
+        job_count = self.lock_count // (self.reads_per_job + 1)
+        jobs = [SyntheticJob(id) for id in range(1, job_count + 1)]
+
+        def plan():
+            for job in jobs:
+                locks = self._job_locks(job, items)
+                command_plan._create_dependencies(job, locks)
+                for lock in locks:
+                    lock_cache.add(lock)
+
+        def expected_states():
+            for _ in range(100):
+                lock_cache.get_write_by_locked_item()
+
+        def latest_writes():
+            for job in jobs:
+                for item in self.random.sample(items, 10):
+                    lock_cache.get_latest_write(item, not_job=job)
+
+        def complete():
+            for job in jobs:
+                lock_cache.remove_job(job)
+
+        print(
+            "%d jobs holding %d locks on %d items" % (job_count, job_count * (self.reads_per_job + 1), self.item_count)
+        )
+        self._timed("planned jobs", job_count, plan)
+        self._timed("get_write_by_locked_item", 100, expected_states)
+        self._timed("get_latest_write", job_count * 10, latest_writes)
+        self._timed("completed jobs", job_count, complete)
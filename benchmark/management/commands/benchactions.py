@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.available_actions import AvailableActionsBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--objects", type=int, default=1000, help="number of hosts and OSTs to query (default: 1000)"),
+        make_option("--hosts", type=int, default=50, help="number of those objects which are hosts (default: 50)"),
+        make_option("--repeat", type=int, default=5, help="times to repeat each query (default: 5)"),
+    )
+    help = "Benchmark the available transitions and jobs queries for a page of objects"
+
+    def handle(self, *args, **kwargs):
+        bench = AvailableActionsBenchmark(objects=kwargs["objects"], hosts=kwargs["hosts"], repeat=kwargs["repeat"])
+        bench.run()
+        bench.cleanup()
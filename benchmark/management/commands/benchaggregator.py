@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.device_aggregator import DeviceAggregatorBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--hosts", type=int, default=500, help="hosts in the aggregator content (default: 500)"),
+        make_option("--devices", type=int, default=100, help="block devices per host (default: 100)"),
+    )
+    help = "Benchmark fetching each host's devices from the device aggregator"
+
+    def handle(self, *args, **kwargs):
+        bench = DeviceAggregatorBenchmark(hosts=kwargs["hosts"], devices=kwargs["devices"])
+        bench.run()
+        bench.cleanup()
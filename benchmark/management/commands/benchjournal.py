@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.journal_ingest import JournalIngestBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--journal", help="captured journal: JSON entries or plain messages, one per line"),
+        make_option("--lines", type=int, default=1000000, help="number of lines to replay (default: 1000000)"),
+        make_option("--batch", type=int, default=100, help="lines per ingested batch (default: 100)"),
+        make_option("--fqdn", help="also ingest into the database as coming from this host"),
+    )
+    help = "Benchmark classifying and ingesting systemd journal lines"
+
+    def handle(self, *args, **kwargs):
+        bench = JournalIngestBenchmark(
+            journal=kwargs["journal"], lines=kwargs["lines"], batch=kwargs["batch"], fqdn=kwargs["fqdn"]
+        )
+        bench.run()
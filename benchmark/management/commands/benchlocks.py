@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.lock_cache import LockCacheBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--locks", type=int, default=10000, help="number of synthetic locks to load (default: 10000)"),
+        make_option("--items", type=int, default=500, help="number of distinct locked items (default: 500)"),
+        make_option("--reads_per_job", type=int, default=2, help="read locks taken by each job (default: 2)"),
+    )
+    help = "Benchmark the job_scheduler LockCache by planning jobs against synthetic locks"
+
+    def handle(self, *args, **kwargs):
+        bench = LockCacheBenchmark(locks=kwargs["locks"], items=kwargs["items"], reads_per_job=kwargs["reads_per_job"])
+        bench.run()
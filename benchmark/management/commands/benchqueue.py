@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.queue_publish import QueuePublishBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--messages", type=int, default=10000, help="messages to publish (default: 10000)"),
+        make_option(
+            "--batch-window", type=int, default=0, help="QueuePublisher batch window in milliseconds (default: 0)"
+        ),
+        make_option("--broker-url", default=None, help="broker to publish to (default: settings.BROKER_URL)"),
+    )
+    help = "Benchmark publishing messages to service queues"
+
+    def handle(self, *args, **kwargs):
+        bench = QueuePublishBenchmark(
+            messages=kwargs["messages"], batch_window=kwargs["batch_window"], broker_url=kwargs["broker_url"]
+        )
+        bench.run()
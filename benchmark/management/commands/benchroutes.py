@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.route_maps import RouteMapsBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--repeat", type=int, default=10, help="times to repeat each build (default: 10)"),
+    )
+    help = "Benchmark building the state transition routes of StatefulObject classes at startup"
+
+    def handle(self, *args, **kwargs):
+        bench = RouteMapsBenchmark(repeat=kwargs["repeat"])
+        bench.run()
+        bench.cleanup()
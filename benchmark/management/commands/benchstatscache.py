@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.stats_cache import StatsCacheBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--series", type=int, default=10000, help="number of series to cache (default: 10000)"),
+        make_option("--points", type=int, default=100, help="points appended per series (default: 100)"),
+    )
+    help = "Benchmark the in-memory cache of recent stats points"
+
+    def handle(self, *args, **kwargs):
+        bench = StatsCacheBenchmark(series=kwargs["series"], points=kwargs["points"])
+        bench.run()
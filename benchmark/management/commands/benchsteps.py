@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.step_connections import StepConnectionsBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--threads", type=int, default=50, help="number of concurrent job threads (default: 50)"),
+        make_option("--steps", type=int, default=20, help="database steps run by each thread (default: 20)"),
+        make_option("--connections", type=int, default=10, help="maximum database connections for steps (default: 10)"),
+    )
+    help = "Benchmark the throughput of job steps using the database"
+
+    def handle(self, *args, **kwargs):
+        bench = StepConnectionsBenchmark(
+            threads=kwargs["threads"], steps=kwargs["steps"], max_connections=kwargs["connections"]
+        )
+        bench.run()
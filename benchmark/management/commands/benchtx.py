@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.http_agent_tx import HttpAgentTxBenchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option("--agents", type=int, default=1000, help="number of long-polling agents (default: 1000)"),
+        make_option("--rate", type=int, default=1000, help="messages sent per second (default: 1000)"),
+        make_option("--duration", type=int, default=10, help="seconds to send messages for (default: 10)"),
+        make_option("--batch", type=int, default=100, help="maximum messages per response (default: 100)"),
+    )
+    help = "Benchmark http_agent message delivery to long-polling agents"
+
+    def handle(self, *args, **kwargs):
+        bench = HttpAgentTxBenchmark(
+            agents=kwargs["agents"], rate=kwargs["rate"], duration=kwargs["duration"], batch=kwargs["batch"]
+        )
+        bench.run()
@@ -0,0 +1,56 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import time
+
+from chroma_core.services import _amqp_connection
+from chroma_core.services.queue import QueuePublisher
+from benchmark.generic import GenericBenchmark
+
+import settings
+
+
+class QueuePublishBenchmark(GenericBenchmark):
+    """Compare publishing to a service queue with a new connection and SimpleQueue
+    per message (as ServiceQueue.put used to) against QueuePublisher."""
+
+    QUEUE_NAME = "benchqueue"
+
+    def __init__(self, messages=10000, batch_window=0, broker_url=None):
+        self.messages = messages
+        self.batch_window = batch_window
+
+        if broker_url:
+            settings.BROKER_URL = broker_url
+
+    def _message(self, i):
+        return {"seq": i, "sent_at": time.time()}
+
+    def _put_per_message(self):
+        for i in range(self.messages):
+            with _amqp_connection() as conn:
+                q = conn.SimpleQueue(
+                    self.QUEUE_NAME, serializer="json", exchange_opts={"durable": False}, queue_opts={"durable": False}
+                )
+                q.put(self._message(i))
+
+    def _put_publisher(self):
+        publisher = QueuePublisher(batch_window=self.batch_window / 1000.0)
+        for i in range(self.messages):
+            publisher.put(self.QUEUE_NAME, self._message(i))
+        publisher.flush()
+
+    def _drain(self):
+        with _amqp_connection() as conn:
+            conn.SimpleQueue(self.QUEUE_NAME, queue_opts={"durable": False}, exchange_opts={"durable": False}).clear()
+
+    def run(self):
+        for label, put in [("connection per message", self._put_per_message), ("QueuePublisher", self._put_publisher)]:
+            self._drain()
+            start = time.time()
+            put()
+            interval = time.time() - start
+            print("%s: %d messages in %.2fs (%.0f/s)" % (label, self.messages, interval, self.messages / interval))
+        self._drain()
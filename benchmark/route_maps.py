@@ -0,0 +1,59 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import os
+import tempfile
+import time
+
+from chroma_core.lib.util import all_subclasses
+from chroma_core.models.jobs import StatefulObject
+from benchmark.generic import GenericBenchmark
+
+
+class RouteMapsBenchmark(GenericBenchmark):
+    """Time building the state transition routes of every StatefulObject class, lazily one
+    class at a time, all together at startup, and all together from a route cache file."""
+
+    def __init__(self, repeat=10):
+        self.repeat = repeat
+        self.classes = [klass for klass in all_subclasses(StatefulObject) if not klass._meta.abstract]
+        self.cache_path = tempfile.mktemp(suffix=".json")
+
+    def _reset(self):
+        for klass in self.classes:
+            if StatefulObject.so_root(klass) is klass:
+                klass.route_map = klass.transition_map = klass.job_class_map = None
+
+    def _time(self, label, fn):
+        interval = 0.0
+        for _ in range(self.repeat):
+            self._reset()
+            begin = time.time()
+            fn()
+            interval += time.time() - begin
+
+        print("%s: %.2fms" % (label, interval * 1000 / self.repeat))
+
+    def _lazy(self):
+        for klass in self.classes:
+            if klass.states:
+                klass._build_maps()
+
+    def run(self):
+        routes = 0
+        self._lazy()
+        for klass in self.classes:
+            if StatefulObject.so_root(klass) is klass and klass.route_map:
+                routes += len(klass.route_map)
+        print("%d classes, %d routes" % (len(self.classes), routes))
+
+        self._time("lazily per class", self._lazy)
+        self._time("all at startup", StatefulObject.build_all_maps)
+        StatefulObject.build_all_maps(self.cache_path)
+        self._time("all from cache file", lambda: StatefulObject.build_all_maps(self.cache_path))
+
+    def cleanup(self):
+        if os.path.exists(self.cache_path):
+            os.unlink(self.cache_path)
@@ -0,0 +1,67 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import collections
+import functools
+import gc
+import time
+from datetime import datetime, timedelta
+
+from django.utils.timezone import utc
+
+from chroma_core.models import Point, Stats
+from chroma_core.models.stats import Cache, PointRing
+from benchmark.generic import GenericBenchmark, rss_bytes
+
+
+class StatsCacheBenchmark(GenericBenchmark):
+    """Compare the memory and speed of caching recent points in PointRings against
+    deques of Point tuples, as the first Sample table does for each series."""
+
+    def __init__(self, series=10000, points=100):
+        self.series = series
+        self.points = points
+        self.maxlen = Stats[0].cache.default_factory().maxlen
+
+    def _fill(self, cache):
+        start = datetime.now(utc)
+        for n in range(self.points):
+            dt = start + timedelta(seconds=10 * n)
+            for id in range(self.series):
+                cache[id] += [Point(dt, float(n), 1)]
+        return start
+
+    def _measure(self, label, factory):
+        gc.collect()
+        rss_before = rss_bytes()
+        cache = Cache(factory)
+        begin = time.time()
+        start = self._fill(cache)
+        fill_interval = time.time() - begin
+        gc.collect()
+        rss_filled = rss_bytes()
+
+        stop = start + timedelta(seconds=10 * self.points)
+        begin = time.time()
+        for id in range(self.series):
+            cache[id][-1]
+            list(point for point in cache[id] if stop - timedelta(minutes=1) <= point.dt < stop)
+        read_interval = time.time() - begin
+
+        print(
+            "%s: %.0f bytes per series, %.2fs to append %d points, %.2fs to read latest and last minute"
+            % (
+                label,
+                (rss_filled - rss_before) / float(self.series),
+                fill_interval,
+                self.series * self.points,
+                read_interval,
+            )
+        )
+
+    def run(self):
+        print("%d series, %d points cached per series" % (self.series, self.maxlen))
+        self._measure("deque of Points", functools.partial(collections.deque, maxlen=self.maxlen))
+        self._measure("PointRing", functools.partial(PointRing, self.maxlen))
@@ -0,0 +1,64 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import threading
+import time
+
+import django.db
+
+from chroma_core.services.job_scheduler.job_scheduler import SimpleConnectionQuota, _disable_database
+from benchmark.generic import GenericBenchmark
+
+
+class StepConnectionsBenchmark(GenericBenchmark):
+    """Run many short database steps from concurrent threads, as RunJobThreads do, through a
+    SimpleConnectionQuota with its connection pool, and with a pool which keeps nothing so
+    that every step opens and closes its own connection."""
+
+    def __init__(self, threads=50, steps=20, max_connections=10):
+        self.threads = threads
+        self.steps = steps
+        self.max_connections = max_connections
+
+    def _run_thread(self, quota):
+        _disable_database()
+        for _ in range(self.steps):
+            quota.acquire()
+            try:
+                cursor = django.db.connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+            finally:
+                quota.release(django.db.connection.connection)
+
+    def _measure(self, label, max_idle):
+        quota = SimpleConnectionQuota(self.max_connections)
+        quota.pool.max_idle = max_idle
+
+        threads = [threading.Thread(target=self._run_thread, args=(quota,)) for _ in range(self.threads)]
+        begin = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        interval = time.time() - begin
+        quota.close()
+
+        stats = quota.stats
+        print(
+            "%s: %.0f steps/s, %d connections opened, mean wait %.1fms, max wait %.1fms"
+            % (
+                label,
+                self.threads * self.steps / interval,
+                stats["created"],
+                stats["mean_wait_time"] * 1000,
+                stats["max_wait_time"] * 1000,
+            )
+        )
+
+    def run(self):
+        print("%d threads running %d steps each, %d connections" % (self.threads, self.steps, self.max_connections))
+        self._measure("connection per step", 0)
+        self._measure("pooled connections", self.max_connections)
@@ -4,9 +4,11 @@
 
 
 import Queue
+import gzip
 import json
 import traceback
 import time
+from cStringIO import StringIO
 
 from django.db import transaction
 from django.http import HttpResponseNotAllowed, HttpResponse, HttpResponseBadRequest
@@ -236,7 +238,10 @@ class MessageView(ValidatedClientView):
 
         return HttpResponse()
 
-    def _filter_valid_messages(self, fqdn, messages):
+    def _valid_message_filter(self, fqdn):
+        """
+        :return: A function which is true for messages belonging to the current session of their plugin
+        """
         plugin_to_session_id = {}
 
         def is_valid(message):
@@ -256,13 +261,32 @@ class MessageView(ValidatedClientView):
 
             return True
 
-        return [m for m in messages if is_valid(m)]
+        return is_valid
+
+    def _messages_response(self, request, encoded_messages):
+        """
+        Build the response to a GET from messages which are already JSON encoded, compressing
+        it if it is larger than settings.HTTP_AGENT_TX_GZIP_THRESHOLD and the agent accepts gzip.
+        """
+        body = '{"messages": [%s]}' % ", ".join(encoded_messages)
+
+        gzip_threshold = settings.HTTP_AGENT_TX_GZIP_THRESHOLD
+        if gzip_threshold and len(body) >= gzip_threshold and "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+            response = HttpResponse(gzip_string(body), mimetype="application/json")
+            response["Content-Encoding"] = "gzip"
+            return response
+
+        return HttpResponse(body, mimetype="application/json")
 
     @log_exception
     def get(self, request):
         """
         Send messages TO the agent.
         Handle a long-polling GET for messages to the agent
+
+        A response holds at most settings.HTTP_AGENT_TX_MAX_MESSAGES messages, and no more than
+        settings.HTTP_AGENT_TX_MAX_BYTES of them unless a single message is larger than that:
+        the rest are left queued for the agent's next GET.
         """
 
         fqdn = self.valid_fqdn(request)
@@ -298,6 +322,10 @@ class MessageView(ValidatedClientView):
 
         log.debug("MessageView.get: composing messages for %s" % fqdn)
         queues = self.queues.get(fqdn)
+        is_valid = self._valid_message_filter(fqdn)
+
+        encoded_messages = [json.dumps(m) for m in messages if is_valid(m)]
+        encoded_size = sum([len(m) for m in encoded_messages])
 
         # If this handler is sitting on the TX queue, draining messages, then
         # when a new session starts, *before* sending any TX messages, we have to
@@ -305,40 +333,46 @@ class MessageView(ValidatedClientView):
         # to an 'old' session (old session meaning TCP connection from a now-dead agent)
 
         with queues.tx_lock:
-            try:
-                first_message = queues.tx.get(block=True, timeout=self.LONG_POLL_TIMEOUT)
-                if first_message["type"] == "TX_BARRIER":
-                    if first_message["client_start_time"] != request.GET["client_start_time"]:
-                        log.warning(
-                            "Cancelling GET due to barrier %s %s"
-                            % (first_message["client_start_time"], request.GET["client_start_time"])
-                        )
-                        return HttpResponse(json.dumps({"messages": []}), mimetype="application/json")
-                else:
-                    messages.append(first_message)
-            except Queue.Empty:
-                pass
-            else:
-                # TODO: limit number of messages per response
-                while True:
+            if queues.wait_tx(self.LONG_POLL_TIMEOUT):
+                while len(encoded_messages) < settings.HTTP_AGENT_TX_MAX_MESSAGES:
                     try:
-                        message = queues.tx.get(block=False)
-                        if message["type"] == "TX_BARRIER":
-                            if message["client_start_time"] != request.GET["client_start_time"]:
-                                log.warning(
-                                    "Cancelling GET due to barrier %s %s"
-                                    % (message["client_start_time"], request.GET["client_start_time"])
-                                )
-                                return HttpResponse(json.dumps({"messages": []}), mimetype="application/json")
-                        else:
-                            messages.append(message)
+                        message = queues.get_tx()
                     except Queue.Empty:
                         break
 
-        messages = self._filter_valid_messages(fqdn, messages)
+                    if message["type"] == "TX_BARRIER":
+                        if message["client_start_time"] != request.GET["client_start_time"]:
+                            log.warning(
+                                "Cancelling GET due to barrier %s %s"
+                                % (message["client_start_time"], request.GET["client_start_time"])
+                            )
+                            return self._messages_response(request, [])
+                        continue
+
+                    if not is_valid(message):
+                        continue
+
+                    encoded_message = json.dumps(message)
+                    if encoded_messages and encoded_size + len(encoded_message) > settings.HTTP_AGENT_TX_MAX_BYTES:
+                        # Leave it for the next GET
+                        queues.put_back_tx(message)
+                        break
+
+                    encoded_messages.append(encoded_message)
+                    encoded_size += len(encoded_message)
+
+        log.debug(
+            "MessageView.get: responding to %s with %s messages, %s bytes (%s)"
+            % (fqdn, len(encoded_messages), encoded_size, client_start_time)
+        )
+        return self._messages_response(request, encoded_messages)
+
 
-        log.debug("MessageView.get: responding to %s with %s messages (%s)" % (fqdn, len(messages), client_start_time))
-        return HttpResponse(json.dumps({"messages": messages}), mimetype="application/json")
+def gzip_string(s):
+    buf = StringIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(s)
+    return buf.getvalue()
 
 
 def validate_token(key, credits=1):
@@ -3,6 +3,9 @@
 # license that can be found in the LICENSE file.
 
 
+import re
+
+from chroma_core.lib.name_resolver import NameResolver
 from chroma_core.lib.util import normalize_nid
 from chroma_api.utils import DateSerializer
 
@@ -13,6 +16,10 @@ from chroma_api.authentication import AnonymousAuthentication
 from chroma_core.models.log import LogMessage, MessageClass
 from chroma_api.chroma_model_resource import ChromaModelResource
 
+# TODO: detect other NID types (cray?)
+NID_REGEX = re.compile("(\d{1,3}\.){3}\d{1,3}@(tcp|ib)(_\d+)?")
+TARGET_REGEX = re.compile("[^\w](\w{1,8}-(MDT|OST)[\da-f]{4})")
+
 
 class LogAuthorization(DjangoAuthorization):
     """
@@ -105,8 +112,7 @@ class LogResource(ChromaModelResource):
         from chroma_api import api_log
         from chroma_api.urls import api
 
-        from chroma_core.models import ManagedHost, ManagedTarget
-        import re
+        from chroma_core.models import ManagedHost
 
         substitutions = []
 
@@ -121,14 +127,11 @@ class LogResource(ChromaModelResource):
                 }
             )
 
-        # TODO: detect other NID types (cray?)
-        nid_regex = re.compile("(\d{1,3}\.){3}\d{1,3}@(tcp|ib)(_\d+)?")
-        target_regex = re.compile("[^\w](\w{1,8}-(MDT|OST)[\da-f]{4})")
-        for match in nid_regex.finditer(message):
+        for match in NID_REGEX.finditer(message):
             nid = match.group(0)
             nid = normalize_nid(nid)
             try:
-                host = ManagedHost.get_by_nid(nid)
+                host = ManagedHost.get_by_nid(nid, cached=True)
             except ManagedHost.DoesNotExist:
                 api_log.warn("No host has NID %s" % nid)
                 continue
@@ -138,9 +141,9 @@ class LogResource(ChromaModelResource):
             if host.state != "removed":
                 substitute(host, match, 0)
 
-        for match in target_regex.finditer(message):
-            target_name = match.group(1)
-            for target in ManagedTarget.objects.filter(name=target_name)[:1]:
+        for match in TARGET_REGEX.finditer(message):
+            target = NameResolver.get_target_by_name(match.group(1))
+            if target is not None:
                 substitute(target, match)
 
         return sorted(substitutions, key=lambda sub: sub["start"])
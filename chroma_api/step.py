@@ -3,7 +3,7 @@
 # license that can be found in the LICENSE file.
 
 
-from chroma_core.models.step_result import StepResult
+from chroma_core.models.step_result import StepResult, StepConsoleChunk
 from tastypie.authorization import DjangoAuthorization
 from chroma_api.authentication import AnonymousAuthentication
 from tastypie import fields
@@ -21,11 +21,12 @@ class StepResource(ChromaModelResource):
     and the user is interested in any captured exceptions or console output.
 
     Don't load steps for a job unless they're really needed; the console output may be
-    large.
+    large.  The console output of a running step can be followed with the ``step_console``
+    resource.
     """
 
     class Meta:
-        queryset = StepResult.objects.all()
+        queryset = StepResult.objects.prefetch_related("console_chunks")
         resource_name = "step"
         authorization = DjangoAuthorization()
         authentication = AnonymousAuthentication()
@@ -49,3 +50,30 @@ class StepResource(ChromaModelResource):
 
     def dehydrate_args(self, bundle):
         return bundle.obj.args
+
+    console = fields.CharField(
+        help_text="Combined standard out and standard error from all subprocesses run while completing this step"
+    )
+
+    def dehydrate_console(self, bundle):
+        return bundle.obj.get_console()
+
+
+class StepConsoleResource(ChromaModelResource):
+    """
+    A chunk of the console output of a step, in the order it was produced.  Chunks are only
+    ever added, so the output of a running step can be streamed by requesting the chunks
+    with a ``sequence`` greater than the last one received, or paged through with ``offset``.
+    """
+
+    step_result = fields.ToOneField(StepResource, "step_result")
+
+    class Meta:
+        queryset = StepConsoleChunk.objects.all()
+        resource_name = "step_console"
+        authorization = DjangoAuthorization()
+        authentication = AnonymousAuthentication()
+        filtering = {"step_result": ["exact"], "sequence": ChromaModelResource.ALL_FILTER_INT}
+        ordering = ["sequence"]
+        list_allowed_methods = ["get"]
+        detail_allowed_methods = ["get"]
@@ -84,6 +84,7 @@ api.register(chroma_api.alert.AlertTypeResource())
 api.register(chroma_api.alert.AlertSubscriptionResource())
 api.register(chroma_api.job.JobResource())
 api.register(chroma_api.step.StepResource())
+api.register(chroma_api.step.StepConsoleResource())
 api.register(chroma_api.log.LogResource())
 api.register(chroma_api.command.CommandResource())
 api.register(chroma_api.help.HelpResource())
@@ -8,7 +8,6 @@ import traceback
 import logging
 import itertools
 from chroma_core.models.jobs import SchedulingError
-import bisect
 from collections import namedtuple
 
 
@@ -428,17 +427,21 @@ class MetricResource:
         # Want an overall reduction into one series
         if reduce_fn not in ("sum", "average"):
             raise NotImplementedError
-        datetimes = dict((obj_id, sorted(data)) for obj_id, data in results.items())
-        result = {}
-        for dt in set(itertools.chain(*datetimes.values())):
-            result[dt] = counter = Counter.fromkeys(metrics, 0.0)
-            for obj_id, stats in results.items():
-                data = stats.get(dt, {})
-                dts = datetimes[obj_id]
-                if dts and not data:  # Didn't have one for this exact timestamp, do we have one before?
-                    data = stats[dts[max(bisect.bisect(dts, dt) - 1, 0)]]
-                counter.update(data)
-            if reduce_fn == "average":
+        datetimes = sorted(set(itertools.chain.from_iterable(results.values())))
+        result = dict((dt, Counter.fromkeys(metrics, 0.0)) for dt in datetimes)
+        for stats in results.values():
+            dts = sorted(stats)
+            if not dts:
+                continue
+            # Walk each object's timestamps alongside the union of them: use the data for this exact
+            # timestamp, else the latest before it, else the earliest
+            index = 0
+            for dt in datetimes:
+                while index + 1 < len(dts) and dts[index + 1] <= dt:
+                    index += 1
+                result[dt].update(stats[dts[index]])
+        if reduce_fn == "average":
+            for counter in result.values():
                 for name in counter:
                     counter[name] /= len(results)
         return result
@@ -458,9 +461,15 @@ class MetricResource:
             raise custom_response(self, request, http.HttpNotFound, {"metrics": exc})
         metrics = metrics or set(itertools.chain.from_iterable(MetricStore(obj).names for obj in objs))
 
-        result = dict(
-            (obj.id, self._fetch(MetricStore(obj), metrics, begin, end, job, max_points, num_points)) for obj in objs
-        )
+        if begin and end and not job:
+            stores = [MetricStore(obj) for obj in objs]
+            fetched = MetricStore.fetch_many(stores, metrics, begin, end, max_points, num_points)
+            result = dict((obj.id, stats) for obj, stats in zip(objs, fetched))
+        else:
+            result = dict(
+                (obj.id, self._fetch(MetricStore(obj), metrics, begin, end, job, max_points, num_points))
+                for obj in objs
+            )
         if not reduce_fn:
             for obj_id, stats in result.items():
                 result[obj_id] = self._format(stats)
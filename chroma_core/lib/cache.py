@@ -10,6 +10,56 @@ from chroma_core.services import log_register
 log = log_register(__name__)
 
 
+class CacheIndex(object):
+    """A secondary index over the cached instances of one model class, mapping
+    key(instance) to the primary keys of the instances with that key.  Instances
+    for which key returns None are not indexed.
+
+    """
+
+    def __init__(self, klass, key):
+        self.klass = klass
+        self.key = key
+        self._pks = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, instance):
+        key = self.key(instance)
+        if key is not None:
+            self._pks[key].add(instance.pk)
+
+    def remove(self, instance):
+        key = self.key(instance)
+        try:
+            pks = self._pks[key]
+        except KeyError:
+            return
+
+        pks.discard(instance.pk)
+        if not pks:
+            del self._pks[key]
+
+    def get(self, key):
+        try:
+            pks = self._pks[key]
+        except KeyError:
+            self.misses += 1
+            return set()
+        else:
+            self.hits += 1
+            return pks
+
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "keys": len(self._pks),
+            "entries": sum([len(pks) for pks in self._pks.values()]),
+        }
+
+
 class ObjectCache(object):
     instance = None
 
@@ -17,7 +67,7 @@ class ObjectCache(object):
         from chroma_core.models import ManagedFilesystem, ManagedHost, LNetConfiguration, LustreClientMount
         from chroma_core.models import PacemakerConfiguration, CorosyncConfiguration, Corosync2Configuration
         from chroma_core.models import NTPConfiguration
-        from chroma_core.models.target import ManagedTarget, ManagedTargetMount
+        from chroma_core.models.target import ManagedTarget, ManagedTargetMount, ManagedMdt, ManagedOst
         from chroma_core.models.copytool import Copytool
 
         self.objects = defaultdict(dict)
@@ -40,17 +90,69 @@ class ObjectCache(object):
             NTPConfiguration,
         ]
 
+        # The filesystem of each MDT and OST, by target ID: filesystem membership never changes,
+        # so this is loaded up front and then added to as targets are added.
+        self._target_filesystems = {}
+        for klass in [ManagedMdt, ManagedOst]:
+            self._target_filesystems.update(klass.objects.values_list("id", "filesystem_id"))
+
+        self._indexes = {
+            "host_target_mounts": CacheIndex(ManagedTargetMount, lambda mtm: mtm.host_id),
+            "target_target_mounts": CacheIndex(ManagedTargetMount, lambda mtm: mtm.target_id),
+            "filesystem_targets": CacheIndex(ManagedTarget, self._target_filesystem_id),
+            "host_client_mounts": CacheIndex(LustreClientMount, lambda cm: cm.host_id),
+            "filesystem_client_mounts": CacheIndex(LustreClientMount, lambda cm: cm.filesystem_id),
+            "mountpoint_copytools": CacheIndex(Copytool, lambda ct: (ct.host_id, ct.mountpoint)),
+        }
+        self._class_indexes = defaultdict(list)
+        for index in self._indexes.values():
+            self._class_indexes[index.klass].append(index)
+
         for klass in self._cached_models:
             args = filter_args.get(klass, {})
             for obj in klass.objects.filter(**args):
                 self._add(klass, obj)
 
+    def _target_filesystem_id(self, target):
+        """The ID of the filesystem of an MDT or OST, or None for an MGS"""
+        from chroma_core.models.target import FilesystemMember
+
+        try:
+            return self._target_filesystems[target.pk]
+        except KeyError:
+            klass = target.downcast_class
+            if issubclass(klass, FilesystemMember):
+                filesystem_id = klass._base_manager.filter(pk=target.pk).values_list("filesystem_id", flat=True)[0]
+            else:
+                filesystem_id = None
+            self._target_filesystems[target.pk] = filesystem_id
+            return filesystem_id
+
+    def _index(self, instance):
+        for index in self._class_indexes[instance.__class__]:
+            index.add(instance)
+
+    def _unindex(self, instance):
+        for index in self._class_indexes[instance.__class__]:
+            index.remove(instance)
+
+    def _get_indexed(self, index_name, key):
+        index = self._indexes[index_name]
+        class_collection = self.objects[index.klass]
+        return [class_collection[pk] for pk in index.get(key)]
+
     def _add(self, klass, instance):
         assert instance.__class__ in self._cached_models
 
         log.debug("_add %s %s %s" % (instance.__class__, instance.id, id(instance)))
 
+        try:
+            self._unindex(self.objects[klass][instance.pk])
+        except KeyError:
+            pass
+
         self.objects[klass][instance.pk] = instance
+        self._index(instance)
 
     @classmethod
     def add(cls, klass, instance):
@@ -83,24 +185,18 @@ class ObjectCache(object):
         return targets
 
     def _get_targets_by_filesystem(self, filesystem_id):
-        from chroma_core.models import ManagedTarget, ManagedMdt, ManagedOst, ManagedFilesystem
+        from chroma_core.models import ManagedTarget, ManagedOst, ManagedFilesystem
 
-        # FIXME: This is reasonably efficient but could be improved further by caching the filesystem membership of targets.
         targets = []
         mgs_id = self.objects[ManagedFilesystem][filesystem_id].mgs_id
         targets.append(self.objects[ManagedTarget][mgs_id])
 
+        # MDTs then OSTs
         targets.extend(
-            [
-                self.objects[ManagedTarget][mdt["id"]]
-                for mdt in ManagedMdt.objects.filter(filesystem=filesystem_id).values("id")
-            ]
-        )
-        targets.extend(
-            [
-                self.objects[ManagedTarget][ost["id"]]
-                for ost in ManagedOst.objects.filter(filesystem=filesystem_id).values("id")
-            ]
+            sorted(
+                self._get_indexed("filesystem_targets", filesystem_id),
+                key=lambda t: (issubclass(t.downcast_class, ManagedOst), t.pk),
+            )
         )
 
         return targets
@@ -120,8 +216,13 @@ class ObjectCache(object):
     def target_primary_server(cls, target):
         from chroma_core.models.target import ManagedTargetMount
 
-        primary_mtm = cls.get_one(ManagedTargetMount, lambda mtm: mtm.target.id == target.id and mtm.primary == True)
-        return primary_mtm.host
+        r = [mtm for mtm in cls.getInstance()._get_indexed("target_target_mounts", target.id) if mtm.primary == True]
+        if len(r) > 1:
+            raise ManagedTargetMount.MultipleObjectsReturned
+        elif not r:
+            raise ManagedTargetMount.DoesNotExist
+        else:
+            return r[0].host
 
     @classmethod
     def getInstance(cls):
@@ -136,34 +237,30 @@ class ObjectCache(object):
 
     @classmethod
     def host_client_mounts(cls, host_id):
-        from chroma_core.models.client_mount import LustreClientMount
-
-        return cls.get(LustreClientMount, lambda hcm: hcm.host_id == host_id)
+        return cls.getInstance()._get_indexed("host_client_mounts", host_id)
 
     @classmethod
     def filesystem_client_mounts(cls, fs_id):
-        from chroma_core.models.client_mount import LustreClientMount
-
-        return cls.get(LustreClientMount, lambda fcm: fcm.filesystem_id == fs_id)
+        return cls.getInstance()._get_indexed("filesystem_client_mounts", fs_id)
 
     @classmethod
     def client_mount_copytools(cls, cm_id):
         from chroma_core.models.client_mount import LustreClientMount
-        from chroma_core.models.copytool import Copytool
 
         try:
-            client_mount = cls.get_one(LustreClientMount, lambda ccm: ccm.id == cm_id)
-            return cls.get(
-                Copytool, lambda ct: (client_mount.host_id == ct.host_id and client_mount.mountpoint == ct.mountpoint)
-            )
-        except LustreClientMount.DoesNotExist:
+            client_mount = cls.getInstance().objects[LustreClientMount][cm_id]
+        except KeyError:
             return []
+        else:
+            return cls.getInstance()._get_indexed(
+                "mountpoint_copytools", (client_mount.host_id, client_mount.mountpoint)
+            )
 
     @classmethod
     def host_targets(cls, host_id):
-        from chroma_core.models.target import ManagedTargetMount, ManagedTarget
+        from chroma_core.models.target import ManagedTarget
 
-        mtms = cls.get(ManagedTargetMount, lambda mtm: mtm.host_id == host_id)
+        mtms = cls.getInstance()._get_indexed("host_target_mounts", host_id)
 
         # FIXME: We have to explicitly restrict to non-deleted targets because ManagedTargetMount
         # instances aren't cleaned up on target deletion.
@@ -172,9 +269,11 @@ class ObjectCache(object):
 
     @classmethod
     def purge(cls, klass, filter):
-        cls.getInstance().objects[klass] = dict(
-            [(o.pk, o) for o in cls.getInstance().objects[klass].values() if not filter(o)]
-        )
+        instance = cls.getInstance()
+        for o in instance.objects[klass].values():
+            if filter(o):
+                instance._unindex(o)
+                del instance.objects[klass][o.pk]
 
     def _update(self, obj):
         log.debug("update: %s %s" % (obj.__class__, obj.id))
@@ -186,7 +285,9 @@ class ObjectCache(object):
             except obj.__class__.DoesNotExist:
                 return None
             else:
+                self._unindex(class_collection[obj.pk])
                 class_collection[obj.pk] = fresh_instance
+                self._index(fresh_instance)
             return fresh_instance
 
     @classmethod
@@ -197,5 +298,21 @@ class ObjectCache(object):
     def mtm_targets(cls, mtm_id):
         from chroma_core.models.target import ManagedTargetMount, ManagedTarget
 
-        mtms = cls.get(ManagedTargetMount, lambda mtm: mtm.id == mtm_id)
-        return [cls.getInstance().objects[ManagedTarget][mtm.target_id] for mtm in mtms]
+        try:
+            mtm = cls.getInstance().objects[ManagedTargetMount][mtm_id]
+        except KeyError:
+            return []
+        else:
+            return [cls.getInstance().objects[ManagedTarget][mtm.target_id]]
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: A dict of counters for each secondary index (hits, misses, keys and entries),
+                 and the number of cached instances of each model
+        """
+        instance = cls.getInstance()
+        return {
+            "indexes": dict([(name, index.stats) for name, index in instance._indexes.items()]),
+            "objects": dict([(klass.__name__, len(instance.objects[klass])) for klass in instance._cached_models]),
+        }
@@ -0,0 +1,122 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+"""
+LogMessage rows are stored in one child table per UTC day, inheriting from
+chroma_core_logmessage.  Rows are routed to their day by triggers on the parent
+table (see migration 0047), so queries against LogMessage see every partition, and
+PostgreSQL's constraint exclusion skips the days that a datetime filter rules out.
+
+Rows for which no partition exists (e.g. rows written before partitioning, or from
+a host with a badly wrong clock) stay in the parent table itself.
+"""
+
+import datetime
+import gzip
+
+from django.db import connection
+
+from chroma_core.models.log import LogMessage
+
+
+PARENT_TABLE = LogMessage._meta.db_table
+PARTITION_PREFIX = PARENT_TABLE + "_"
+PARTITION_DATE_FORMAT = "%Y%m%d"
+
+
+def partition_name(day):
+    return "%s%s" % (PARTITION_PREFIX, day.strftime(PARTITION_DATE_FORMAT))
+
+
+def list_partitions():
+    """
+    :return: List of (table name, day) for the existing partitions, oldest first
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits"
+        " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+        " JOIN pg_class parent ON parent.oid = pg_inherits.inhparent"
+        " WHERE parent.relname = %s",
+        [PARENT_TABLE],
+    )
+
+    partitions = []
+    for (name,) in cursor.fetchall():
+        try:
+            day = datetime.datetime.strptime(name[len(PARTITION_PREFIX) :], PARTITION_DATE_FORMAT).date()
+        except ValueError:
+            continue
+        partitions.append((name, day))
+
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(day):
+    """Create the partition holding the log messages of a UTC day"""
+    name = partition_name(day)
+    begin = datetime.datetime.combine(day, datetime.time())
+    end = begin + datetime.timedelta(days=1)
+
+    cursor = connection.cursor()
+    cursor.execute(
+        "CREATE TABLE %s (CHECK (datetime >= '%s+00' AND datetime < '%s+00')) INHERITS (%s)"
+        % (name, begin.isoformat(" "), end.isoformat(" "), PARENT_TABLE)
+    )
+    cursor.execute("ALTER TABLE %s ADD PRIMARY KEY (id)" % name)
+    cursor.execute("CREATE INDEX %s_datetime ON %s (datetime)" % (name, name))
+
+    return name
+
+
+def ensure_partitions(first_day, last_day):
+    """
+    Create any missing partitions for the days from first_day to last_day inclusive
+
+    :return: List of the names of the partitions created
+    """
+    existing = set(day for name, day in list_partitions())
+
+    created = []
+    day = first_day
+    while day <= last_day:
+        if day not in existing:
+            created.append(create_partition(day))
+        day += datetime.timedelta(days=1)
+
+    return created
+
+
+def archive_and_drop(name, archive_path):
+    """
+    Stream the rows of a partition to a gzip compressed CSV file with COPY, and then drop
+    the partition.  Call within a transaction, so that the partition is only dropped if
+    the archive was written.  Passing the parent table's name archives and removes the rows
+    which are held in the parent table itself.
+
+    :return: The number of rows removed
+    """
+    only = "ONLY " if name == PARENT_TABLE else ""
+
+    cursor = connection.cursor()
+    # Block inserts until the rows are gone, so that none are dropped without being archived
+    cursor.execute("LOCK TABLE %s%s IN SHARE ROW EXCLUSIVE MODE" % (only, name))
+    cursor.execute("SELECT count(*) FROM %s%s" % (only, name))
+    row_count = cursor.fetchone()[0]
+
+    if row_count:
+        archive = gzip.open(archive_path, "ab")
+        try:
+            cursor.copy_expert("COPY (SELECT * FROM %s%s) TO STDOUT WITH CSV HEADER" % (only, name), archive)
+        finally:
+            archive.close()
+
+    if only:
+        # TRUNCATE blocks every reader of the table, so only when there is something to remove
+        if row_count:
+            cursor.execute("TRUNCATE ONLY %s" % name)
+    else:
+        cursor.execute("DROP TABLE %s" % name)
+
+    return row_count
@@ -5,9 +5,11 @@
 
 import time
 import heapq
+import itertools
 import collections
 from datetime import datetime
 from chroma_core.services import log_register
+from django.contrib.contenttypes.models import ContentType
 from django.utils.timezone import utc
 from chroma_core.models import Point, Series, Stats, ManagedHost, ManagedTarget, ManagedFilesystem
 from chroma_core.lib.storage_plugin.api import statistics
@@ -70,21 +72,51 @@ class MetricStore(object):
 
     def fetch(self, fetch_metrics, begin, end, max_points=float("inf"), num_points=0):
         "Return datetimes with dicts of field names and values."
-        result = collections.defaultdict(dict)
-        types = set()
+        return self.fetch_many([self], fetch_metrics, begin, end, max_points, num_points)[0]
+
+    @staticmethod
+    def fetch_many(stores, fetch_metrics, begin, end, max_points=float("inf"), num_points=0):
+        """Return the result of `fetch` for each of many metric stores, in the same order.
+        Series are looked up with one query for each content type, and points selected with
+        one query for each Sample table, rather than for each object and series."""
         begin = Stats[0].round(begin)  # exclude points from a partial sample
         end = Stats[0].round(end)  # exclude points from a partial sample
-        for series in Series.filter(self.measured_object, name__in=fetch_metrics):
-            types.add(series.type)
-            minimum = 0.0 if series.type == "Counter" else float("-inf")
-            for point in Stats.select(
-                series.id, begin, end, rate=series.type in ("Counter", "Derive"), maxlen=max_points, fixed=num_points
+
+        by_content_type = collections.defaultdict(dict)
+        for index, store in enumerate(stores):
+            content_type = ContentType.objects.get_for_model(store.measured_object)
+            by_content_type[content_type][store.measured_object.id] = index
+        store_series = collections.defaultdict(list)
+        for content_type, indexes in by_content_type.items():
+            for series in Series.objects.filter(
+                content_type=content_type, object_id__in=indexes.keys(), name__in=fetch_metrics
             ):
-                result[point.dt][series.name] = max(minimum, point.mean)
-        # if absolute and derived values are mixed, the earliest value will be incomplete
-        if result and types > set(["Gauge"]) and len(result[min(result)]) < len(fetch_metrics):
-            del result[min(result)]
-        return dict(result)
+                store_series[indexes[series.object_id]].append(series)
+
+        all_series = list(itertools.chain.from_iterable(store_series.values()))
+        points = Stats.select_many(
+            [series.id for series in all_series],
+            begin,
+            end,
+            set(series.id for series in all_series if series.type in ("Counter", "Derive")),
+            maxlen=max_points,
+            fixed=num_points,
+        )
+
+        results = []
+        for index in range(len(stores)):
+            result = collections.defaultdict(dict)
+            types = set()
+            for series in store_series[index]:
+                types.add(series.type)
+                minimum = 0.0 if series.type == "Counter" else float("-inf")
+                for point in points[series.id]:
+                    result[point.dt][series.name] = max(minimum, point.mean)
+            # if absolute and derived values are mixed, the earliest value will be incomplete
+            if result and types > set(["Gauge"]) and len(result[min(result)]) < len(fetch_metrics):
+                del result[min(result)]
+            results.append(dict(result))
+        return results
 
     def fetch_last(self, fetch_metrics):
         "Return latest datetime and dict of field names and values."
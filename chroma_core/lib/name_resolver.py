@@ -0,0 +1,74 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import time
+from collections import defaultdict
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+import settings
+
+
+class NameResolver(object):
+    """Process-wide indexes from NID to ManagedHost and from target name to ManagedTarget, so
+    that names found in log messages can be resolved without a query per name.
+
+    The indexes are loaded on first use, dropped whenever a host, network interface or target is
+    saved or deleted in this process, and reloaded after NAME_RESOLVER_TTL seconds to pick up
+    changes made by other processes.
+
+    """
+
+    instance = None
+
+    def __init__(self):
+        from chroma_core.models import ManagedHost, ManagedTarget, NetworkInterface
+
+        self.loaded_at = time.time()
+
+        hosts = dict((host.id, host) for host in ManagedHost._base_manager.filter(not_deleted=True))
+        self._nid_hosts = defaultdict(list)
+        for host_id, address, lnd_type in NetworkInterface.objects.values_list("host_id", "inet4_address", "type"):
+            if host_id in hosts:
+                self._nid_hosts[(address, lnd_type)].append(hosts[host_id])
+
+        self._targets = {}
+        for target in ManagedTarget.objects.all():
+            self._targets.setdefault(target.name, target)
+
+    @classmethod
+    def getInstance(cls):
+        instance = cls.instance
+        if instance is None or time.time() - instance.loaded_at > settings.NAME_RESOLVER_TTL:
+            instance = cls.instance = NameResolver()
+
+        return instance
+
+    @classmethod
+    def clear(cls):
+        cls.instance = None
+
+    @classmethod
+    def get_hosts_by_nid(cls, nid_address, lnd_type):
+        """The not-deleted hosts with a network interface of this address and type"""
+        return list(cls.getInstance()._nid_hosts.get((nid_address, lnd_type), []))
+
+    @classmethod
+    def get_target_by_name(cls, name):
+        """A not-deleted target with this name, or None"""
+        return cls.getInstance()._targets.get(name)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def _invalidate(sender, instance, **kwargs):
+    if NameResolver.instance is None:
+        return
+
+    from chroma_core.models import ManagedHost, ManagedTarget, NetworkInterface
+
+    if isinstance(instance, (ManagedHost, NetworkInterface, ManagedTarget)):
+        NameResolver.clear()
@@ -4,8 +4,10 @@
 
 
 import logging
+import threading
+from contextlib import contextmanager
 
-from django.db import models
+from django.db import connection, models
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.generic import GenericForeignKey
@@ -17,6 +19,103 @@ from chroma_core.models.utils import STR_TO_SEVERITY
 from chroma_core.lib.job import job_log
 
 
+class ActiveAlertIndex(object):
+    """Process-wide record of the currently active alerts of the AlertStateBase classes with
+    index_active set, keyed by (alert type, alert item content type ID, alert item ID), so that
+    notifications which would not change whether an alert is active return without a query.
+
+    Each alert type is loaded on first use and then kept current by high() and low().  An
+    alert raised or lowered inside a transaction may yet be rolled back, so its entry is
+    instead marked unknown, and the next notification for it goes to the database.  Callers
+    which notify inside a transaction wrap it in deferred(), so that their updates are
+    applied once it has committed.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._loaded = set()
+            self._active = {}
+            self._unknown = set()
+            self.skipped = 0
+            self.executed = 0
+
+    def _load(self, alert_class):
+        alert_type = alert_class.__name__
+        if alert_type not in self._loaded:
+            for alert_state in alert_class.objects.filter(active=True):
+                self._active[(alert_type, alert_state.alert_item_type_id, alert_state.alert_item_id)] = alert_state
+            self._loaded.add(alert_type)
+
+    def lookup(self, alert_class, key, active):
+        """
+        :return: (True, alert_state) if the alert is known to be already active (or inactive, with
+                 alert_state None) as notified, else (False, None)
+        """
+        with self._lock:
+            self._load(alert_class)
+
+            if key not in self._unknown and (key in self._active) == active:
+                self.skipped += 1
+                return True, self._active.get(key)
+            else:
+                self.executed += 1
+                return False, None
+
+    def _apply(self, key, alert_state):
+        self._unknown.discard(key)
+        if alert_state is None:
+            self._active.pop(key, None)
+        else:
+            self._active[key] = alert_state
+
+    def update(self, key, alert_state):
+        """Record the active alert for key, or None if it has none"""
+        pending = getattr(self._local, "pending", None)
+
+        with self._lock:
+            if pending is not None or connection.in_atomic_block:
+                self._unknown.add(key)
+                self._active.pop(key, None)
+                if pending is not None:
+                    pending.append((key, alert_state))
+            else:
+                self._apply(key, alert_state)
+
+    @contextmanager
+    def deferred(self):
+        """Hold back the updates made by this thread until the block completes, and apply them then.
+
+        For use around a transaction.atomic block: the updates are applied once it has committed,
+        and if it raises they are discarded, leaving their entries unknown.
+        """
+        outer = getattr(self._local, "pending", None)
+        pending = self._local.pending = []
+        try:
+            yield
+        finally:
+            self._local.pending = outer
+
+        if outer is not None:
+            outer.extend(pending)
+        else:
+            with self._lock:
+                for key, alert_state in pending:
+                    self._apply(key, alert_state)
+
+    @property
+    def stats(self):
+        return {"skipped": self.skipped, "executed": self.executed, "active": len(self._active)}
+
+
+active_alert_index = ActiveAlertIndex()
+
+
 class AlertStateBase(SparseModel):
     class Meta:
         abstract = True
@@ -68,6 +167,10 @@ class AlertStateBase(SparseModel):
     # Subclasses set this, used as a default in .notify()
     default_severity = logging.INFO
 
+    # Subclasses which are only ever raised and lowered (by .notify()) from one service set
+    # this, so that the active_alert_index of that service is a faithful copy of the database
+    index_active = False
+
     # For historical compatibility anything called Alert will send and alert email and anything else won't.
     # This can obviously be overridden by any particular event but gives us a like for behaviour.
     @property
@@ -161,6 +264,20 @@ class AlertStateBase(SparseModel):
             alert_item_type__app_label=item_class._meta.app_label,
         )
 
+    @classmethod
+    def _active_index_key(cls, alert_item, kwargs):
+        """The key of this alert for alert_item in active_alert_index, or None if the
+        notification is not one that the index can answer"""
+        if not cls.index_active or kwargs:
+            return None
+
+        if hasattr(alert_item, "content_type"):
+            item_type_id = alert_item.content_type_id
+        else:
+            item_type_id = ContentType.objects.get_for_model(alert_item, for_concrete_model=False).id
+
+        return (cls.__name__, item_type_id, alert_item.pk)
+
     @classmethod
     def notify(cls, alert_item, active, **kwargs):
         """Notify an alert in the default severity level for that alert"""
@@ -206,6 +323,12 @@ class AlertStateBase(SparseModel):
 
         attrs_to_save = cls._get_attrs_to_save(kwargs)
 
+        index_key = cls._active_index_key(alert_item, kwargs)
+        if index_key is not None:
+            known, alert_state = active_alert_index.lookup(cls, index_key, True)
+            if known:
+                return alert_state
+
         try:
             alert_state = cls.filter_by_item(alert_item).get(**kwargs)
         except cls.DoesNotExist:
@@ -234,6 +357,10 @@ class AlertStateBase(SparseModel):
                 # the .end of the existing record as we are logically concurrent
                 # with the creator.
                 return None
+
+        if index_key is not None:
+            active_alert_index.update(index_key, alert_state)
+
         return alert_state
 
     @classmethod
@@ -244,6 +371,12 @@ class AlertStateBase(SparseModel):
         # currently, no attrs are saved when an attr is lowered, so just filter them out of kwargs
         cls._get_attrs_to_save(kwargs)
 
+        index_key = cls._active_index_key(alert_item, kwargs)
+        if index_key is not None:
+            known, alert_state = active_alert_index.lookup(cls, index_key, False)
+            if known:
+                return None
+
         try:
             alert_state = cls.filter_by_item(alert_item).get(**kwargs)
             alert_state.end = end_time
@@ -264,6 +397,9 @@ class AlertStateBase(SparseModel):
         except cls.DoesNotExist:
             alert_state = None
 
+        if index_key is not None:
+            active_alert_index.update(index_key, None)
+
         return alert_state
 
     @classmethod
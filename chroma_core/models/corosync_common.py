@@ -84,6 +84,8 @@ class CorosyncNoPeersAlert(AlertStateBase):
     # This is worse than INFO because it *could* indicate that
     # networking is misconfigured..
     default_severity = logging.WARNING
+    # Only raised and lowered by the corosync service
+    index_active = True
 
     def alert_message(self):
         return "Host %s no failover peers" % self.alert_item.host
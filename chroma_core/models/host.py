@@ -235,16 +235,20 @@ class ManagedHost(DeletableStatefulObject, MeasuredEntity):
             return super(ManagedHost, self).get_available_states(begin_state)
 
     @classmethod
-    def get_by_nid(cls, nid_string):
+    def get_by_nid(cls, nid_string, cached=False):
         """Resolve a NID string to a ManagedHost (best effort).  Not guaranteed to work:
          * The NID might not exist for any host
          * The NID might exist for multiple hosts
 
          Note: this function may return deleted hosts (useful behaviour if you're e.g. resolving
          NID to hostname for historical logs).
+
+         :param cached: resolve from the NameResolver's indexes, which may be up to NAME_RESOLVER_TTL
+                        seconds out of date, rather than querying the database
         """
 
         from chroma_core.models import Nid
+        from chroma_core.lib.name_resolver import NameResolver
 
         # Check we at least have a @
         if "@" not in nid_string:
@@ -252,15 +256,22 @@ class ManagedHost(DeletableStatefulObject, MeasuredEntity):
 
         nid = Nid.split_nid_string(nid_string)
 
-        hosts = ManagedHost._base_manager.filter(
-            networkinterface__inet4_address=nid.nid_address, networkinterface__type=nid.lnd_type, not_deleted=True
-        )
+        if cached:
+            hosts = NameResolver.get_hosts_by_nid(nid.nid_address, nid.lnd_type)
+        else:
+            hosts = list(
+                ManagedHost._base_manager.filter(
+                    networkinterface__inet4_address=nid.nid_address,
+                    networkinterface__type=nid.lnd_type,
+                    not_deleted=True,
+                )
+            )
         # We can resolve the NID to a host if there is exactly one not-deleted
         # host with that NID (and 0 or more deleted hosts), or if there are
         # no not-deleted hosts with that NID but exactly one deleted host with that NID
-        if hosts.count() == 0:
+        if len(hosts) == 0:
             raise ManagedHost.DoesNotExist()
-        elif hosts.count() == 1:
+        elif len(hosts) == 1:
             return hosts[0]
         else:
             active_hosts = [h for h in hosts if h.not_deleted]
@@ -1712,6 +1723,8 @@ class HostContactAlert(AlertStateBase):
     # * Host can be offline entirely but filesystem remains available
     #   if failover servers are available.
     default_severity = logging.WARNING
+    # Only raised and lowered by the http_agent service
+    index_active = True
 
     class Meta:
         app_label = "chroma_core"
@@ -1749,6 +1762,8 @@ class HostOfflineAlert(AlertStateBase):
     # * Host can be offline but filesystem remains available
     #   if failover servers are available.
     default_severity = logging.WARNING
+    # Only raised and lowered by the corosync service
+    index_active = True
 
     class Meta:
         app_label = "chroma_core"
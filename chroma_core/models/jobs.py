@@ -4,7 +4,10 @@
 # license that can be found in the LICENSE file.
 
 
-from collections import defaultdict, namedtuple
+import hashlib
+import json
+import os
+from collections import defaultdict, deque, namedtuple
 
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
@@ -97,25 +100,17 @@ class StatefulObject(models.Model):
             # Fallthrough: got as close as we're going
             return klass
 
-    @classmethod
-    def _build_maps(cls):
-        """Populate route_map and transition_map attributes by introspection of
-           this class and related StateChangeJob classes.  It is legal to call this
-           twice or concurrently.
+    @staticmethod
+    def _transition_options(cls_):
+        """Return a map of each state to the states reachable from it with one
+           StateChangeJob, and a map of each (from, to) pair to its StateChangeJob class.
         """
-        if cls.route_map is not None:
-            return
-
-        cls_ = StatefulObject.so_root(cls)
-
-        transition_classes = [
-            s
-            for s in all_subclasses(StateChangeJob)
-            if ((s.state_transition is not None) and (s.state_transition.class_ == cls_))
-        ]
         transition_options = defaultdict(list)
         job_class_map = {}
-        for c in transition_classes:
+        for c in all_subclasses(StateChangeJob):
+            if (c.state_transition is None) or (c.state_transition.class_ != cls_):
+                continue
+
             to_state = c.state_transition.new_state
             if isinstance(c.state_transition.old_state, list):
                 from_states = c.state_transition.old_state
@@ -126,54 +121,111 @@ class StatefulObject(models.Model):
                 transition_options[from_state].append(to_state)
                 job_class_map[(from_state, to_state)] = c
 
-        transition_map = defaultdict(list)
-        route_map = {}
-        for begin_state in cls_.states:
-            all_routes = set()
-
-            # Enumerate all possible routes from this state
-            def get_routes(stack, explore_state):
-                if explore_state in stack:
-                    all_routes.add(tuple(stack))
-                    return
+        return transition_options, job_class_map
 
-                stack = stack + [explore_state]
+    @staticmethod
+    def _shortest_routes(states, transition_options):
+        """Breadth first search from each of states, returning the shortest route (a tuple
+           of states) for every (begin, end) pair where end is reachable from begin.
+        """
+        route_map = {}
+        for begin_state in states:
+            routes = {begin_state: (begin_state,)}
+            frontier = deque([begin_state])
+            while frontier:
+                route = routes[frontier.popleft()]
+                for next_state in transition_options.get(route[-1], []):
+                    if next_state not in routes:
+                        routes[next_state] = route + (next_state,)
+                        frontier.append(next_state)
+                        route_map[(begin_state, next_state)] = routes[next_state]
+
+        return route_map
 
-                if len(transition_options[explore_state]) == 0:
-                    if len(stack) > 1:
-                        all_routes.add(tuple(stack))
-                    return
+    @classmethod
+    def _set_maps(cls, route_map, job_class_map):
+        """Freeze the maps onto this class, route_map last so that a concurrent caller
+           of _build_maps only sees it once the other maps are in place"""
+        transition_map = dict((state, []) for state in cls.states)
+        for (begin_state, end_state) in route_map:
+            transition_map.setdefault(begin_state, []).append(end_state)
 
-                for next_state in transition_options[explore_state]:
-                    get_routes(stack, next_state)
+        cls.job_class_map = job_class_map
+        cls.transition_map = dict((state, tuple(end_states)) for (state, end_states) in transition_map.items())
+        cls.route_map = route_map
 
-            get_routes([], begin_state)
+    @classmethod
+    def _build_maps(cls):
+        """Populate route_map and transition_map attributes by introspection of
+           this class and related StateChangeJob classes.  It is legal to call this
+           twice or concurrently.
+        """
+        if cls.route_map is not None:
+            return
 
-            # For all valid routes with more than 2 states,
-            # all truncations of 2 or more states are also valid routes.
-            truncations = set()
-            for r in all_routes:
-                for i in range(2, len(r)):
-                    truncations.add(tuple(r[0:i]))
-            all_routes = all_routes | truncations
+        cls_ = StatefulObject.so_root(cls)
 
-            routes = defaultdict(list)
-            # Build a map of end state to list of ways of getting there
-            for route in all_routes:
-                routes[route[-1]].append(route)
+        transition_options, job_class_map = StatefulObject._transition_options(cls_)
+        cls_._set_maps(StatefulObject._shortest_routes(cls_.states, transition_options), job_class_map)
 
-            # Pick the shortest route to each end state
-            for (end_state, possible_routes) in routes.items():
-                possible_routes.sort(lambda a, b: cmp(len(a), len(b)))
-                shortest_route = possible_routes[0]
+    @staticmethod
+    def build_all_maps(cache_path=None):
+        """Build the route and transition maps of every StatefulObject class up front, rather
+           than on the first request for each.
 
-                transition_map[begin_state].append(end_state)
-                route_map[(begin_state, end_state)] = shortest_route
+           If cache_path is given the routes are read from that file when it was written for
+           the same StateChangeJob definitions, and written to it otherwise.
+        """
+        roots = []
+        for klass in all_subclasses(StatefulObject):
+            if not klass._meta.abstract and StatefulObject.so_root(klass) is klass and klass.states:
+                roots.append(klass)
+
+        options = {}
+        for klass in roots:
+            options[klass] = StatefulObject._transition_options(klass)
+
+        def label(klass):
+            return "%s.%s" % (klass.__module__, klass.__name__)
+
+        signature = hashlib.sha1(
+            json.dumps(
+                sorted(
+                    [label(klass), list(klass.states)]
+                    + sorted([from_state, to_state, label(c)] for ((from_state, to_state), c) in job_classes.items())
+                    for (klass, (transition_options, job_classes)) in options.items()
+                )
+            )
+        ).hexdigest()
+
+        cached = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path) as f:
+                    content = json.load(f)
+                if content["signature"] == signature:
+                    cached = content["routes"]
+            except (IOError, ValueError, KeyError):
+                job_log.warning("Ignoring unreadable route cache %s" % cache_path)
+
+        routes = {}
+        for klass in roots:
+            transition_options, job_class_map = options[klass]
+            if label(klass) in cached:
+                route_map = dict(((route[0], route[-1]), tuple(route)) for route in cached[label(klass)])
+            else:
+                route_map = StatefulObject._shortest_routes(klass.states, transition_options)
+            klass._set_maps(route_map, job_class_map)
+            routes[label(klass)] = sorted(route_map.values())
 
-        cls_.route_map = route_map
-        cls_.transition_map = transition_map
+        if cache_path and set(routes) != set(cached):
+            try:
+                with open(cache_path, "w") as f:
+                    json.dump({"signature": signature, "routes": routes}, f)
+            except IOError as e:
+                job_log.warning("Failed to write route cache %s: %s" % (cache_path, e))
 
-        cls_.job_class_map = job_class_map
+        return signature
 
     @classmethod
     def get_route(cls, begin_state, end_state):
@@ -204,7 +256,7 @@ class StatefulObject(models.Model):
             if self.transition_map is None:
                 self.__class__._build_maps()
 
-            return list(set(self.transition_map[begin_state]))
+            return list(self.transition_map[begin_state])
 
     def get_verb(self, begin_state, end_state):
         """Return the GUI short (verb) and long description of the Job that is last in the route between the states
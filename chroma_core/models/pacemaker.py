@@ -66,6 +66,8 @@ class PacemakerConfiguration(DeletableStatefulObject):
 
 class StonithNotEnabledAlert(AlertStateBase):
     default_severity = logging.ERROR
+    # Only raised and lowered by the corosync service
+    index_active = True
 
     class Meta:
         app_label = "chroma_core"
@@ -3,11 +3,13 @@
 # license that can be found in the LICENSE file.
 
 
+import array
 import itertools
 import collections
 import calendar
 import operator
 import functools
+import threading
 from datetime import datetime, timedelta
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
@@ -76,14 +78,239 @@ epoch = datetime.fromtimestamp(0, utc)
 Point.zero = Point(epoch, 0.0, 0)
 
 
-class Cache(collections.defaultdict):
-    "Simple cache of limited size;  doesn't need to be LRU yet."
+class Cache(dict):
+    """Cache of limited size, evicting the least recently used keys.
+    The recency order is shared by every reader, so it is only modified under a lock.
+    """
+
     SIZE = 1e5
 
+    def __init__(self, default_factory):
+        dict.__init__(self)
+        self.default_factory = default_factory
+        self.used = collections.OrderedDict()  # keys, least recently used first
+        self.lock = threading.Lock()
+
+    def __missing__(self, key):
+        if self.default_factory is None:
+            raise KeyError(key)
+        value = self[key] = self.default_factory()
+        return value
+
+    def touch(self, key):
+        "Mark key as the most recently used."
+        with self.lock:
+            self.used.pop(key, None)
+            self.used[key] = None
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        self.touch(key)
+        return value
+
     def __setitem__(self, key, value):
-        collections.defaultdict.__setitem__(self, key, value)
-        if len(self) > self.SIZE:
-            self.clear()
+        dict.__setitem__(self, key, value)
+        self.touch(key)
+        while len(self) > self.SIZE:
+            with self.lock:
+                if not self.used:
+                    break
+                key = next(iter(self.used))
+            self.pop(key, None)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        with self.lock:
+            self.used.pop(key, None)
+
+    def pop(self, key, *default):
+        with self.lock:
+            self.used.pop(key, None)
+        return dict.pop(self, key, *default)
+
+    def clear(self):
+        dict.clear(self)
+        with self.lock:
+            self.used.clear()
+
+
+def micros(dt):
+    "Return utc timestamp in microseconds from datetime."
+    return timestamp(dt) * 1000000 + dt.microsecond
+
+
+class PointRing(object):
+    """Ring buffer of the most recent points of a series.
+    Points are held as columns of timestamps, sums and lens, rather than as Point tuples.
+    """
+
+    __slots__ = "maxlen", "start", "dts", "sums", "lens"
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self.start = 0  # index of the earliest point
+        # microsecond timestamps are held exactly by doubles, and doubles are 64 bits on every platform
+        self.dts = array.array("d")
+        self.sums = array.array("d")
+        self.lens = array.array("l")
+
+    def __len__(self):
+        return len(self.dts)
+
+    def point(self, index):
+        return Point(epoch + timedelta(microseconds=self.dts[index]), self.sums[index], self.lens[index])
+
+    def __getitem__(self, index):
+        size = len(self.dts)
+        if not -size <= index < size:
+            raise IndexError("PointRing index out of range")
+        return self.point((self.start + index) % size)
+
+    def __iter__(self):
+        size = len(self.dts)
+        for index in range(size):
+            yield self.point((self.start + index) % size)
+
+    def append(self, point):
+        if len(self.dts) < self.maxlen:
+            self.dts.append(micros(point.dt))
+            self.sums.append(point.sum)
+            self.lens.append(point.len)
+        else:
+            index = self.start
+            self.dts[index], self.sums[index], self.lens[index] = micros(point.dt), point.sum, point.len
+            self.start = (index + 1) % self.maxlen
+
+    def __iadd__(self, points):
+        for point in points:
+            self.append(point)
+        return self
+
+    def between(self, start, stop):
+        "Generate points within the interval start <= dt < stop."
+        start, stop, size = micros(start), micros(stop), len(self.dts)
+        for index in range(size):
+            index = (self.start + index) % size
+            if start <= self.dts[index] < stop:
+                yield self.point(index)
+
+    @property
+    def nbytes(self):
+        "Return bytes used by the point columns."
+        return sum(column.buffer_info()[1] * column.itemsize for column in (self.dts, self.sums, self.lens))
+
+
+class RateWindow(object):
+    """Points of a series selected for a window, in buckets as Sample.reduce groups them,
+    and the rate of change between consecutive buckets.
+    """
+
+    def __init__(self, model, reduce, start, stop):
+        self.model, self.reduce = model, reduce
+        self.start, self.stop = start, stop
+        self.buckets = collections.deque()  # [dt, selected points, reduced point]
+        self.rates = collections.deque()  # rate of change from each bucket to the next
+        self.selected = 0  # number of selected points held
+
+    @property
+    def size(self):
+        "Number of points held: selected, reduced for each bucket, and the rates between them."
+        return self.selected + (len(self.buckets) if self.reduce else 0) + len(self.rates)
+
+    @property
+    def last_dt(self):
+        return self.buckets[-1][1][-1].dt if self.buckets else None
+
+    def bucket_point(self, dt, points):
+        return Point(dt, *sum(points, Point.zero)[1:]) if self.reduce else points[0]
+
+    def extend(self, points, stop):
+        "Add points selected after the last, deriving rates only for the buckets they change."
+        for point in points:
+            dt = self.model.round(point.dt) if self.reduce else point.dt
+            if self.buckets and self.buckets[-1][0] == dt:
+                bucket = self.buckets[-1]
+                bucket[1].append(point)
+                bucket[2] = self.bucket_point(dt, bucket[1])
+                if len(self.buckets) > 1:
+                    self.rates[-1] = bucket[2] - self.buckets[-2][2]
+            else:
+                bucket = [dt, [point], self.bucket_point(dt, [point])]
+                if self.buckets:
+                    self.rates.append(bucket[2] - self.buckets[-1][2])
+                self.buckets.append(bucket)
+            self.selected += 1
+        self.stop = stop
+
+    def trim(self, start):
+        "Discard points selected before start."
+        while self.buckets and self.buckets[0][1][0].dt < start:
+            bucket = self.buckets[0]
+            points = [point for point in bucket[1] if point.dt >= start]
+            self.selected -= len(bucket[1]) - len(points)
+            if points:
+                bucket[1:] = points, self.bucket_point(bucket[0], points)
+                if len(self.buckets) > 1:
+                    self.rates[0] = self.buckets[1][2] - bucket[2]
+                break
+            self.buckets.popleft()
+            if self.rates:
+                self.rates.popleft()
+        self.start = start
+
+
+class RateCache(object):
+    """Cache of RateWindows, keyed by series id, Sample table step and window length,
+    so that a window sliding forward only selects and derives its new points.
+    The number of points held is limited to `size`, evicting the least recently used windows.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.windows = collections.OrderedDict()
+        self.count = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, model, id, start, stop):
+        return id, model.step, int(total_seconds(stop - start)) // model.step
+
+    def pop(self, model, id, start, stop):
+        "Return the window for the same series and length, if it can be moved forward to start and stop."
+        with self.lock:
+            window = self.windows.pop(self.key(model, id, start, stop), None)
+            if window is not None:
+                self.count -= window.size
+                if window.buckets and window.start <= start and window.stop <= stop:
+                    self.hits += 1
+                    return window
+            self.misses += 1
+
+    def put(self, id, window):
+        with self.lock:
+            key = self.key(window.model, id, window.start, window.stop)
+            previous = self.windows.pop(key, None)
+            if previous is not None:
+                self.count -= previous.size
+            self.windows[key] = window
+            self.count += window.size
+            while self.count > self.size and self.windows:
+                self.count -= self.windows.popitem(last=False)[1].size
+
+    def discard(self, id):
+        with self.lock:
+            for key in [key for key in self.windows if key[0] == id]:
+                self.count -= self.windows.pop(key).size
+
+    def clear(self):
+        with self.lock:
+            self.windows.clear()
+            self.count = 0
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "windows": len(self.windows), "points": self.count}
 
 
 class Series(models.Model):
@@ -147,11 +374,25 @@ class Sample(models.Model):
         "Return most recent data point for series."
         return (cls.cache[id] or list(cls.select(id, order_by="-dt", limit=1)) or [Point.zero])[-1]
 
+    @classmethod
+    def latest_many(cls, ids):
+        "Return most recent datetimes for many series, selecting those not cached in one query."
+        latest = dict((id, cls.cache[id][-1].dt) for id in ids if cls.cache.get(id))
+        uncached = [id for id in ids if id not in latest]
+        if uncached:
+            latest.update(cls.objects.filter(id__in=uncached).values_list("id").annotate(models.Max("dt")))
+        return dict((id, latest.get(id, epoch)) for id in ids)
+
     @classmethod
     def start(cls, id):
         "Return earliest datetime that should be stored for series."
+        return cls.start_from(cls.latest(id).dt)
+
+    @classmethod
+    def start_from(cls, latest):
+        "Return earliest datetime that should be stored for series with the given most recent datetime."
         try:
-            return cls.latest(id).dt - cls.expiration_time
+            return latest - cls.expiration_time
         except OverflowError:
             return epoch
 
@@ -215,7 +456,7 @@ class Stats(list):
     def __init__(self, samples):
         maxlen = max(map(div_samplerate, samples[1:], samples[:-1]))
         for sample in samples:
-            cache = Cache(functools.partial(collections.deque, maxlen=maxlen))
+            cache = Cache(functools.partial(PointRing, maxlen))
             namespace = {
                 "__module__": "chroma_core.models",
                 "step": sample.sample_rate,
@@ -225,13 +466,17 @@ class Stats(list):
                 "cache": cache,
             }
             self.append(type("Sample_{0:d}".format(sample.sample_rate), (Sample,), namespace))
+        self.rate_cache = RateCache(settings.STATS_RATE_CACHE_SIZE)
 
     def insert(self, samples):
-        "Bulk insert new samples (id, dt, value).  Skip and return outdated samples."
+        """Bulk insert new samples (id, dt, value).  Skip and return outdated samples.
+        Samples may be gathered from many reports, so a repeated (id, dt) is also outdated.
+        """
         # keep stats as Points grouped by id
-        outdated, stats = [], collections.defaultdict(list)
+        outdated, stats, seen = [], collections.defaultdict(list), set()
         for id, dt, value in samples:
-            if dt > self[0].latest(id).dt:
+            if dt > self[0].latest(id).dt and (id, dt) not in seen:
+                seen.add((id, dt))
                 stats[id].append(Point(dt, value, 1))
             else:
                 outdated.append((id, dt, value))
@@ -246,7 +491,7 @@ class Stats(list):
                 # aggregate from previous Sample as necessary
                 if start < stop:
                     if cache and start >= cache[0].dt and stop <= cache[-1].dt:  # use cache if full
-                        points = (point for point in cache if start <= point.dt < stop and point.len)
+                        points = (point for point in cache.between(start, stop) if point.len)
                     else:
                         points = previous.select(id, dt__gte=start, dt__lt=stop)
                     points = list(model.reduce(points))
@@ -263,12 +508,60 @@ class Stats(list):
         Optionally limit number of points by increasing sample resolution.
         Optionally return fixed intervals with padding and arbitrary resolution.
         """
+        return self.select_many([id], start, stop, [id] if rate else (), maxlen, fixed)[id]
+
+    def select_many(self, ids, start, stop, rate_ids=(), maxlen=float("inf"), fixed=0):
+        """Return points for many series, as `select` would return for each, keyed by series id.
+        Rate of change is derived for series in rate_ids, reusing the window cached for a previous select.
+        Points are selected with one query for each Sample table, rather than for each series.
+        """
         minstep = total_seconds(stop - start) / maxlen
+        remaining, chosen = set(ids), {}
+        for model in self:
+            if model.step >= minstep and remaining:
+                for id, latest in model.latest_many(remaining).items():
+                    if start >= model.start_from(latest):
+                        chosen[id] = model
+                remaining.difference_update(chosen)
+        chosen.update(dict.fromkeys(remaining, self[-1]))
+
+        result = {}
         for index, model in enumerate(self):
-            if start >= model.start(id) and model.step >= minstep:
-                break
-        points = model.select(id, dt__gte=start, dt__lt=stop)
-        points = list(points if index else model.reduce(points))
+            model_ids = [id for id in ids if chosen[id] is model]
+            windows, selected = {}, collections.defaultdict(list)
+            for id in model_ids:
+                window = self.rate_cache.pop(model, id, start, stop) if id in rate_ids else None
+                cache = model.cache.get(id)
+                if window is not None:
+                    windows[id] = window
+                elif cache and start >= cache[0].dt:  # the cache holds every point written since its earliest
+                    selected[id] = list(cache.between(start, stop))
+            uncached = [id for id in model_ids if id not in windows and id not in selected]
+            if uncached:
+                query = model.objects.filter(id__in=uncached, dt__gte=start, dt__lt=stop).order_by("id", "dt")
+                for row in query.values_list("id", *Point._fields):
+                    selected[row[0]].append(Point(*row[1:]))
+            if windows:
+                # select only the points after those already in each window
+                earliest = min(max(window.last_dt, start) for window in windows.values())
+                query = model.objects.filter(id__in=list(windows), dt__gte=earliest, dt__lt=stop)
+                for row in query.order_by("id", "dt").values_list("id", *Point._fields):
+                    if row[1] > windows[row[0]].last_dt and row[1] >= start:
+                        selected[row[0]].append(Point(*row[1:]))
+            for id in model_ids:
+                if id in rate_ids:
+                    window = windows.get(id) or RateWindow(model, not index, start, stop)
+                    window.trim(start)
+                    window.extend(selected[id], stop)
+                    self.rate_cache.put(id, window)
+                    result[id] = self.resample(list(window.rates), start, stop, False, fixed)
+                else:
+                    points = selected[id] if index else list(model.reduce(selected[id]))
+                    result[id] = self.resample(points, start, stop, False, fixed)
+        return result
+
+    def resample(self, points, start, stop, rate=False, fixed=0):
+        "Optionally derive the rate of change of points, and return fixed intervals."
         if rate:
             points = map(operator.sub, points[1:], points[:-1])
         if fixed:
@@ -288,11 +581,19 @@ class Stats(list):
         "Delete all stored points for a series."
         for model in self:
             model.delete(id=id)
+            model.cache.pop(id, None)
+        self.rate_cache.discard(id)
 
     def delete_all(self):
         "Delete all stored points for a series."
         for model in self:
             model.delete(id__gte=0)
+            model.cache.clear()
+        self.rate_cache.clear()
+
+    def memory_usage(self):
+        "Return number of cached series and bytes used by their points, for each Sample table."
+        return [(model.step, len(model.cache), sum(ring.nbytes for ring in model.cache.values())) for model in self]
 
 
 Stats = Stats(SAMPLES)
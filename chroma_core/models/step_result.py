@@ -85,6 +85,29 @@ class StepResult(models.Model):
     def describe(self):
         return self.step_class.describe(self.args)
 
+    def get_console(self):
+        """Console output of this step: any written to the console field before console
+        chunks existed, followed by the content of its chunks"""
+        return self.console + "".join(chunk.content for chunk in self.console_chunks.all())
+
     class Meta:
         app_label = "chroma_core"
         ordering = ["id"]
+
+
+class StepConsoleChunk(models.Model):
+    """
+    A piece of the console output of a step.  Console output is appended as new chunks
+    while the step runs rather than rewriting StepResult.console, so that it can be
+    streamed (by sequence) or paged through without loading all of it.
+    """
+
+    step_result = models.ForeignKey(StepResult, related_name="console_chunks")
+    sequence = models.IntegerField(help_text="Zero-based index of this chunk within the console of its step")
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = "chroma_core"
+        ordering = ["sequence"]
+        unique_together = ("step_result", "sequence")
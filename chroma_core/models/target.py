@@ -1823,6 +1823,8 @@ class TargetFailoverAlert(AlertStateBase):
     # The filesystem should remain available while a target is failed over, but
     # performance may be degraded, therefore it's worse than INFO, but not as bad as ERROR.
     default_severity = logging.WARNING
+    # Only raised and lowered by the job_scheduler service
+    index_active = True
 
     def alert_message(self):
         return "Target %s running on secondary server" % self.alert_item
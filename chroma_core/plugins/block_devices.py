@@ -2,7 +2,10 @@
 # Use of this source code is governed by a MIT-style
 # license that can be found in the LICENSE file.
 
+import hashlib
 import json
+import threading
+import time
 from logging import DEBUG
 
 import settings
@@ -12,19 +15,91 @@ log = log_register("plugin_runner")
 log.setLevel(DEBUG)
 
 
-def _fetch_aggregator():
+class AggregatorSnapshot(object):
+    """One version of the device aggregator's content, parsed once and split into the
+    devices of each host.
+
+    Each host's devices are kept serialized, so that every caller gets its own copy to
+    modify at the cost of parsing that host's devices alone.
+
+    """
+
+    def __init__(self, version, payload, etag=None, last_modified=None, fetched_at=None):
+        self.version = version
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+        self._hosts = dict((fqdn, json.dumps(devices)) for fqdn, devices in json.loads(payload).items())
+
+    def validators(self):
+        """Headers which make a request for the aggregator's content conditional on it having changed"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def get_devices(self, fqdn):
+        return json.loads(self._hosts[fqdn])
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _fetch_aggregator(max_age=0):
+    """The AggregatorSnapshot of the aggregator's current content.
+
+    The last snapshot is reused if it was fetched within max_age seconds.  Otherwise the content
+    is fetched, conditionally when the aggregator gave an ETag or Last-Modified, but only parsed
+    again when its hash differs from the last version.  The lock is held only to read and replace
+    the snapshot, so that callers do not wait on one another's requests.
+    """
+    global _snapshot
     import requests
 
-    resp = requests.get(settings.DEVICE_AGGREGATOR_URL)
-    payload = resp.text
+    with _snapshot_lock:
+        snapshot = _snapshot
+
+    if snapshot is not None and time.time() - snapshot.fetched_at < max_age:
+        return snapshot
+
+    requested_at = time.time()
+    resp = requests.get(settings.DEVICE_AGGREGATOR_URL, headers=snapshot.validators() if snapshot else {})
+    if snapshot is not None and resp.status_code == 304:
+        with _snapshot_lock:
+            snapshot.fetched_at = requested_at
+        return snapshot
+    resp.raise_for_status()
+
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    version = hashlib.sha1(resp.content).hexdigest()
+
+    if snapshot is not None and snapshot.version == version:
+        with _snapshot_lock:
+            snapshot.etag = etag
+            snapshot.last_modified = last_modified
+            snapshot.fetched_at = requested_at
+        return snapshot
+
+    log.debug("Device aggregator content changed (%s)" % version)
+    snapshot = AggregatorSnapshot(version, resp.text, etag, last_modified, requested_at)
+
+    with _snapshot_lock:
+        # A concurrent caller may have replaced the snapshot with a later fetch meanwhile
+        if _snapshot is None or _snapshot.fetched_at <= requested_at:
+            _snapshot = snapshot
 
-    return json.loads(payload)
+    return snapshot
 
 
-def get_devices(fqdn):
+def get_devices(fqdn, max_age=0):
     try:
-        _data = _fetch_aggregator()
-        return _data[fqdn]
+        _data = _fetch_aggregator(max_age)
+        return _data.get_devices(fqdn)
     except Exception as e:
         log.error(
             "iml-device-aggregator is not providing expected data, ensure "
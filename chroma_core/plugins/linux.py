@@ -24,6 +24,7 @@ from chroma_core.lib.storage_plugin.base_resource import HostsideResource
 from chroma_core.models import ManagedHost
 from chroma_core.models import VolumeNode
 from settings import SERIAL_PREFERENCE
+from settings import DEVICE_AGGREGATOR_MAX_AGE
 
 log = log_register("plugin_runner")
 log.setLevel(DEBUG)
@@ -212,7 +213,8 @@ class Linux(Plugin):
             reported_device_node_paths = []
 
             fqdn = ManagedHost.objects.get(id=host_id).fqdn
-            devices = get_devices(fqdn)
+            # Sessions starting together share one fetch, but a report of a change needs the latest content
+            devices = get_devices(fqdn, DEVICE_AGGREGATOR_MAX_AGE if initial_scan else 0)
 
             # use info from IML 4.0
             if not devices and data:
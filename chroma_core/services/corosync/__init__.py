@@ -3,6 +3,8 @@
 # license that can be found in the LICENSE file.
 
 
+import json
+import time
 from collections import namedtuple, defaultdict
 
 from django.db import transaction
@@ -15,8 +17,11 @@ from chroma_core.services.queue import AgentRxQueue
 from chroma_core.services.job_scheduler import job_scheduler_notify
 from chroma_core.models import CorosyncNoPeersAlert
 from chroma_core.models import StonithNotEnabledAlert
+from chroma_core.models.alert import active_alert_index
 from iml_common.lib.date_time import IMLDateTime
 
+import settings
+
 log = log_register(__name__)
 
 
@@ -37,19 +42,78 @@ class Service(ChromaService):
     #  a HostStatus object is created for each host that is reported
     HostStatus = namedtuple("HostStatus", ["status", "datetime"])
 
+    #  Class to store the content of a processed report, less its datetime, and when it was processed
+    ReportFingerprint = namedtuple("ReportFingerprint", ["content", "time"])
+
     def __init__(self):
         super(Service, self).__init__()
 
         #  Holds each host seen as a key with a HostStatus value last set
         self._host_status = defaultdict(self.HostStatus)
 
+        #  Holds each reporting host's fqdn as a key with a ReportFingerprint value of the last report processed
+        self._report_fingerprints = {}
+        #  Holds each reporting host's fqdn as a key with the content of the last report received from it
+        self._report_contents = {}
+        self.processed_count = 0
+        self.skipped_count = 0
+
         self._queue = AgentRxQueue(Service.PLUGIN_NAME)
 
+    def _report_content(self, body):
+        crm_info = body.get("crm_info") or {}
+        return json.dumps([body.get("state"), crm_info.get("nodes"), crm_info.get("options")], sort_keys=True)
+
+    def _skip_report(self, fqdn, content):
+        """If the report is the same as the last one processed from this host, and that was processed
+        within COROSYNC_REPORT_REFRESH_INTERVAL, return True: the report would change nothing.
+        """
+        fingerprint = self._report_fingerprints.get(fqdn)
+
+        return (
+            fingerprint is not None
+            and fingerprint.content == content
+            and time.time() - fingerprint.time < settings.COROSYNC_REPORT_REFRESH_INTERVAL
+        )
+
+    def _refresh_host_status(self, body):
+        """Move the sample times of the peers in a skipped report forward, as if it had been processed"""
+        try:
+            dt = IMLDateTime.parse(body["crm_info"]["datetime"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        for peer_node_identifier in body["crm_info"].get("nodes") or {}:
+            host_status = self._host_status.get(peer_node_identifier)
+            if host_status is not None and host_status.datetime < dt:
+                self._host_status[peer_node_identifier] = host_status._replace(datetime=dt)
+
+    def on_data(self, fqdn, body):
+        """Process all incoming messages from the Corosync agent plugin, skipping those identical
+        to the last one processed from the same host.
+        """
+        content = self._report_content(body)
+        if self._skip_report(fqdn, content):
+            self._refresh_host_status(body)
+            self.skipped_count += 1
+            return
+
+        content_changed = self._report_contents.get(fqdn) != content
+        self._report_contents[fqdn] = content
+
+        # The alerts are notified within _process_report's transaction, so only index them once it commits
+        with active_alert_index.deferred():
+            applied = self._process_report(fqdn, body, content_changed)
+
+        if applied:
+            self._report_fingerprints[fqdn] = self.ReportFingerprint(content=content, time=time.time())
+        self.processed_count += 1
+
     # Using transaction decorator to ensure that subsequent calls
     # see fresh data when polling the ManagedHost model.
     @transaction.atomic
-    def on_data(self, fqdn, body):
-        """Process all incoming messages from the Corosync agent plugin
+    def _process_report(self, fqdn, body, content_changed=True):
+        """Process a message from the Corosync agent plugin
 
         Request to have the status changed for an instance.  If the current
         state determines that a host is offline, then raise that alert.
@@ -58,6 +122,11 @@ class Service(ChromaService):
 
         datetime is in UTC of the node's localtime in the standard
         ISO string format
+
+        :param content_changed: Whether the report differs from the last one received from this host,
+                                in which case the next reports from its peers are processed too
+        :return: True if the message was applied in full, False if it was dropped because the host is
+                 unknown or corosync is not configured, or if any of its peer statuses were out of date
         """
 
         try:
@@ -67,11 +136,11 @@ class Service(ChromaService):
             # processed. Something has spoken to us and we don't know anything about it so really we can't do anything
             # other than drop it.
             log.warning("Corosync message from unknown host %s, the message was dropped." % fqdn)
-            return
+            return False
 
         # If corosync is not configured yet, or we don't actually have corosync - then ignore the input
         if (not host.corosync_configuration) or host.corosync_configuration.state == "unconfigured":
-            return
+            return False
 
         if body.get("state"):
             job_scheduler_notify.notify(
@@ -83,10 +152,10 @@ class Service(ChromaService):
             )
 
             if body["state"]["corosync"] == "stopped":
-                return
+                return True
         else:
             if host.corosync_configuration.state != "started":
-                return
+                return True
 
         if body.get("crm_info"):
             nodes = body["crm_info"]["nodes"]
@@ -117,10 +186,17 @@ class Service(ChromaService):
             log.debug("Incoming peer report from %s:  %s" % (fqdn, peers_str))
 
             # NB: This will ignore any unknown peers in the report.
-            cluster_nodes = ManagedHost.objects.select_related("ha_cluster_peers").filter(
+            cluster_nodes = ManagedHost.objects.prefetch_related("ha_cluster_peers").filter(
                 Q(nodename__in=nodes.keys()) | Q(fqdn__in=nodes.keys())
             )
 
+            # If this host's view of the cluster has changed, reports from the peers may now re-assert a
+            # different view, so process their next ones
+            if content_changed:
+                for cluster_node in cluster_nodes:
+                    if cluster_node.fqdn != fqdn:
+                        self._report_fingerprints.pop(cluster_node.fqdn, None)
+
             unknown_nodes = (
                 set(nodes.keys()) - set([h.nodename for h in cluster_nodes]) - set([h.fqdn for h in cluster_nodes])
             )
@@ -138,6 +214,7 @@ class Service(ChromaService):
             # CorosyncToManyPeersAlert.notify(host.corosync_configuration, len(cluster_nodes) > 2)
 
             #  Consider all nodes in the peer group for this reporting agent
+            applied = True
             for host in cluster_nodes:
                 try:
                     data = nodes[host.nodename]
@@ -173,6 +250,12 @@ class Service(ChromaService):
 
                     #  Keep internal track of the hosts state.
                     self._host_status[node_identifier] = self.HostStatus(status=host_reported_online, datetime=dt)
+                elif not is_new(node_identifier):
+                    applied = False
+
+            return applied
+
+        return True
 
     def run(self):
         super(Service, self).run()
@@ -5,8 +5,12 @@
 
 import Queue
 import threading
-from chroma_core.services import _amqp_connection, log_register
-from chroma_core.services.queue import ServiceQueue
+from collections import deque
+
+import gevent.event
+
+from chroma_core.services import log_register
+from chroma_core.services.queue import ServiceQueue, QueuePublisher
 
 
 class AgentTxQueue(ServiceQueue):
@@ -41,19 +45,54 @@ class HostQueueCollection(object):
 
     def send(self, message):
         queues = self.get(message["fqdn"])
-        queues.tx.put(message)
+        queues.put_tx(message)
 
     def receive(self, message):
         self.plugin_rx_queue.put(message)
 
 
 class HostQueues(object):
-    """Outgoing messages for a single host"""
+    """Outgoing messages for a single host
+
+    A GET waiting for messages sleeps on a gevent event which is set when a message
+    is queued, so that long-polling agents cost a greenlet each and no thread queue.
+    """
 
     def __init__(self, fqdn):
         self.fqdn = fqdn
-        self.tx = Queue.Queue()
         self.tx_lock = threading.Lock()
+        self._tx = deque()
+        self._tx_ready = gevent.event.Event()
+
+    def put_tx(self, message):
+        self._tx.append(message)
+        self._tx_ready.set()
+
+    def put_back_tx(self, message):
+        """Return a message taken with get_tx to the head of the queue"""
+        self._tx.appendleft(message)
+        self._tx_ready.set()
+
+    def get_tx(self):
+        """Take the next message without waiting, or raise Queue.Empty"""
+        try:
+            return self._tx.popleft()
+        except IndexError:
+            raise Queue.Empty()
+
+    def wait_tx(self, timeout):
+        """Wait up to `timeout` seconds for a message.
+
+        :return: True if there is a message to get
+        """
+        if not self._tx:
+            self._tx_ready.clear()
+            self._tx_ready.wait(timeout)
+        return len(self._tx) > 0
+
+    @property
+    def tx_len(self):
+        return len(self._tx)
 
 
 class AmqpRxForwarder(object):
@@ -62,22 +101,16 @@ class AmqpRxForwarder(object):
         self._queue_collection = queue_collection
 
     def run(self):
-        with _amqp_connection() as conn:
-            while not self._stopping.is_set():
-                try:
-                    msg = self._queue_collection.plugin_rx_queue.get(block=True, timeout=1)
-                except Queue.Empty:
-                    pass
-                else:
-                    plugin_name = msg["plugin"]
-                    rx_queue_name = "agent_%s_rx" % plugin_name
-                    q = conn.SimpleQueue(
-                        rx_queue_name,
-                        serializer="json",
-                        exchange_opts={"durable": False},
-                        queue_opts={"durable": False},
-                    )
-                    q.put(msg)
+        publisher = QueuePublisher.get_instance()
+        while not self._stopping.is_set():
+            try:
+                msg = self._queue_collection.plugin_rx_queue.get(block=True, timeout=1)
+            except Queue.Empty:
+                pass
+            else:
+                plugin_name = msg["plugin"]
+                rx_queue_name = "agent_%s_rx" % plugin_name
+                publisher.put(rx_queue_name, msg)
 
     def stop(self):
         self._stopping.set()
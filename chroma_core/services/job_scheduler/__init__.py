@@ -13,7 +13,7 @@ from django.db.models.query_utils import Q
 from chroma_core.services.job_scheduler.mail_alerts import MailAlerts
 from chroma_core.services.job_scheduler import job_scheduler_notify
 from chroma_core.services import ChromaService, ServiceThread, log_register
-from chroma_core.models.jobs import Job
+from chroma_core.models.jobs import Job, StatefulObject
 from chroma_core.models.command import Command
 from iml_common.lib.date_time import IMLDateTime
 
@@ -25,51 +25,98 @@ log = log_register(__name__)
 class QueueHandler(object):
     """Service ModificationNotificationQueue and call into JobScheduler on message
 
+    If settings.JOB_SCHEDULER_NOTIFICATION_BATCH_SIZE is greater than 1, messages are
+    collected into batches of up to that many, waiting no more than
+    settings.JOB_SCHEDULER_NOTIFICATION_BATCH_LATENCY milliseconds, and each batch
+    is passed to JobScheduler.notify_many.
+
     """
 
     def __init__(self, job_scheduler):
         self._queue = job_scheduler_notify.NotificationQueue()
+        # Disregard any old messages
         self._queue.purge()
         self._job_scheduler = job_scheduler
 
+        self.batch_count = 0
+        self.message_count = 0
+        self.applied_count = 0
+
     def stop(self):
         self._queue.stop()
 
     def run(self):
-        # Disregard any old messages
-        self._queue.serve(self.on_message)
+        if settings.JOB_SCHEDULER_NOTIFICATION_BATCH_SIZE > 1:
+            self._queue.serve_batch(
+                self.on_messages,
+                settings.JOB_SCHEDULER_NOTIFICATION_BATCH_SIZE,
+                settings.JOB_SCHEDULER_NOTIFICATION_BATCH_LATENCY / 1000.0,
+            )
+        else:
+            self._queue.serve(self.on_message)
+
+    def _deserialize(self, message):
+        """
+        :return: An argument list for JobScheduler.notify
+        """
+        # Deserialize any datetimes which were serialized for JSON
+        deserialized_update_attrs = {}
+        model_klass = ContentType.objects.get_by_natural_key(*message["instance_natural_key"]).model_class()
+        for attr, value in message["update_attrs"].items():
+            try:
+                field = [f for f in model_klass._meta.fields if f.name == attr][0]
+            except IndexError:
+                # e.g. _id names, they aren't datetimes so ignore them
+                deserialized_update_attrs[attr] = value
+            else:
+                if isinstance(field, DateTimeField):
+                    deserialized_update_attrs[attr] = IMLDateTime.parse(value)
+                else:
+                    deserialized_update_attrs[attr] = value
+
+        log.debug("on_message: %s %s" % (message, deserialized_update_attrs))
+
+        return (
+            message["instance_natural_key"],
+            message["instance_id"],
+            message["time"],
+            deserialized_update_attrs,
+            message["from_states"],
+        )
 
     def on_message(self, message):
         try:
-            # Deserialize any datetimes which were serialized for JSON
-            deserialized_update_attrs = {}
-            model_klass = ContentType.objects.get_by_natural_key(*message["instance_natural_key"]).model_class()
-            for attr, value in message["update_attrs"].items():
-                try:
-                    field = [f for f in model_klass._meta.fields if f.name == attr][0]
-                except IndexError:
-                    # e.g. _id names, they aren't datetimes so ignore them
-                    deserialized_update_attrs[attr] = value
-                else:
-                    if isinstance(field, DateTimeField):
-                        deserialized_update_attrs[attr] = IMLDateTime.parse(value)
-                    else:
-                        deserialized_update_attrs[attr] = value
-
-            log.debug("on_message: %s %s" % (message, deserialized_update_attrs))
-
-            self._job_scheduler.notify(
-                message["instance_natural_key"],
-                message["instance_id"],
-                message["time"],
-                deserialized_update_attrs,
-                message["from_states"],
-            )
+            self._job_scheduler.notify(*self._deserialize(message))
         except:
             # Log bad messages and continue, swallow the exception to avoid
             # bringing down the whole service
             log.warning("on_message: bad message: %s" % traceback.format_exc())
 
+    def on_messages(self, messages):
+        notifications = []
+        for message in messages:
+            try:
+                notifications.append(self._deserialize(message))
+            except:
+                log.warning("on_messages: bad message: %s" % traceback.format_exc())
+
+        self.batch_count += 1
+        self.message_count += len(messages)
+
+        if not notifications:
+            return
+
+        try:
+            applied = self._job_scheduler.notify_many(notifications)
+        except:
+            log.warning("on_messages: error handling batch: %s" % traceback.format_exc())
+        else:
+            self.applied_count += applied
+            log.debug(
+                "on_messages: batch of %d messages, %d applied after coalescing (%d messages in %d batches)"
+                % (len(messages), applied, self.message_count, self.batch_count)
+            )
+
 
 class Service(ChromaService):
     def __init__(self):
@@ -90,6 +137,9 @@ class Service(ChromaService):
             command.completed(True, True)
         Job.objects.filter(~Q(state="complete")).update(state="complete", cancelled=True)
 
+        # Compute the state transition routes before any request needs them
+        StatefulObject.build_all_maps(settings.JOB_SCHEDULER_ROUTE_CACHE)
+
         self._job_scheduler = JobScheduler()
         self._queue_thread = ServiceThread(QueueHandler(self._job_scheduler))
         self._rpc_thread = ServiceThread(JobSchedulerRpc(self._job_scheduler))
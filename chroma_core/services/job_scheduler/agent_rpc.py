@@ -37,6 +37,8 @@ class ActionInFlight(object):
         self.result = None
         self.subprocesses = []
 
+        self.sent_at = time.time()
+
     def get_request(self):
         return {
             "fqdn": self.fqdn,
@@ -58,6 +60,49 @@ class ActionInFlight(object):
         }
 
 
+class CancelEvent(object):
+    """
+    An event for cancelling a job, which behaves like a threading.Event but also sets any
+    events linked to it when it is set.  This lets a thread wait on a single event for
+    either an RPC to complete or its job to be cancelled.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._linked = set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            linked = list(self._linked)
+
+        for event in linked:
+            event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    def link(self, event):
+        """Set event when this is set, immediately if it already is"""
+        with self._lock:
+            if not self._event.is_set():
+                self._linked.add(event)
+                return
+
+        event.set()
+
+    def unlink(self, event):
+        with self._lock:
+            self._linked.discard(event)
+
+
 class AgentRpcMessenger(object):
     """
     This class consumes AgentRunnerPluginRxQueue, sends
@@ -92,6 +137,14 @@ class AgentRpcMessenger(object):
 
         self._lock = threading.Lock()
 
+        # FQDN to condition notified when its session changes, for threads awaiting a session
+        self._session_changed = defaultdict(lambda: threading.Condition(self._lock))
+
+        # FQDN to number of RPCs awaiting completion, and to [count, total, max] of the
+        # round trip times of completed RPCs
+        self._in_flight = defaultdict(int)
+        self._latency = defaultdict(lambda: [0, 0.0, 0.0])
+
     def run(self):
         try:
             HttpAgentRpc().reset_plugin_sessions(AgentRpcMessenger.PLUGIN_NAME)
@@ -124,12 +177,18 @@ class AgentRpcMessenger(object):
             except KeyError:
                 pass
 
+    def _set_session(self, fqdn, session_id):
+        """Record the session of fqdn and wake the threads awaiting it (call with _lock held)"""
+        self._sessions[fqdn] = session_id
+        if fqdn in self._session_changed:
+            self._session_changed[fqdn].notify_all()
+
     def _abort_session(self, fqdn, message, old_session_id, new_session_id=None):
         log.warning("AgentRpcMessenger.on_rx: aborting session %s because %s" % (old_session_id, message))
         old_rpcs = self._session_rpcs[old_session_id]
 
         if new_session_id is not None:
-            self._sessions[fqdn] = new_session_id
+            self._set_session(fqdn, new_session_id)
         else:
             try:
                 del self._sessions[fqdn]
@@ -156,6 +215,26 @@ class AgentRpcMessenger(object):
             except KeyError:
                 return None
 
+    def _await_session_change(self, fqdn, timeout, old_session_id):
+        """
+        Wait up to timeout seconds (forever if None) for fqdn to have a session other than
+        old_session_id, returning the session or None if there is none after timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+
+        with self._lock:
+            while True:
+                session_id = self._sessions.get(fqdn)
+                if session_id is not None and session_id != old_session_id:
+                    return session_id
+
+                if deadline is None:
+                    self._session_changed[fqdn].wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._session_changed[fqdn].wait(remaining)
+
     def await_restart(self, fqdn, timeout, old_session_id=None):
         """
         If there is currently an action_runner session, wait for a different one.  Else
@@ -166,24 +245,13 @@ class AgentRpcMessenger(object):
 
         log.info("AgentRpcMessenger.await_restart: awaiting %s (old %s)" % (fqdn, old_session_id))
 
-        # Note: using polling here for simplicity, if efficiency became an issue here
-        # we could set up events to be triggered by the new session logic in on_rx, and
-        # sleep on them instead of polling.
-
-        duration = 0
-        poll_period = 1.0
-        while True:
-            current_session_id = self.get_session_id(fqdn)
-
-            if current_session_id is not None and current_session_id != old_session_id:
-                log.info("AgentRpcMessenger.await_restart: %s new %s" % (fqdn, current_session_id))
-                break
+        current_session_id = self._await_session_change(fqdn, timeout, old_session_id)
+        if current_session_id is None:
+            # Keep waiting, as we always have, but let the log show that it's taking too long
+            log.info("AgentRpcMessenger.await_restart: %s timeout after %ss" % (fqdn, timeout))
+            current_session_id = self._await_session_change(fqdn, None, old_session_id)
 
-            if duration >= timeout:
-                log.info("AgentRpcMessenger.await_restart: %s timeout after %ss" % (fqdn, duration))
-
-            duration += poll_period
-            time.sleep(poll_period)
+        log.info("AgentRpcMessenger.await_restart: %s new %s" % (fqdn, current_session_id))
 
     def on_rx(self, message):
         with self._lock:
@@ -197,7 +265,7 @@ class AgentRpcMessenger(object):
                     old_session_id = self._sessions[fqdn]
                     self._abort_session(fqdn, "new session created", old_session_id, session_id)
                 else:
-                    self._sessions[fqdn] = session_id
+                    self._set_session(fqdn, session_id)
             elif message["type"] == "SESSION_TERMINATE":
                 # An agent has timed out or restarted, we're being told its session is now dead
                 if message["fqdn"] in self._sessions:
@@ -272,6 +340,7 @@ class AgentRpcMessenger(object):
             rpc = ActionInFlight(session_id, fqdn, action, args)
 
             self._session_rpcs[session_id][rpc.id] = rpc
+            self._in_flight[fqdn] += 1
             AgentTxQueue().put(rpc.get_request())
             return rpc
 
@@ -289,17 +358,25 @@ class AgentRpcMessenger(object):
     def _complete(self, rpc, cancel_event):
         log.info("AgentRpcMessenger._complete: starting wait for rpc %s" % rpc.id)
 
-        # Wait for rpc.complete, waking up every second to
-        # check cancel_event
-        while True:
+        try:
+            if hasattr(cancel_event, "link"):
+                # Cancellation sets rpc.complete too, so one wait covers both
+                cancel_event.link(rpc.complete)
+                try:
+                    rpc.complete.wait()
+                finally:
+                    cancel_event.unlink(rpc.complete)
+            else:
+                # A plain Event can't wake us, so wake up every second to check it
+                while not (cancel_event.is_set() or rpc.complete.is_set()):
+                    rpc.complete.wait(timeout=1.0)
+
             if cancel_event.is_set():
                 self._send_cancellation(rpc)
                 self._cancelled_rpcs.append(rpc.id)
                 raise AgentCancellation()
-            else:
-                rpc.complete.wait(timeout=1.0)
-                if rpc.complete.is_set():
-                    break
+        finally:
+            self._rpc_done(rpc)
 
         log.info("AgentRpcMessenger._complete: completed wait for rpc %s" % rpc.id)
         if rpc.exception:
@@ -307,6 +384,40 @@ class AgentRpcMessenger(object):
         else:
             return rpc.result
 
+    def _rpc_done(self, rpc):
+        latency = time.time() - rpc.sent_at
+
+        with self._lock:
+            self._in_flight[rpc.fqdn] -= 1
+            if not self._in_flight[rpc.fqdn]:
+                del self._in_flight[rpc.fqdn]
+
+            stats = self._latency[rpc.fqdn]
+            stats[0] += 1
+            stats[1] += latency
+            stats[2] = max(stats[2], latency)
+
+        log.debug("AgentRpcMessenger._rpc_done: rpc %s to %s took %.3fs" % (rpc.id, rpc.fqdn, latency))
+
+    def get_stats(self):
+        """
+        Per host RPC instrumentation
+        :return: dict of fqdn to the number of RPCs in flight, and the count, mean and
+                 maximum round trip time (seconds) of completed RPCs
+        """
+        stats = {}
+        with self._lock:
+            for fqdn in set(self._in_flight) | set(self._latency):
+                count, total, maximum = self._latency.get(fqdn, (0, 0.0, 0.0))
+                stats[fqdn] = {
+                    "in_flight": self._in_flight.get(fqdn, 0),
+                    "count": count,
+                    "mean_latency": total / count if count else 0.0,
+                    "max_latency": maximum,
+                }
+
+        return stats
+
     def call(self, fqdn, action, args, cancel_event):
         log.debug("AgentRpcMessenger.call: %s %s" % (fqdn, action))
         rpc = self._send_request(fqdn, action, args)
@@ -319,15 +430,18 @@ class AgentRpcMessenger(object):
         :param timeout: how long to wait before quiting.
         :return: timeout remaining 0=failed, !0 is pass and useful for debug.
         """
-        while self.get_session_id(fqdn) is None and timeout > 0:
-            # Allow a short wait for a session to show up, for example
-            # when running setup actions on a host we've just added its
-            # session may not yet have been fully established
-            log.info("AgentRpcMessenger._send: no session yet for %s, %s seconds remain" % (fqdn, timeout))
-            timeout -= 1
-            time.sleep(1)
+        if self.get_session_id(fqdn) is not None:
+            return timeout
 
-        return timeout
+        # Allow a short wait for a session to show up, for example
+        # when running setup actions on a host we've just added its
+        # session may not yet have been fully established
+        log.info("AgentRpcMessenger._send: no session yet for %s, waiting %s seconds" % (fqdn, timeout))
+        started_at = time.time()
+        if self._await_session_change(fqdn, timeout, None) is None:
+            return 0
+
+        return max(timeout - (time.time() - started_at), 0.001)
 
 
 class AgentRpc(object):
@@ -372,6 +486,10 @@ class AgentRpc(object):
     def await_session(cls, fqdn, timeout):
         return cls._messenger.await_session(fqdn, timeout)
 
+    @classmethod
+    def get_stats(cls):
+        return cls._messenger.get_stats()
+
 
 class AgentCancellation(Exception):
     pass
@@ -13,7 +13,7 @@ from django.core.exceptions import ObjectDoesNotExist
 import os
 import operator
 import itertools
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import Queue
 from copy import deepcopy
 from chroma_core.lib.util import all_subclasses
@@ -34,7 +34,7 @@ from chroma_core.models import ManagedMdt
 from chroma_core.models import FilesystemMember
 from chroma_core.models import ConfigureLNetJob
 from chroma_core.models import ManagedTarget, ApplyConfParams, ManagedOst, Job, DeletableStatefulObject
-from chroma_core.models import StepResult
+from chroma_core.models import StepResult, StepConsoleChunk
 from chroma_core.models import ManagedMgs, ManagedFilesystem, NetworkInterface, LNetConfiguration
 from chroma_core.models import ManagedTargetMount, VolumeNode
 from chroma_core.models import DeployHostJob, UpdatesAvailableAlert, LustreClientMount, Copytool
@@ -46,7 +46,7 @@ from chroma_core.models import TriggerPluginUpdatesJob
 from chroma_core.services.job_scheduler.dep_cache import DepCache
 from chroma_core.services.job_scheduler.lock_cache import LockCache, lock_change_receiver, to_lock_json
 from chroma_core.services.job_scheduler.command_plan import CommandPlan
-from chroma_core.services.job_scheduler.agent_rpc import AgentException
+from chroma_core.services.job_scheduler.agent_rpc import AgentException, CancelEvent
 from chroma_core.services.plugin_runner.agent_daemon_interface import AgentDaemonRpcInterface
 from chroma_core.services.queue import ServiceQueue
 from chroma_core.services.rpc import RpcError
@@ -57,6 +57,7 @@ from iml_common.lib.date_time import IMLDateTime
 from chroma_help.help import help_text
 
 import chroma_core.lib.conf_param
+import settings
 
 log = log_register(__name__.split(".")[-1])
 
@@ -105,22 +106,152 @@ class NotificationBuffer(object):
                 notifications.append(self._notifications[key].get())
             del self._notifications[key]
 
-        # For multiple notifications affecting the same set of attributes, drop all but the latest
-        seen_attr_tuples = set()
-        notifications.reverse()
-        trimmed_notifications = []
-        for notification in notifications:
-            update_attrs = notification[3]
-            attr_tuple = tuple(sorted(update_attrs.keys()))
-            if attr_tuple in seen_attr_tuples:
-                # There was a later update to this set of attributes, skip
-                continue
+        return trim_notifications(notifications)
+
+
+def trim_notifications(notifications):
+    """
+    For multiple notifications affecting the same set of attributes, drop all but the latest
+
+    :param notifications: A list of argument lists for JobScheduler._notify, oldest first, all
+                          for the same object
+    :return: The trimmed list, oldest first
+    """
+    seen_attr_tuples = set()
+    trimmed_notifications = []
+    for notification in reversed(notifications):
+        update_attrs = notification[3]
+        attr_tuple = tuple(sorted(update_attrs.keys()))
+        if attr_tuple in seen_attr_tuples:
+            # There was a later update to this set of attributes, skip
+            continue
+        else:
+            trimmed_notifications.append(notification)
+            seen_attr_tuples.add(attr_tuple)
+    trimmed_notifications.reverse()
+
+    return trimmed_notifications
+
+
+def coalesce_notifications(notifications):
+    """
+    Group a batch of notifications by the object they refer to and trim each group
+    with trim_notifications.  Notifications for an object keep their relative order,
+    and objects are ordered by their first notification in the batch.
+
+    State changes, and notifications guarded by from_states, are never trimmed: each may
+    depend on the state left by those before it (e.g. state=X from [S0] then state=Y from [X]),
+    so they are all kept in order, and only the unguarded notifications between them are trimmed.
+
+    :param notifications: A list of argument lists for JobScheduler._notify, oldest first
+    :return: The coalesced list of argument lists
+    """
+    notifications_by_key = OrderedDict()
+    for notification in notifications:
+        content_type, object_id = notification[0:2]
+        notifications_by_key.setdefault((tuple(content_type), object_id), []).append(notification)
+
+    coalesced = []
+    for object_notifications in notifications_by_key.values():
+        unguarded = []
+        for notification in object_notifications:
+            update_attrs, from_states = notification[3:5]
+            if "state" in update_attrs or from_states:
+                coalesced.extend(trim_notifications(unguarded))
+                coalesced.append(notification)
+                unguarded = []
             else:
-                trimmed_notifications.append(notification)
-                seen_attr_tuples.add(attr_tuple)
-        trimmed_notifications.reverse()
+                unguarded.append(notification)
+        coalesced.extend(trim_notifications(unguarded))
 
-        return trimmed_notifications
+    return coalesced
+
+
+class ConnectionPool(object):
+    """
+    Database connections given up by threads at the end of a period of database access,
+    kept open for the next thread which connects.
+
+    Connections are opened by Django as usual; the pool only stands in for opening a new
+    one when it has an idle connection which is still usable.
+    """
+
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+        self.created_count = 0
+        self.reused_count = 0
+        self.discarded_count = 0
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _usable(self, raw_connection):
+        try:
+            cursor = raw_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, raw_connection):
+        with self._lock:
+            self.discarded_count += 1
+        try:
+            raw_connection.close()
+        except Exception:
+            pass
+
+    def checkout(self, connect):
+        """Return an idle connection which passes validation, or a new one from connect()"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                raw_connection = self._idle.pop()
+
+            if self._usable(raw_connection):
+                with self._lock:
+                    self.reused_count += 1
+                return raw_connection
+            else:
+                self._close(raw_connection)
+
+        with self._lock:
+            self.created_count += 1
+        return connect()
+
+    def checkin(self, connection):
+        """Take the raw connection of the DatabaseWrapper connection into the pool, returning False
+        if it should be closed instead"""
+        if connection.in_atomic_block:
+            return False
+
+        raw_connection = connection.connection
+        try:
+            # Nothing the next user of the connection sees should depend on what this one did
+            raw_connection.rollback()
+        except Exception:
+            return False
+
+        with self._lock:
+            if len(self._idle) >= self.max_idle:
+                return False
+            self._idle.append(raw_connection)
+
+        connection.connection = None
+        return True
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for raw_connection in idle:
+            self._close(raw_connection)
 
 
 class SimpleConnectionQuota(object):
@@ -128,7 +259,8 @@ class SimpleConnectionQuota(object):
     This class provides a way to limit the total number of DB connections
     used by a population of threads.
 
-    It is *not* a pool: the connections are destroyed and created every time.
+    Connections given up by a thread go to a ConnectionPool rather than being
+    closed, and are reused the next time a thread connects.
 
     It's for when threads need to briefly dip into a period of database access
     before giving it up again.
@@ -138,25 +270,67 @@ class SimpleConnectionQuota(object):
         self._semaphore = threading.Semaphore(max_connections)
         self.db_alias = DEFAULT_DB_ALIAS
         self.database = django.db.connections.databases[self.db_alias]
+        self.pool = ConnectionPool(max_connections)
+
+        self._lock = threading.Lock()
+        self.busy = 0
+        self.acquire_count = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
 
     def acquire(self):
+        started_at = time.time()
         self._semaphore.acquire()
-        if django.db.connection.connection == DISABLED_CONNECTION:
-            django.db.connection.connection = None
-        # connection = load_backend(self.database['ENGINE']).DatabaseWrapper(self.database, self.db_alias)
-        # return connection
+        waited = time.time() - started_at
+
+        with self._lock:
+            self.busy += 1
+            self.acquire_count += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+
+        connection = django.db.connections[self.db_alias]
+        if connection.connection == DISABLED_CONNECTION or connection.connection is None:
+            connection.connection = None
+
+            # Have Django take a connection from the pool when this thread next connects
+            get_new_connection = type(connection).get_new_connection
+            connection.get_new_connection = lambda conn_params: self.pool.checkout(
+                lambda: get_new_connection(connection, conn_params)
+            )
 
     def release(self, connection):
-        # Close the connection if present, and hand back our token
+        # Hand the connection back to the pool if present, and hand back our token
         if django.db.connection.connection:
-            _disable_database()
+            _disable_database(self.pool)
+
+        with self._lock:
+            self.busy -= 1
 
         self._semaphore.release()
 
+    def close(self):
+        self.pool.close()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                "idle": self.pool.idle,
+                "busy": self.busy,
+                "acquired": self.acquire_count,
+                "mean_wait_time": self.wait_time / self.acquire_count if self.acquire_count else 0.0,
+                "max_wait_time": self.max_wait_time,
+                "created": self.pool.created_count,
+                "reused": self.pool.reused_count,
+                "discarded": self.pool.discarded_count,
+            }
+
 
-def _disable_database():
+def _disable_database(pool=None):
     if django.db.connection.connection is not None and django.db.connection.connection != DISABLED_CONNECTION:
-        django.db.connection.close()
+        if pool is None or not pool.checkin(django.db.connections[DEFAULT_DB_ALIAS]):
+            django.db.connection.close()
     django.db.connection.connection = DISABLED_CONNECTION
 
 
@@ -175,16 +349,29 @@ class JobProgress(threading.Thread, Queue.Queue):
         self._stopping = threading.Event()
         self._job_to_result = {}
 
+        # Log and console output of the current step of each job, held until enough has
+        # accumulated (or it has been held long enough) to be worth writing
+        self._log_buffer = defaultdict(list)
+        self._console_buffer = defaultdict(list)
+        self._buffer_size = defaultdict(int)
+        self._buffer_deadline = {}
+        self._console_sequence = {}
+
     def run(self):
         while not self._stopping.is_set():
             try:
-                self._handle(self.get(block=True, timeout=1))
+                self._handle(self.get(block=True, timeout=self._buffer_timeout()))
             except Queue.Empty:
                 pass
 
+            self._flush_expired_output()
+
         for msg in self.queue:
             self._handle(msg)
 
+        for job_id in self._buffer_deadline.keys():
+            self._flush_output(job_id)
+
     def _handle(self, msg):
         fn = getattr(self, "_%s" % msg[0])
 
@@ -210,31 +397,75 @@ class JobProgress(threading.Thread, Queue.Queue):
 
             return getter
 
+    def _buffer_timeout(self):
+        if self._buffer_deadline:
+            return min(1, max(0, min(self._buffer_deadline.values()) - time.time()))
+        else:
+            return 1
+
+    def _buffer_output(self, job_id, buffer, log_string):
+        buffer[job_id].append(log_string)
+        self._buffer_size[job_id] += len(log_string)
+        if job_id not in self._buffer_deadline:
+            self._buffer_deadline[job_id] = time.time() + settings.STEP_OUTPUT_FLUSH_LATENCY / 1000.0
+
+        if self._buffer_size[job_id] >= settings.STEP_OUTPUT_FLUSH_SIZE:
+            self._flush_output(job_id)
+
+    def _flush_expired_output(self):
+        now = time.time()
+        for job_id, deadline in self._buffer_deadline.items():
+            if deadline <= now:
+                self._flush_output(job_id)
+
+    def _flush_output(self, job_id):
+        """Write the buffered output of a job's current step: log output is appended to
+        StepResult.log, console output is added as the next StepConsoleChunk"""
+        self._buffer_size.pop(job_id, None)
+        self._buffer_deadline.pop(job_id, None)
+        log_strings = self._log_buffer.pop(job_id, None)
+        console_strings = self._console_buffer.pop(job_id, None)
+        if not (log_strings or console_strings):
+            return
+
+        result = self._job_to_result[job_id]
+        with transaction.atomic():
+            if log_strings:
+                result.log += "".join(log_strings)
+                result.save(update_fields=["log", "modified_at"])
+
+            if console_strings:
+                StepConsoleChunk.objects.create(
+                    step_result=result, sequence=self._console_sequence[job_id], content="".join(console_strings)
+                )
+                self._console_sequence[job_id] += 1
+
     def _complete_job(self, job_id, errored):
+        self._flush_output(job_id)
+        self._console_sequence.pop(job_id, None)
         self._job_scheduler.complete_job(job_id, errored=errored)
 
     def _advance(self):
         self._job_scheduler.advance()
 
     def _start_step(self, job_id, **kwargs):
+        if job_id in self._job_to_result:
+            self._flush_output(job_id)
+
         with transaction.atomic():
             result = StepResult(job_id=job_id, **kwargs)
             result.save()
         self._job_to_result[job_id] = result
+        self._console_sequence[job_id] = 0
 
     def _log(self, job_id, log_string):
-        result = self._job_to_result[job_id]
-        with transaction.atomic():
-            result.log += log_string
-            result.save()
+        self._buffer_output(job_id, self._log_buffer, log_string)
 
     def _console(self, job_id, log_string):
-        result = self._job_to_result[job_id]
-        with transaction.atomic():
-            result.console += log_string
-            result.save()
+        self._buffer_output(job_id, self._console_buffer, log_string)
 
     def _step_failure(self, job_id, backtrace):
+        self._flush_output(job_id)
         result = self._job_to_result[job_id]
         with transaction.atomic():
             result.state = "failed"
@@ -242,6 +473,7 @@ class JobProgress(threading.Thread, Queue.Queue):
             result.save()
 
     def _step_success(self, job_id, step_result):
+        self._flush_output(job_id)
         result = self._job_to_result[job_id]
         with transaction.atomic():
             result.state = "success"
@@ -257,7 +489,7 @@ class RunJobThread(threading.Thread):
         self.job = job
         self._job_progress = job_progress
         self._connection_quota = connection_quota
-        self._cancel = threading.Event()
+        self._cancel = CancelEvent()
         self._complete = threading.Event()
         self.steps = steps
 
@@ -359,6 +591,16 @@ class RunJobThread(threading.Thread):
 
 
 class JobCollection(object):
+    """
+    In-memory record of the jobs the scheduler is working on, indexed by state.
+
+    Dependencies between jobs (from Job.wait_for_json) are indexed as they are
+    added: each pending job keeps the set of job IDs it is still waiting for, and
+    each job keeps the set of pending jobs waiting for it.  When a job completes
+    only its dependents are revisited, so finding the ready jobs does not require
+    a scan of every pending job against every complete job.
+    """
+
     def __init__(self):
         self.flush()
 
@@ -370,9 +612,63 @@ class JobCollection(object):
         self._command_to_jobs = defaultdict(set)
         self._job_to_commands = defaultdict(set)
 
+        # Map of pending job ID to the set of job IDs it is still waiting for
+        self._waiting_for = {}
+        # Map of job ID to the set of pending job IDs waiting for it
+        self._waited_on_by = defaultdict(set)
+        # Pending jobs which are not waiting for anything
+        self._ready_jobs = {}
+
+    def _index_job(self, job):
+        """Update the dependency index for a job which has just entered job.state"""
+        if job.state == "pending":
+            complete_jobs = self._state_jobs["complete"]
+            waiting_for = set([job_id for job_id in json.loads(job.wait_for_json) if job_id not in complete_jobs])
+            if waiting_for:
+                self._waiting_for[job.id] = waiting_for
+                for wait_for_id in waiting_for:
+                    self._waited_on_by[wait_for_id].add(job.id)
+            else:
+                self._ready_jobs[job.id] = job
+        elif job.state == "complete":
+            for waiting_id in self._waited_on_by.pop(job.id, set()):
+                waiting_for = self._waiting_for[waiting_id]
+                waiting_for.discard(job.id)
+                if not waiting_for:
+                    del self._waiting_for[waiting_id]
+                    self._ready_jobs[waiting_id] = self._jobs[waiting_id]
+
+    def _unindex_job(self, job):
+        """Remove a job from the dependency index before it leaves job.state"""
+        if job.state == "pending":
+            self._ready_jobs.pop(job.id, None)
+            for wait_for_id in self._waiting_for.pop(job.id, set()):
+                waiting_ids = self._waited_on_by[wait_for_id]
+                waiting_ids.discard(job.id)
+                if not waiting_ids:
+                    del self._waited_on_by[wait_for_id]
+
+    def _set_job_state(self, job, new_state):
+        # Raises KeyError if the job is not in the collection
+        del self._state_jobs[job.state][job.id]
+
+        self._unindex_job(job)
+        job.state = new_state
+        self._state_jobs[job.state][job.id] = job
+        self._index_job(job)
+
     def add(self, job):
+        try:
+            existing = self._jobs[job.id]
+        except KeyError:
+            pass
+        else:
+            self._unindex_job(existing)
+            del self._state_jobs[existing.state][existing.id]
+
         self._jobs[job.id] = job
         self._state_jobs[job.state][job.id] = job
+        self._index_job(job)
 
     def add_command(self, command, jobs):
         """Add command if it doesn't already exist, and ensure that all
@@ -390,19 +686,15 @@ class JobCollection(object):
         return self._jobs[job_id]
 
     def update(self, job, new_state, **kwargs):
-        initial_state = job.state
-
         Job.objects.filter(id=job.id).update(state=new_state, **kwargs)
-        job.state = new_state
         for attr, val in kwargs.items():
             setattr(job, attr, val)
 
         try:
-            del self._state_jobs[initial_state][job.id]
+            self._set_job_state(job, new_state)
         except KeyError:
             log.warning("Cancelling uncached Job %s" % job.id)
-        else:
-            self._state_jobs[job.state][job.id] = job
+            job.state = new_state
 
     def update_commands(self, job):
         """
@@ -427,20 +719,13 @@ class JobCollection(object):
 
     def update_many(self, jobs, new_state):
         for job in jobs:
-            del self._state_jobs[job.state][job.id]
-            job.state = new_state
-            self._state_jobs[job.state][job.id] = job
+            self._set_job_state(job, new_state)
 
         Job.objects.filter(id__in=[j.id for j in jobs]).update(state=new_state)
 
     @property
     def ready_jobs(self):
-        result = []
-        for job in self._state_jobs["pending"].values():
-            wait_for_ids = json.loads(job.wait_for_json)
-            complete_job_ids = [j.id for j in self._state_jobs["complete"].values()]
-            if not set(wait_for_ids) - set(complete_job_ids):
-                result.append(job)
+        result = self._ready_jobs.values()
 
         if len(result) == 0 and len(self.pending_jobs) == 0 and len(self.tasked_jobs) == 0:
             # A quiescent state, flush the collection (avoid building up an indefinitely
@@ -496,6 +781,8 @@ class JobScheduler(object):
             log.info("Joining thread for job %s" % job_id)
             thread.join()
 
+        self._db_quota.close()
+
     def _run_next(self):
         ready_jobs = self._job_collection.ready_jobs
 
@@ -774,31 +1061,44 @@ class JobScheduler(object):
             self._run_next()
 
     def _notify(self, content_type, object_id, notification_time, update_attrs, from_states):
+        instance = self._apply_notification(content_type, object_id, notification_time, update_attrs, from_states)
+
+        if instance is not None:
+            # FIXME: should check the new state against reverse dependencies
+            # and apply any fix_states
+            self._completion_hooks(instance, updated_attrs=update_attrs.keys())
+
+    def _apply_notification(self, content_type, object_id, notification_time, update_attrs, from_states):
+        """
+        Update the notified object, unless the notification is dropped or buffered.
+
+        :return: The updated instance, or None if the notification was not applied
+        """
         # Get the StatefulObject
         model_klass = ContentType.objects.get_by_natural_key(*content_type).model_class()
         try:
             instance = ObjectCache.get_by_id(model_klass, object_id)
         except model_klass.DoesNotExist:
             log.warning("_notify: Dropping update for not-found object %s/%s" % (content_type, object_id))
-            return
+            return None
 
         # Drop if it's not in an allowed state
         if from_states and instance.state not in from_states:
             log.info("_notify: Dropping update to %s because %s is not in %s" % (instance, instance.state, from_states))
-            return
+            return None
 
         # Drop state-modifying updates if outdated
         modified_at = instance.state_modified_at
         if "state" in update_attrs and notification_time <= modified_at:
             log.info("notify: Dropping update of %s (%s) because it has been updated since" % (instance.id, instance))
-            return
+            return None
 
         # Buffer updates on locked instances, except for state changes. By the
         # time a buffered state change notification would be replayed, the
         # state change would probably not make any sense.
         if self._lock_cache.get_by_locked_item(instance):
             if "state" in update_attrs:
-                return
+                return None
 
             log.info("_notify: Buffering update to %s because of locks" % instance)
             for lock in self._lock_cache.get_by_locked_item(instance):
@@ -808,7 +1108,7 @@ class JobScheduler(object):
             notification = (content_type, object_id, notification_time, update_attrs, from_states)
             self._notification_buffer.add_notification_for_key(buffer_key, notification)
 
-            return
+            return None
 
         def is_real_model_field(inst, name):
             try:
@@ -854,9 +1154,7 @@ class JobScheduler(object):
             # locking this object.
             instance = ObjectCache.update(instance)
 
-        # FIXME: should check the new state against reverse dependencies
-        # and apply any fix_states
-        self._completion_hooks(instance, updated_attrs=update_attrs.keys())
+        return instance
 
     def notify(self, content_type, object_id, time_serialized, update_attrs, from_states):
         with self._lock:
@@ -865,6 +1163,47 @@ class JobScheduler(object):
 
             self._run_next()
 
+    def notify_many(self, notifications):
+        """
+        Apply a batch of notifications in one transaction, and then look for runnable
+        jobs once for the whole batch.
+
+        :param notifications: A list of argument lists as taken by notify, oldest first
+        :return: The number of notifications applied after coalescing
+        """
+        with self._lock:
+            notifications = coalesce_notifications(
+                [
+                    (content_type, object_id, IMLDateTime.parse(time_serialized), update_attrs, from_states)
+                    for content_type, object_id, time_serialized, update_attrs, from_states in notifications
+                ]
+            )
+
+            updated = []
+            with transaction.atomic():
+                for notification in notifications:
+                    try:
+                        with transaction.atomic():
+                            instance = self._apply_notification(*notification)
+                    except Exception:
+                        # Don't let one bad notification drop the rest of the batch
+                        log.error("notify_many: error applying %s: %s" % (notification, traceback.format_exc()))
+                    else:
+                        if instance is not None:
+                            updated.append((instance, notification[3].keys()))
+
+            # Completion hooks may call out to other services, so only run them once
+            # the batch is committed and its changes are visible.
+            for instance, updated_attrs in updated:
+                try:
+                    self._completion_hooks(instance, updated_attrs=updated_attrs)
+                except Exception:
+                    log.error("Error in completion hooks: %s" % traceback.format_exc())
+
+            self._run_next()
+
+        return len(notifications)
+
     def run_jobs(self, job_dicts, message):
         with self._lock:
             result = self.CommandPlan.command_run_jobs(job_dicts, message)
@@ -1490,22 +1829,18 @@ class JobScheduler(object):
         :return: dict of list of states {obj_id: ['<state1>','<state2',etc], }
         """
 
+        # Loaded before taking the lock: the result is advisory, and loading can be slow for a long list
+        stateful_objects = self._load_stateful_objects(object_list)
+
         with self._lock:
             transitions = defaultdict(list)
             for obj_key, obj_id in object_list:
                 composite_id = "{}:{}".format(obj_key, obj_id)
 
                 try:
-                    # Hit the DB for the statefulobject (ManagedMgs, ManagedMdt, etc., avoiding all caches
-                    # Localize fixed for HYD-2714.  May chance again as HYD-3155 is resolved.
-                    model_klass = ContentType.objects.get_for_id(obj_key).model_class()
-                    stateful_object = model_klass.objects.get(pk=obj_id)
-
-                    # Used to leverage the ObjectCache, but this suspect now:  HYD-3155
-                    # stateful_object = JobScheduler._retrieve_stateful_object(obj_key, obj_id)
-
+                    stateful_object = stateful_objects[(obj_key, obj_id)]
                     log.debug("available_transitions object: %s, state: %s" % (stateful_object, stateful_object.state))
-                except ObjectDoesNotExist:
+                except KeyError:
                     # Do not advertise transitions for an object that does not exist
                     # as can happen if a parallel operation deletes this object
                     transitions[composite_id] = []
@@ -1536,6 +1871,44 @@ class JobScheduler(object):
 
             return transitions
 
+    @staticmethod
+    def _load_stateful_objects(object_list):
+        """Load the objects in object_list from the DB, with one query for each content type
+
+        :param object_list: list of serialized tuples: [(obj_key, obj_id), ...]
+        :return: dict of (obj_key, obj_id) to object, omitting objects which do not exist
+        """
+
+        ids_by_key = defaultdict(set)
+        for obj_key, obj_id in object_list:
+            ids_by_key[obj_key].add(obj_id)
+
+        stateful_objects = {}
+        for obj_key, obj_ids in ids_by_key.items():
+            # Hit the DB for the statefulobject (ManagedMgs, ManagedMdt, etc., avoiding all caches
+            # Localize fixed for HYD-2714.  May chance again as HYD-3155 is resolved.
+            model_klass = ContentType.objects.get_for_id(obj_key).model_class()
+            for stateful_object in model_klass.objects.filter(pk__in=obj_ids):
+                stateful_objects[(obj_key, stateful_object.pk)] = stateful_object
+
+        return stateful_objects
+
+    # The route between two states of a class, and so the job class that completes it, is fixed at startup
+    _transition_job_classes = {}
+
+    @classmethod
+    def _get_transition_job_class(cls, stateful_object, from_state, to_state):
+        """Return the last job class in the route that will transition stateful_object from from_state to
+        to_state, memoized for each class and pair of states"""
+
+        key = (stateful_object.__class__, from_state, to_state)
+        try:
+            return cls._transition_job_classes[key]
+        except KeyError:
+            job_class = stateful_object.get_job_class(from_state, to_state, last_job_in_route=True)
+            cls._transition_job_classes[key] = job_class
+            return job_class
+
     def _add_verbs(self, stateful_object, raw_transitions):
         """Lookup the verb for each available state
 
@@ -1549,7 +1922,7 @@ class JobScheduler(object):
         transitions = []
         for to_state in raw_transitions:
             # Fetch the last job in a list of jobs that will transition this object from from_state to to_state
-            job_class = stateful_object.get_job_class(from_state, to_state, last_job_in_route=True)
+            job_class = self._get_transition_job_class(stateful_object, from_state, to_state)
 
             # Now check that that job can run on this instance of the stateful object. In truth this needs to be expanded
             # to make sure every job in the route can be run, but that is a bigger step beyond the scope here. And generally
@@ -1571,28 +1944,44 @@ class JobScheduler(object):
 
         return transitions
 
-    def _fetch_jobs(self, stateful_object):
-        from chroma_core.models import AdvertisedJob
+    # The AdvertisedJob classes which may run on instances of each class, fixed at startup
+    _advertised_job_classes = {}
+
+    @classmethod
+    def _get_advertised_job_classes(cls, klass):
+        """Return the (non-plural) AdvertisedJob classes which may run on instances of klass"""
+
+        try:
+            return cls._advertised_job_classes[klass]
+        except KeyError:
+            from chroma_core.models import AdvertisedJob
 
+            job_classes = []
+            for job_class in all_subclasses(AdvertisedJob):
+                if not job_class.plural:
+                    for class_name in job_class.classes:
+                        ct = ContentType.objects.get_by_natural_key("chroma_core", class_name.lower())
+                        if issubclass(klass, ct.model_class()):
+                            job_classes.append(job_class)
+
+            cls._advertised_job_classes[klass] = job_classes
+            return job_classes
+
+    def _fetch_jobs(self, stateful_object):
         available_jobs = []
-        for job_class in all_subclasses(AdvertisedJob):
-            if not job_class.plural:
-                for class_name in job_class.classes:
-                    ct = ContentType.objects.get_by_natural_key("chroma_core", class_name.lower())
-                    klass = ct.model_class()
-                    if isinstance(stateful_object, klass):
-                        if job_class.can_run(stateful_object):
-                            available_jobs.append(
-                                {
-                                    "verb": job_class.verb,
-                                    "long_description": job_class.long_description(stateful_object),
-                                    "display_group": job_class.display_group,
-                                    "display_order": job_class.display_order,
-                                    "confirmation": job_class.get_confirmation(stateful_object),
-                                    "class_name": job_class.__name__,
-                                    "args": job_class.get_args(stateful_object),
-                                }
-                            )
+        for job_class in self._get_advertised_job_classes(stateful_object.__class__):
+            if job_class.can_run(stateful_object):
+                available_jobs.append(
+                    {
+                        "verb": job_class.verb,
+                        "long_description": job_class.long_description(stateful_object),
+                        "display_group": job_class.display_group,
+                        "display_order": job_class.display_order,
+                        "confirmation": job_class.get_confirmation(stateful_object),
+                        "class_name": job_class.__name__,
+                        "args": job_class.get_args(stateful_object),
+                    }
+                )
         return available_jobs
 
     def available_jobs(self, object_list):
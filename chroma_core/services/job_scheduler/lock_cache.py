@@ -3,12 +3,56 @@
 # license that can be found in the LICENSE file.
 
 
+import bisect
 from collections import defaultdict
+import itertools
 import json
 from django.db.models import Q
 from django.contrib.contenttypes.models import ContentType
 
 
+class OrderedLocks(object):
+    """
+    The locks held on one item, ordered by the ID of the job holding them.
+
+    Locks are kept in a list sorted by (job ID, insertion order), so that the latest
+    lock, the locks after a given job, and the position of a lock to remove are all
+    found by bisection rather than by sorting or scanning.  Jobs are created in ID
+    order, so new locks are almost always appended at the end.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._locks = {}
+
+    def add(self, key, lock):
+        bisect.insort(self._keys, key)
+        self._locks[key] = lock
+
+    def remove(self, key):
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        del self._locks[key]
+
+    def latest(self, not_job=None):
+        for key in reversed(self._keys):
+            lock = self._locks[key]
+            if not_job is None or lock.job != not_job:
+                return lock
+
+        return None
+
+    def after(self, job_id, not_job=None):
+        """Locks held by jobs with an ID of at least `job_id`, in job ID order"""
+        locks = [self._locks[key] for key in self._keys[bisect.bisect_left(self._keys, (job_id,)) :]]
+        return [l for l in locks if l.job != not_job]
+
+    def __iter__(self):
+        return (self._locks[key] for key in self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
 class LockCache(object):
 
     # Lock change receivers are called whenever a change occurs to the locks. It allows something to
@@ -21,12 +65,17 @@ class LockCache(object):
     def __init__(self):
         from chroma_core.models import Job, StateLock
 
-        self.write_locks = []
-        self.write_by_item = defaultdict(list)
-        self.read_locks = []
-        self.read_by_item = defaultdict(list)
+        # Each lock is keyed by (job ID, sequence number): a job may hold several
+        # locks on the same item.
+        self._lock_sequence = itertools.count()
+        self._lock_keys = {}
+
+        self._write_locks = {}
+        self.write_by_item = {}
+        self._read_locks = {}
+        self.read_by_item = {}
         self.all_by_job = defaultdict(list)
-        self.all_by_item = defaultdict(list)
+        self.all_by_item = {}
 
         for job in Job.objects.filter(~Q(state="complete")):
             if job.locks_json:
@@ -34,24 +83,45 @@ class LockCache(object):
                 for lock in locks:
                     self._add(StateLock.from_dict(job, lock))
 
+    @property
+    def write_locks(self):
+        return [self._write_locks[key] for key in sorted(self._write_locks)]
+
+    @property
+    def read_locks(self):
+        return [self._read_locks[key] for key in sorted(self._read_locks)]
+
     def call_receivers(self, lock, add_remove):
         for lock_change_receiver in self.lock_change_receivers:
             lock_change_receiver(lock, add_remove)
 
+    def _add_to_item_index(self, index, lock, key):
+        try:
+            locks = index[lock.locked_item]
+        except KeyError:
+            locks = index[lock.locked_item] = OrderedLocks()
+        locks.add(key, lock)
+
+    def _remove_from_item_index(self, index, lock, key):
+        locks = index[lock.locked_item]
+        locks.remove(key)
+        if not locks:
+            del index[lock.locked_item]
+
     def remove_job(self, job):
-        locks = list(self.all_by_job[job.id])
-        n = len(locks)
+        locks = self.all_by_job.pop(job.id, [])
         for lock in locks:
+            key = self._lock_keys.pop(id(lock))
             if lock.write:
-                self.write_locks.remove(lock)
-                self.write_by_item[lock.locked_item].remove(lock)
+                del self._write_locks[key]
+                self._remove_from_item_index(self.write_by_item, lock, key)
             else:
-                self.read_locks.remove(lock)
-                self.read_by_item[lock.locked_item].remove(lock)
-            self.all_by_job[job.id].remove(lock)
-            self.all_by_item[lock.locked_item].remove(lock)
+                del self._read_locks[key]
+                self._remove_from_item_index(self.read_by_item, lock, key)
+            self._remove_from_item_index(self.all_by_item, lock, key)
+
             self.call_receivers(lock, self.LOCK_REMOVE)
-        return n
+        return len(locks)
 
     def add(self, lock):
         self._add(lock)
@@ -59,49 +129,51 @@ class LockCache(object):
     def _add(self, lock):
         assert lock.job.id is not None
 
+        key = (lock.job.id, next(self._lock_sequence))
+        self._lock_keys[id(lock)] = key
+
         if lock.write:
-            self.write_locks.append(lock)
-            self.write_by_item[lock.locked_item].append(lock)
+            self._write_locks[key] = lock
+            self._add_to_item_index(self.write_by_item, lock, key)
         else:
-            self.read_locks.append(lock)
-            self.read_by_item[lock.locked_item].append(lock)
+            self._read_locks[key] = lock
+            self._add_to_item_index(self.read_by_item, lock, key)
 
         self.all_by_job[lock.job.id].append(lock)
-        self.all_by_item[lock.locked_item].append(lock)
+        self._add_to_item_index(self.all_by_item, lock, key)
         self.call_receivers(lock, self.LOCK_ADD)
 
     def get_by_job(self, job):
-        return self.all_by_job[job.id]
+        return self.all_by_job.get(job.id, [])
 
     def get_all(self, locked_item):
-        return self.all_by_item[locked_item]
+        return self.all_by_item.get(locked_item, [])
 
     def get_latest_write(self, locked_item, not_job=None):
         try:
-            if not_job is not None:
-                return sorted(
-                    [l for l in self.write_by_item[locked_item] if l.job != not_job],
-                    lambda a, b: cmp(a.job.id, b.job.id),
-                )[-1]
-
-            return sorted(self.write_by_item[locked_item], lambda a, b: cmp(a.job.id, b.job.id))[-1]
-        except IndexError:
+            return self.write_by_item[locked_item].latest(not_job)
+        except KeyError:
             return None
 
     def get_read_locks(self, locked_item, after, not_job):
-        return [x for x in self.read_by_item[locked_item] if after <= x.job.id and x.job != not_job]
+        try:
+            return self.read_by_item[locked_item].after(after, not_job)
+        except KeyError:
+            return []
 
     def get_write(self, locked_item):
-        return self.write_by_item[locked_item]
+        try:
+            return list(self.write_by_item[locked_item])
+        except KeyError:
+            return []
 
     def get_by_locked_item(self, item):
-        return self.all_by_item[item]
+        return self.all_by_item.get(item, [])
 
     def get_write_by_locked_item(self):
         result = {}
         for locked_item, locks in self.write_by_item.items():
-            if locks:
-                result[locked_item] = sorted(locks, lambda a, b: cmp(a.job.id, b.job.id))[-1]
+            result[locked_item] = locks.latest()
         return result
 
 
@@ -6,7 +6,7 @@
 import traceback
 import sys
 from chroma_core.services.lustre_audit.update_scan import UpdateScan
-from chroma_core.models import ManagedHost
+from chroma_core.services.lustre_audit.topology import TopologySnapshot
 from chroma_core.services import ChromaService, log_register
 from chroma_core.services.queue import AgentRxQueue
 
@@ -28,7 +28,7 @@ class Service(ChromaService):
 
     def on_data(self, fqdn, data):
         try:
-            host = ManagedHost.objects.get(fqdn=fqdn)
+            host = TopologySnapshot.current().get_host_by_fqdn(fqdn)
             UpdateScan().run(host.id, data)
         except Exception:
             log.error("Error handling lustre message: %s", "\n".join(traceback.format_exception(*(sys.exc_info()))))
@@ -0,0 +1,147 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from chroma_core.models.host import ManagedHost, VolumeNode
+from chroma_core.models.target import ManagedTarget, ManagedMgs, ManagedMdt, ManagedOst, ManagedTargetMount
+from chroma_core.services import log_register
+
+
+log = log_register(__name__)
+
+
+class TopologySnapshot(object):
+    """An in-memory copy of the hosts, targets, target mounts and volume nodes that the lustre
+    audit looks up for each report, so that a report costs a constant number of queries however
+    many targets a host has.
+
+    The snapshot is shared by all UpdateScans in the process, and rebuilt when the generation of
+    the tables it copies changes.  Those tables are mostly written by other processes (principally
+    the job_scheduler), so the generation is read from the database: the row count and sum of row
+    versions (xmin) of each table, which changes with any committed insert, update or delete.  It
+    also includes a counter bumped by saves and deletes in this process, which a transaction that
+    is still open would not show in its row versions.
+
+    """
+
+    TABLES = [ManagedHost, ManagedTarget, ManagedTargetMount, VolumeNode]
+
+    _current = None
+    _local_generation = 0
+
+    def __init__(self, generation):
+        self.generation = generation
+
+        self.hosts = dict((host.id, host) for host in ManagedHost.objects.all())
+        self._hosts_by_fqdn = dict((host.fqdn, host) for host in self.hosts.values())
+        # A nodename match takes precedence over an fqdn match
+        self._hosts_by_node_name = dict(self._hosts_by_fqdn)
+        self._hosts_by_node_name.update((host.nodename, host) for host in self.hosts.values())
+
+        self.targets = {}
+        for klass in [ManagedMgs, ManagedMdt, ManagedOst]:
+            self.targets.update((target.id, target) for target in klass.objects.all())
+        self._targets_by_ha_label = dict((t.ha_label, t) for t in self.targets.values() if t.ha_label)
+        self._targets_by_name = dict((t.name, t) for t in self.targets.values() if t.name)
+
+        self._mounts_by_id = dict((mount.id, mount) for mount in ManagedTargetMount.objects.all())
+        self._mounts = dict(((mount.target_id, mount.host_id), mount) for mount in self._mounts_by_id.values())
+        self._primary_host_ids = dict(
+            (mount.target_id, mount.host_id) for mount in self._mounts_by_id.values() if mount.primary
+        )
+        self._mounts_by_host_id = defaultdict(list)
+        for mount_id, mount in sorted(self._mounts_by_id.items()):
+            if mount.target_id in self.targets:
+                self._mounts_by_host_id[mount.host_id].append((mount, self.targets[mount.target_id]))
+
+        self._volume_nodes = set(VolumeNode.objects.values_list("volume_id", "host_id"))
+
+    @classmethod
+    def _generation(cls):
+        cursor = connection.cursor()
+        cursor.execute(
+            " UNION ALL ".join(
+                "SELECT count(*), sum(xmin::text::bigint) FROM %s" % klass._meta.db_table for klass in cls.TABLES
+            )
+        )
+        return (cls._local_generation,) + tuple(cursor.fetchall())
+
+    @classmethod
+    def current(cls):
+        """The snapshot of the current generation, rebuilding it if the tables have changed"""
+        generation = cls._generation()
+
+        if cls._current is None or cls._current.generation != generation:
+            log.debug("Rebuilding topology snapshot")
+            cls._current = TopologySnapshot(generation)
+
+        return cls._current
+
+    @classmethod
+    def clear(cls):
+        cls._current = None
+
+    def get_host(self, host_id):
+        try:
+            return self.hosts[host_id]
+        except KeyError:
+            raise ManagedHost.DoesNotExist()
+
+    def get_host_by_fqdn(self, fqdn):
+        try:
+            return self._hosts_by_fqdn[fqdn]
+        except KeyError:
+            raise ManagedHost.DoesNotExist()
+
+    def get_host_by_node_name(self, node_name):
+        """The host with this nodename, or failing that this fqdn"""
+        try:
+            return self._hosts_by_node_name[node_name]
+        except KeyError:
+            raise ManagedHost.DoesNotExist()
+
+    def get_target_by_ha_label(self, ha_label):
+        try:
+            return self._targets_by_ha_label[ha_label]
+        except KeyError:
+            raise ManagedTarget.DoesNotExist()
+
+    def get_target_by_name(self, name):
+        try:
+            return self._targets_by_name[name]
+        except KeyError:
+            raise ManagedTarget.DoesNotExist()
+
+    def get_target_mount(self, target, host):
+        try:
+            return self._mounts[target.id, host.id]
+        except KeyError:
+            raise ManagedTargetMount.DoesNotExist()
+
+    def get_host_target_mounts(self, host):
+        """List of (target mount, target) for the target mounts on a host"""
+        return list(self._mounts_by_host_id.get(host.id, []))
+
+    def primary_host_id(self, target):
+        return self._primary_host_ids.get(target.id)
+
+    def active_host_id(self, target):
+        mount = self._mounts_by_id.get(target.active_mount_id)
+        return None if mount is None else mount.host_id
+
+    def has_volume_node(self, volume_id, host):
+        return (volume_id, host.id) in self._volume_nodes
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def _bump_generation(sender, instance, **kwargs):
+    if isinstance(instance, tuple(TopologySnapshot.TABLES)):
+        TopologySnapshot._local_generation += 1
@@ -8,28 +8,76 @@ import json
 from chroma_core.services import log_register
 
 from django.db import transaction
-from django.db.models import Q
 
 from chroma_core.models.target import ManagedTarget, TargetRecoveryInfo, TargetRecoveryAlert
-from chroma_core.models.host import ManagedHost, VolumeNode
+from chroma_core.models.host import ManagedHost
 from chroma_core.models.client_mount import LustreClientMount
 from chroma_core.models.filesystem import ManagedFilesystem
 from chroma_core.services.job_scheduler import job_scheduler_notify
 from chroma_core.services.job_scheduler.job_scheduler_client import JobSchedulerClient
+from chroma_core.services.lustre_audit.topology import TopologySnapshot
 from chroma_core.models import ManagedTargetMount
 from iml_common.lib.date_time import IMLDateTime
 from iml_common.lib.package_version_info import VersionInfo
 from chroma_core.services.stats import StatsQueue
 
+import settings
+
 
 log = log_register(__name__)
 
 
+class TargetMountStates(object):
+    """The last state applied by update_target_mounts for each target mount, so that audits which
+    report no change to a mount can skip its database updates and notifications.
+
+    UpdateScans are created per report, so this is held for the life of the process.  Every
+    LUSTRE_AUDIT_RECONCILE_CYCLES audits of a host its mounts are applied regardless, to recover
+    from any change made behind the service's back.
+
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # host id -> {target mount id -> state}
+        self._states = {}
+        # host id -> number of audits since that host's mounts were last applied in full
+        self._cycles = {}
+        self.applied_count = 0
+        self.skipped_count = 0
+
+    def begin_cycle(self, host):
+        """Start an audit of the mounts of a host
+
+        :return: The last states of the host's mounts, or None if they are all to be applied
+        """
+        cycles = self._cycles.get(host.id, 0)
+        if cycles >= settings.LUSTRE_AUDIT_RECONCILE_CYCLES or host.id not in self._states:
+            self._cycles[host.id] = 1
+            return None
+
+        self._cycles[host.id] = cycles + 1
+        return self._states[host.id]
+
+    def end_cycle(self, host, states):
+        """Record the states of all the mounts of a host, dropping those of mounts which no longer exist"""
+        self._states[host.id] = states
+
+    def stats(self):
+        return {"applied": self.applied_count, "skipped": self.skipped_count}
+
+
+target_mount_states = TargetMountStates()
+
+
 class UpdateScan(object):
     def __init__(self):
         self.audited_mountables = {}
         self.host = None
         self.host_data = None
+        self.topology = None
 
     def is_valid(self):
         try:
@@ -51,7 +99,8 @@ class UpdateScan(object):
         self.update_client_mounts()
 
     def run(self, host_id, host_data):
-        host = ManagedHost.objects.get(pk=host_id)
+        self.topology = TopologySnapshot.current()
+        host = self.topology.get_host(host_id)
         self.started_at = IMLDateTime.parse(host_data["started_at"])
         self.host = host
         self.host_data = host_data
@@ -180,27 +229,36 @@ class UpdateScan(object):
         if self.host_data["mounts"] is None:
             return
 
+        last_states = target_mount_states.begin_cycle(self.host)
+        states = {}
+
         # Loop over all mountables we expected on this host, whether they
         # were actually seen in the results or not.
         mounted_uuids = dict([(m["fs_uuid"], m) for m in self.host_data["mounts"]])
-        for target_mount in ManagedTargetMount.objects.filter(host=self.host):
+        for target_mount, target in self.topology.get_host_target_mounts(self.host):
 
             # Mounted-ness
             # ============
-            mounted_locally = target_mount.target.uuid in mounted_uuids
+            mounted_locally = target.uuid in mounted_uuids
 
             # Recovery status
             # ===============
             if mounted_locally:
-                mount_info = mounted_uuids[target_mount.target.uuid]
+                mount_info = mounted_uuids[target.uuid]
                 recovery_status = mount_info["recovery_status"]
             else:
                 recovery_status = {}
 
+            # Nothing below has any effect unless this state differs from the one last applied
+            state = (mounted_locally, json.dumps(recovery_status, sort_keys=True), target.state, target.active_mount_id)
+            if last_states is not None and last_states.get(target_mount.id) == state:
+                states[target_mount.id] = state
+                target_mount_states.skipped_count += 1
+                continue
+
             # Update to active_mount and alerts for monitor-only
             # targets done here instead of resource_locations
-            if target_mount.target.immutable_state:
-                target = target_mount.target
+            if target.immutable_state:
                 if mounted_locally:
                     job_scheduler_notify.notify(
                         target,
@@ -208,7 +266,7 @@ class UpdateScan(object):
                         {"state": "mounted", "active_mount_id": target_mount.id},
                         ["mounted", "unmounted"],
                     )
-                elif not mounted_locally and target.active_mount == target_mount:
+                elif not mounted_locally and target.active_mount_id == target_mount.id:
                     log.debug("clearing active_mount, %s %s", self.started_at, self.host)
 
                     job_scheduler_notify.notify(
@@ -219,12 +277,17 @@ class UpdateScan(object):
                     )
 
             with transaction.atomic():
-                if target_mount.target.active_mount is None:
-                    TargetRecoveryInfo.update(target_mount.target, {})
-                    TargetRecoveryAlert.notify(target_mount.target, False)
+                if target.active_mount_id is None:
+                    TargetRecoveryInfo.update(target, {})
+                    TargetRecoveryAlert.notify(target, False)
                 elif mounted_locally:
-                    recovering = TargetRecoveryInfo.update(target_mount.target, recovery_status)
-                    TargetRecoveryAlert.notify(target_mount.target, recovering)
+                    recovering = TargetRecoveryInfo.update(target, recovery_status)
+                    TargetRecoveryAlert.notify(target, recovering)
+
+            states[target_mount.id] = state
+            target_mount_states.applied_count += 1
+
+        target_mount_states.end_cycle(self.host, states)
 
     def update_resource_locations(self):
         # If resource_locations is None then nothing changed since the last update and so we can just return.
@@ -249,7 +312,7 @@ class UpdateScan(object):
 
         for resource_name, node_name in self.host_data["resource_locations"].items():
             try:
-                target = ManagedTarget.objects.get(ha_label=resource_name)
+                target = self.topology.get_target_by_ha_label(resource_name)
             except ManagedTarget.DoesNotExist:
                 # audit_log.warning("Resource %s on host %s is not a known target" % (resource_name, self.host))
                 continue
@@ -260,9 +323,9 @@ class UpdateScan(object):
                     active_mount = None
                 else:
                     try:
-                        host = ManagedHost.objects.get(Q(nodename=node_name) | Q(fqdn=node_name))
+                        host = self.topology.get_host_by_node_name(node_name)
                         try:
-                            active_mount = ManagedTargetMount.objects.get(target=target, host=host)
+                            active_mount = self.topology.get_target_mount(target, host)
                         except ManagedTargetMount.DoesNotExist:
                             log.warning(
                                 "Resource for target '%s' is running on host '%s', but there is no such TargetMount"
@@ -289,18 +352,24 @@ class UpdateScan(object):
             return []
 
         try:
-            target = ManagedTarget.objects.get(name=target_name).downcast()
-
-            if target.immutable_state and (target.active_host == target.primary_host):
-                # in monitored mode we want to make sure the target volume is accessible on current host
-                target.volume.volumenode_set.get(host=self.host, not_deleted=True)
-            else:
-                target.managedtargetmount_set.get(host=self.host, not_deleted=True)
-        except (ManagedTarget.DoesNotExist, VolumeNode.DoesNotExist) as e:
+            target = self.topology.get_target_by_name(target_name)
+        except ManagedTarget.DoesNotExist:
             # Unknown target -- ignore metrics
-            log.warning("Discarding metrics for unknown target: %s (%s)" % (target_name, e))
+            log.warning("Discarding metrics for unknown target: %s" % target_name)
             return []
 
+        if target.immutable_state and (self.topology.active_host_id(target) == self.topology.primary_host_id(target)):
+            # in monitored mode we want to make sure the target volume is accessible on current host
+            if not self.topology.has_volume_node(target.volume_id, self.host):
+                log.warning("Discarding metrics for target %s: no volume node on %s" % (target_name, self.host))
+                return []
+        else:
+            try:
+                self.topology.get_target_mount(target, self.host)
+            except ManagedTargetMount.DoesNotExist:
+                log.warning("Discarding metrics for target %s: no target mount on %s" % (target_name, self.host))
+                return []
+
         return target.metrics.serialize(metrics, jobid_var=self.jobid_var)
 
     @transaction.atomic
@@ -308,6 +377,9 @@ class UpdateScan(object):
         """
         Pass the received metrics into the metrics library for storage.
         """
+        if self.topology is None:
+            self.topology = TopologySnapshot.current()
+
         raw_metrics = self.host_data["metrics"]["raw"]
         self.jobid_var = raw_metrics.get("lustre", {}).get("jobid_var", "disable")
         samples = []
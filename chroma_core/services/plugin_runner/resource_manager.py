@@ -14,11 +14,12 @@ import json
 import threading
 
 from collections import defaultdict
+from contextlib import contextmanager
 
 from massiviu.context import DelayedContextFrom
 from django.db.models.aggregates import Count
 from django.db.models.query_utils import Q
-from django.db import transaction
+from django.db import transaction, IntegrityError
 
 from chroma_core.lib.storage_plugin.api.resources import LogicalDrive, LogicalDriveSlice
 from chroma_core.lib.storage_plugin.base_plugin import BaseStoragePlugin
@@ -245,6 +246,65 @@ class SubscriberIndex(object):
                     self.add_subscriber(r.id, subscription.key, subscription.val(resource))
 
 
+class ScopeLocks(object):
+    """Locking for ResourceManager.
+
+    Operations confined to one scope (the session of one scannable resource) hold the shared
+    lock and that scope's lock, so that operations in different scopes run concurrently.
+    Operations which modify the indexes shared by all scopes, or resources in more than one
+    scope, hold the exclusive lock, which waits for and excludes all others.  Exclusive
+    waiters hold off new shared holders so that they are not starved.
+
+    The shared lock is always taken before a scope lock, so that no scope lock is held
+    while waiting for the exclusive lock to be released.
+
+    Global resources may be reported by sessions in more than one scope, so writes to their
+    records made under a scope lock must allow for a concurrent writer: alert notifications
+    hold ResourceManager._alerts_lock, and statistics tolerate a concurrent creation.
+
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared_count = 0
+        self._exclusive = False
+        self._exclusive_waiting = 0
+        self._scope_locks = defaultdict(threading.Lock)
+
+    @contextmanager
+    def scope(self, scope_id):
+        with self._condition:
+            while self._exclusive or self._exclusive_waiting:
+                self._condition.wait()
+            self._shared_count += 1
+            scope_lock = self._scope_locks[scope_id]
+
+        try:
+            with scope_lock:
+                yield
+        finally:
+            with self._condition:
+                self._shared_count -= 1
+                if not self._shared_count:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._exclusive_waiting += 1
+            while self._exclusive or self._shared_count:
+                self._condition.wait()
+            self._exclusive_waiting -= 1
+            self._exclusive = True
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
 class ResourceManager(object):
     """The resource manager is the home of the global view of the resources populated from
     all plugins.  BaseStoragePlugin instances have their own local caches of resources, which
@@ -269,7 +329,10 @@ class ResourceManager(object):
 
     This code is written for multi-threaded use within a single process.
     It is not safe to have multiple processes running plugins at this stage.
-    We serialize operations from different plugins using a big lock, and
+    Operations confined to one session run concurrently with those of other
+    sessions, while operations which change the shared indexes (creating and
+    removing resources and edges) are serialized with everything else (see
+    ScopeLocks), and
     we use the autocommit decorator on persistence functions because
     otherwise we would have to explicitly commit at the start of
     each one to see changes from other threads.
@@ -278,10 +341,12 @@ class ResourceManager(object):
 
     def __init__(self):
         self._sessions = {}
-        self._instance_lock = threading.Lock()
+        self._locks = ScopeLocks()
 
         # Map of (resource_global_id, alert_class) to AlertState pk
         self._active_alerts = {}
+        # Serializes alert notifications, which may be for resources shared between scopes
+        self._alerts_lock = threading.Lock()
 
         # In-memory bidirectional lookup table of resource parent-child relationships
         self._edges = EdgeIndex()
@@ -307,7 +372,7 @@ class ResourceManager(object):
         scannable_class = self._class_index.get(scannable_id)
         assert issubclass(scannable_class, BaseScannableResource) or issubclass(scannable_class, HostsideResource)
         log.debug(">> session_open %s (%s resources)" % (scannable_id, len(initial_resources)))
-        with self._instance_lock:
+        with self._locks.exclusive():
             if scannable_id in self._sessions:
                 log.warning("Clearing out old session for scannable ID %s" % scannable_id)
                 del self._sessions[scannable_id]
@@ -340,7 +405,7 @@ class ResourceManager(object):
         log.debug("<< session_open %s" % scannable_id)
 
     def session_close(self, scannable_id):
-        with self._instance_lock:
+        with self._locks.scope(scannable_id):
             try:
                 del self._sessions[scannable_id]
             except KeyError:
@@ -956,7 +1021,7 @@ class ResourceManager(object):
         This implementation is really so sub optimal at the moment it is untrue, because it gets called
         for every field that changes for every record. I may change this comment if I can work out a solution!
         """
-        with self._instance_lock:
+        with self._locks.scope(scannable_id):
             with transaction.atomic():
                 self._resource_persist_update_attributes(scannable_id, record_id, attrs)
                 # self._persist_lun_updates(scannable_id)
@@ -965,7 +1030,7 @@ class ResourceManager(object):
 
     def session_resource_add_parent(self, scannable_id, local_resource_id, local_parent_id):
 
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[local_resource_id]
 
@@ -987,7 +1052,7 @@ class ResourceManager(object):
             self._resource_modify_parent(record_pk, parent_pk, False)
 
     def session_resource_remove_parent(self, scannable_id, local_resource_id, local_parent_id):
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[local_resource_id]
             parent_pk = session.local_id_to_global_id[local_parent_id]
@@ -997,10 +1062,7 @@ class ResourceManager(object):
     def session_get_stats(self, scannable_id, local_resource_id, update_data):
         """Get global ID for a resource, look up the StoreageResourceStatistic for
            each stat in the update, and invoke its .metrics.update with the data"""
-        # FIXME: definitely could be doing finer grained locking here as although
-        # we need the coarse one for protecting local_id_to_global_id etc, the later
-        # part of actually updating stats just needs to be locked on a per-statistic basis
-        with self._instance_lock:
+        with self._locks.scope(scannable_id):
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[local_resource_id]
             return self._get_stats(record_pk, update_data)
@@ -1019,9 +1081,15 @@ class ResourceManager(object):
                     raise StorageResourceStatistic.DoesNotExist
 
             except StorageResourceStatistic.DoesNotExist:
-                stat_record = StorageResourceStatistic.objects.create(
-                    storage_resource=record, name=stat_name, sample_period=stat_properties.sample_period
-                )
+                # Sessions in other scopes may report stats for the same global resource concurrently,
+                # so another may create the statistic first, in which case use theirs
+                try:
+                    with transaction.atomic():
+                        stat_record = StorageResourceStatistic.objects.create(
+                            storage_resource=record, name=stat_name, sample_period=stat_properties.sample_period
+                        )
+                except IntegrityError:
+                    stat_record = StorageResourceStatistic.objects.get(storage_resource=record, name=stat_name)
             samples += stat_record.update(stat_name, stat_properties, stat_data)
         return samples
 
@@ -1055,7 +1123,7 @@ class ResourceManager(object):
         and if so they must be added in a blob so that we can hook up the
         parent relationships"""
 
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
 
             with transaction.atomic():
@@ -1065,7 +1133,7 @@ class ResourceManager(object):
                 self._persist_created_hosts(session, scannable_id, resources)
 
     def session_remove_local_resources(self, scannable_id, resources):
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
 
             with transaction.atomic():
@@ -1079,7 +1147,7 @@ class ResourceManager(object):
                 self._persist_lun_updates(scannable_id)
 
     def session_remove_global_resources(self, scannable_id, resources):
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
             resources = session._plugin_instance._index._local_id_to_resource.values()
 
@@ -1088,7 +1156,7 @@ class ResourceManager(object):
                 self._persist_lun_updates(scannable_id)
 
     def session_notify_alert(self, scannable_id, resource_local_id, active, severity, alert_class, attribute):
-        with self._instance_lock:
+        with self._locks.scope(scannable_id), self._alerts_lock:
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[resource_local_id]
             if active:
@@ -1339,7 +1407,7 @@ class ResourceManager(object):
                 deleter.delete(int(record_id))
 
     def global_remove_resource(self, resource_id):
-        with self._instance_lock:
+        with self._locks.exclusive():
             with transaction.atomic():
                 log.debug("global_remove_resource: %s" % resource_id)
                 try:
@@ -1443,35 +1511,10 @@ class ResourceManager(object):
         # Create StorageResourceRecords for any resources which
         # do not already have one, and update the local_id_to_global_id
         # map with the DB ID for each resource.
-        creations = {}
+        creations = self._persist_new_records(session, ordered_for_creation)
         for resource in ordered_for_creation:
-            if isinstance(resource._meta.identifier, BaseScopedId):
-                scope_id = session.scannable_id
-            elif isinstance(resource._meta.identifier, BaseGlobalId):
-                scope_id = None
-            else:
-                raise NotImplementedError
-
-            resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
-                resource.__class__.__module__, resource.__class__.__name__
-            )
-
-            id_tuple = resource.id_tuple()
-            cleaned_id_items = []
-            for t in id_tuple:
-                if isinstance(t, BaseStorageResource):
-                    cleaned_id_items.append(session.local_id_to_global_id[t._handle])
-                else:
-                    cleaned_id_items.append(t)
-
-            id_str = json.dumps(tuple(cleaned_id_items))
-
-            record, created = StorageResourceRecord.objects.get_or_create(
-                resource_class_id=resource_class_id, storage_id_str=id_str, storage_id_scope_id=scope_id
-            )
+            record, created = creations[resource]
 
-            session.local_id_to_global_id[resource._handle] = record.pk
-            session.global_id_to_local_id[record.pk] = resource._handle
             self._label_cache[record.id] = resource.get_label()
 
             if created:
@@ -1481,31 +1524,30 @@ class ResourceManager(object):
                     % (session.scannable_id, created, record.pk, resource._handle)
                 )
 
-            creations[resource] = (record, created)
-
             # Add the new record to the index so that future records and resolve their
             # provide/subscribe relationships with respect to it
             self._subscriber_index.add_resource(record.pk, resource)
 
+            resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
+                resource.__class__.__module__, resource.__class__.__name__
+            )
             self._class_index.add_record(record.pk, resource_class)
 
+        self._persist_reported_by(
+            session,
+            [
+                creations[resource][0]
+                for resource in ordered_for_creation
+                if isinstance(resource._meta.identifier, BaseGlobalId)
+            ],
+        )
+
         # Update or create attribute records
-        attr_classes = set()
+        attr_values = defaultdict(dict)
         for resource in ordered_for_creation:
             record, created = creations[resource]
-
-            if isinstance(resource._meta.identifier, BaseGlobalId) and session.scannable_id != record.id:
-                try:
-                    record.reported_by.get(pk=session.scannable_id)
-                except StorageResourceRecord.DoesNotExist:
-                    log.debug(
-                        "saw GlobalId resource %s from scope %s for the first time" % (record.id, session.scannable_id)
-                    )
-                    record.reported_by.add(session.scannable_id)
-
             resource_class = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
 
-            attrs = {}
             # Special case for ResourceReference attributes, because the resource
             # object passed from the plugin won't have a global ID for the referenced
             # resource -- we have to do the lookup inside ResourceManager
@@ -1513,41 +1555,19 @@ class ResourceManager(object):
                 attribute_obj = resource_class.get_attribute_properties(key)
                 if isinstance(attribute_obj, attributes.ResourceReference):
                     if value and not value._handle_global:
-                        attrs[key] = session.local_id_to_global_id[value._handle]
+                        value = session.local_id_to_global_id[value._handle]
                     elif value and value._handle_global:
-                        attrs[key] = value._handle
-                    else:
-                        attrs[key] = value
-                else:
-                    attrs[key] = value
+                        value = value._handle
 
-            for key, val in attrs.items():
-                resource_class = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
-
-                # Try to update an existing record
                 attr_model_class = resource_class.attr_model_class(key)
+                attr_values[attr_model_class][(record.id, key)] = (attr_model_class.encode(value), created)
 
-                updated = attr_model_class.objects.filter(resource=record, key=key).update(
-                    value=attr_model_class.encode(val)
-                )
-
-                # If there was no existing record, create one
-                if not updated:
-                    delayed_attr_model_class = DelayedContextFrom(attr_model_class)
-
-                    attr_classes.add(delayed_attr_model_class)
-
-                    if issubclass(attr_model_class, StorageResourceAttributeSerialized):
-                        data = dict(resource_id=record.id, key=key, value=attr_model_class.encode(val))
-                    else:
-                        data = dict(resource_id=record.id, key=key, value_id=attr_model_class.encode(val))
-
-                    delayed_attr_model_class.insert(data)
-
-        [x.item_cache.flush() for x in attr_classes]
+        for attr_model_class, values in attr_values.items():
+            self._persist_attributes(attr_model_class, values)
 
         # Find out if new resources match anything in SubscriberIndex and create
-        # relationships if so.
+        # relationships if so.  Edges are (child pk, parent pk).
+        new_edges = set()
         logicaldrives_with_new_descendents = []
         for resource in ordered_for_creation:
             record, created = creations[resource]
@@ -1561,8 +1581,7 @@ class ResourceManager(object):
                         continue
                     log.info("Linked up me %s as parent of %s" % (record.pk, s))
                     self._edges.add_parent(s, record.pk)
-                    s_record = StorageResourceRecord.objects.get(pk=s)
-                    s_record.parents.add(record.pk)
+                    new_edges.add((s, record.pk))
                     if isinstance(resource, LogicalDrive):
                         # A new LogicalDrive ancestor might affect the labelling
                         # of another LogicalDrive's Volume.
@@ -1577,22 +1596,19 @@ class ResourceManager(object):
                         continue
                     log.info("Linked up %s as parent of me, %s" % (p, record.pk))
                     self._edges.add_parent(record.pk, p)
-                    record.parents.add(p)
+                    new_edges.add((record.pk, p))
 
         # Update EdgeIndex and StorageResourceRecord.parents
         for resource in resources:
-            try:
-                record, created = creations[resource]
-            except KeyError:
-                record = StorageResourceRecord.objects.get(pk=session.local_id_to_global_id[resource._handle])
+            record_pk = session.local_id_to_global_id[resource._handle]
 
             # Update self._edges
             for p in resource._parents:
                 parent_global_id = session.local_id_to_global_id[p._handle]
-                self._edges.add_parent(record.id, parent_global_id)
+                self._edges.add_parent(record_pk, parent_global_id)
+                new_edges.add((record_pk, parent_global_id))
 
-            new_parent_pks = [session.local_id_to_global_id[p._handle] for p in resource._parents]
-            record.parents.add(*new_parent_pks)
+        self._persist_edges(new_edges)
 
         # For any LogicalDrives we created that have been hooked up via SubscriberIndex,
         # see if their presence should change the name of a Volume
@@ -1606,12 +1622,180 @@ class ResourceManager(object):
                         Volume.objects.filter(storage_resource=descendent_ld).update(label=self.get_label(ld_id))
 
         # Create StorageResourceLearnEvent for anything we found new
-        for resource in creations:
-            record, created = creations[resource]
-
-            if created and hasattr(session, "host_id"):
+        created_records = [record for record, created in creations.values() if created]
+        if created_records and hasattr(session, "host_id"):
+            host = ManagedHost.objects.get(id=getattr(session, "host_id"))
+            for record in created_records:
                 StorageResourceLearnEvent.register_event(
-                    severity=logging.INFO,
-                    alert_item=ManagedHost.objects.get(id=getattr(session, "host_id")),
-                    storage_resource=record,
+                    severity=logging.INFO, alert_item=host, storage_resource=record
+                )
+
+    def _persist_new_records(self, session, ordered_for_creation):
+        """Get or create the StorageResourceRecords of resources, with a query or three for each
+        resource class in place of a get_or_create for each resource.
+
+        :return: Dict of resource to (record, created)
+        """
+        from chroma_core.lib.storage_plugin.manager import storage_plugin_manager
+
+        creations = {}
+        pending = set(ordered_for_creation)
+        while pending:
+            # A resource's ID may include references to other resources, so it can only be
+            # looked up once they have records: work in waves of resources whose references
+            # are all resolved, in creation order.
+            wave = [
+                resource
+                for resource in ordered_for_creation
+                if resource in pending
+                and not any(isinstance(t, BaseStorageResource) and t in pending for t in resource.id_tuple())
+            ]
+            if not wave:
+                wave = [resource for resource in ordered_for_creation if resource in pending]
+
+            resource_keys = []
+            for resource in wave:
+                if isinstance(resource._meta.identifier, BaseScopedId):
+                    scope_id = session.scannable_id
+                elif isinstance(resource._meta.identifier, BaseGlobalId):
+                    scope_id = None
+                else:
+                    raise NotImplementedError
+
+                resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
+                    resource.__class__.__module__, resource.__class__.__name__
+                )
+
+                id_tuple = resource.id_tuple()
+                cleaned_id_items = []
+                for t in id_tuple:
+                    if isinstance(t, BaseStorageResource):
+                        cleaned_id_items.append(session.local_id_to_global_id[t._handle])
+                    else:
+                        cleaned_id_items.append(t)
+
+                id_str = json.dumps(tuple(cleaned_id_items))
+                resource_keys.append((resource, (resource_class_id, scope_id, id_str)))
+
+            records = self._get_or_create_records(set(key for resource, key in resource_keys))
+            for resource, key in resource_keys:
+                record, created = records[key]
+                # As with get_or_create, only the first of several resources with the same ID creates it
+                records[key] = (record, False)
+
+                session.local_id_to_global_id[resource._handle] = record.pk
+                session.global_id_to_local_id[record.pk] = resource._handle
+                creations[resource] = (record, created)
+                pending.discard(resource)
+
+        return creations
+
+    def _get_or_create_records(self, keys):
+        """
+        :param keys: Set of (resource class id, scope id, id str)
+        :return: Dict of each key to (record, created)
+        """
+        id_strs_by_class = defaultdict(set)
+        for resource_class_id, scope_id, id_str in keys:
+            id_strs_by_class[(resource_class_id, scope_id)].add(id_str)
+
+        records = {}
+        for (resource_class_id, scope_id), id_strs in id_strs_by_class.items():
+            query = StorageResourceRecord.objects.filter(
+                resource_class_id=resource_class_id, storage_id_scope_id=scope_id
+            )
+
+            existing = query.filter(storage_id_str__in=id_strs)
+            records.update(((resource_class_id, scope_id, r.storage_id_str), (r, False)) for r in existing)
+
+            missing = [id_str for id_str in id_strs if (resource_class_id, scope_id, id_str) not in records]
+            if missing:
+                StorageResourceRecord.objects.bulk_create(
+                    [
+                        StorageResourceRecord(
+                            resource_class_id=resource_class_id, storage_id_scope_id=scope_id, storage_id_str=id_str
+                        )
+                        for id_str in missing
+                    ]
                 )
+                # bulk_create does not set the primary keys of what it creates
+                created = query.filter(storage_id_str__in=missing)
+                records.update(((resource_class_id, scope_id, r.storage_id_str), (r, True)) for r in created)
+
+        return records
+
+    def _persist_reported_by(self, session, records):
+        """Record that the records of GlobalId resources have been reported by this session's scannable"""
+        global_records = set(record.id for record in records if session.scannable_id != record.id)
+        if not global_records:
+            return
+
+        through = StorageResourceRecord.reported_by.through
+        reported = set(
+            through.objects.filter(
+                from_storageresourcerecord_id__in=global_records,
+                to_storageresourcerecord_id=session.scannable_id,
+            ).values_list("from_storageresourcerecord_id", flat=True)
+        )
+
+        new_reports = []
+        for record_id in global_records:
+            if record_id not in reported:
+                log.debug(
+                    "saw GlobalId resource %s from scope %s for the first time" % (record_id, session.scannable_id)
+                )
+                new_reports.append(
+                    through(from_storageresourcerecord_id=record_id, to_storageresourcerecord_id=session.scannable_id)
+                )
+        through.objects.bulk_create(new_reports)
+
+    def _persist_attributes(self, attr_model_class, values):
+        """Update or create the attribute records of one model class
+
+        :param values: Dict of (record id, key) to (encoded value, whether the record was just created)
+        """
+        if issubclass(attr_model_class, StorageResourceAttributeSerialized):
+            value_field = "value"
+        else:
+            value_field = "value_id"
+
+        # Only records which already existed can have attributes to update
+        existing_record_ids = set(record_id for (record_id, key), (value, created) in values.items() if not created)
+        existing = {}
+        if existing_record_ids:
+            for attr_id, record_id, key, value in attr_model_class.objects.filter(
+                resource_id__in=existing_record_ids
+            ).values_list("id", "resource_id", "key", value_field):
+                existing[(record_id, key)] = (attr_id, value)
+
+        new_attrs = []
+        for (record_id, key), (value, created) in values.items():
+            try:
+                attr_id, old_value = existing[(record_id, key)]
+            except KeyError:
+                new_attrs.append(attr_model_class(resource_id=record_id, key=key, **{value_field: value}))
+            else:
+                if old_value != value:
+                    attr_model_class.objects.filter(id=attr_id).update(**{value_field: value})
+
+        attr_model_class.objects.bulk_create(new_attrs)
+
+    def _persist_edges(self, edges):
+        """Add (child pk, parent pk) edges to StorageResourceRecord.parents where not already present"""
+        if not edges:
+            return
+
+        through = StorageResourceRecord.parents.through
+        existing = set(
+            through.objects.filter(from_storageresourcerecord_id__in=set(child for child, parent in edges)).values_list(
+                "from_storageresourcerecord_id", "to_storageresourcerecord_id"
+            )
+        )
+
+        through.objects.bulk_create(
+            [
+                through(from_storageresourcerecord_id=child, to_storageresourcerecord_id=parent)
+                for child, parent in edges
+                if (child, parent) not in existing
+            ]
+        )
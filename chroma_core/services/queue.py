@@ -7,15 +7,111 @@
 around an AMQP queue."""
 
 
+import atexit
 import threading
+import time
+
+import kombu.pools
+from kombu.common import maybe_declare
+from kombu.messaging import Exchange, Queue, Producer
 
 from chroma_core.services import _amqp_connection
 from chroma_core.services.log import log_register
 
+import settings
+
 
 log = log_register("queue")
 
 
+class QueuePublisher(object):
+    """Publishes JSON messages to named queues, as SimpleQueue.put would, but reusing
+    pooled broker connections and their channels rather than connecting for each message.
+    Queue entities are built once per name and declared once per connection.
+
+    With a batch window, messages are held for up to that many seconds and then published
+    together on one connection.  Use `get_instance` for the process-wide publisher.
+
+    """
+
+    _instance = None
+
+    def __init__(self, batch_window=0, connection_limit=10):
+        self._batch_window = batch_window
+        self._connections = kombu.pools.Connections(limit=connection_limit)
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flush_timer = None
+
+        self.published_count = 0
+        self.flush_count = 0
+
+        if self._batch_window:
+            atexit.register(self.flush)
+
+    @classmethod
+    def get_instance(cls):
+        # Created on first use rather than at import, so that the lock is created after any
+        # gevent monkey patching.  Unlocked: at worst two publishers are created, and one discarded.
+        if cls._instance is None:
+            cls._instance = cls(settings.AMQP_PUBLISH_BATCH_WINDOW / 1000.0, settings.AMQP_PUBLISH_CONNECTIONS)
+        return cls._instance
+
+    def _get_queue(self, name):
+        with self._lock:
+            try:
+                return self._queues[name]
+            except KeyError:
+                exchange = Exchange(name, "direct", durable=False)
+                queue = self._queues[name] = Queue(name, exchange, routing_key=name, durable=False)
+                return queue
+
+    def put(self, name, body):
+        if not self._batch_window:
+            self._publish([(name, body)])
+            return
+
+        with self._lock:
+            self._pending.append((name, body))
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self._batch_window, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Publish any messages held for the batch window"""
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._flush_timer = None
+
+        if pending:
+            self._publish(pending)
+            self.flush_count += 1
+
+    def _publish(self, messages):
+        def errback(exc, _):
+            log.info("RabbitMQ publish got a temporary error. May retry. Error: %r", exc, exc_info=1)
+
+        retry_policy = {"max_retries": 10, "errback": errback}
+
+        with self._connections[_amqp_connection()].acquire(block=True) as connection:
+            with Producer(connection) as producer:
+                for name, body in messages:
+                    queue = self._get_queue(name)
+                    maybe_declare(queue, producer.channel, True, **retry_policy)
+                    producer.publish(
+                        body,
+                        serializer="json",
+                        exchange=queue.exchange,
+                        routing_key=name,
+                        retry=True,
+                        retry_policy=retry_policy,
+                    )
+                    self.published_count += 1
+
+
 class ServiceQueue(object):
     """Simple FIFO queue, multiple senders, single receiver.  Payloads
     must be JSON-serializable.
@@ -38,11 +134,7 @@ class ServiceQueue(object):
     name = None
 
     def put(self, body):
-        with _amqp_connection() as conn:
-            q = conn.SimpleQueue(
-                self.name, serializer="json", exchange_opts={"durable": False}, queue_opts={"durable": False}
-            )
-            q.put(body)
+        QueuePublisher.get_instance().put(self.name, body)
 
     def purge(self):
         with _amqp_connection() as conn:
@@ -76,6 +168,41 @@ class ServiceQueue(object):
                 except QueueEmpty:
                     pass
 
+    def serve_batch(self, callback, batch_size, batch_latency):
+        """Like `serve`, but call `callback` with a list of messages.  A batch is complete
+        when it holds `batch_size` messages, or when `batch_latency` seconds have passed since
+        its first message arrived.
+
+        """
+        from Queue import Empty as QueueEmpty
+
+        with _amqp_connection() as conn:
+            q = conn.SimpleQueue(
+                self.name, serializer="json", exchange_opts={"durable": False}, queue_opts={"durable": False}
+            )
+            while not self._stopping.is_set():
+                try:
+                    message = q.get(timeout=1)
+                except QueueEmpty:
+                    continue
+
+                message.ack()
+                messages = [message.decode()]
+                batch_deadline = time.time() + batch_latency
+                while len(messages) < batch_size:
+                    remaining = batch_deadline - time.time()
+                    if remaining <= 0:
+                        break
+
+                    try:
+                        message = q.get(timeout=remaining)
+                    except QueueEmpty:
+                        break
+                    message.ack()
+                    messages.append(message.decode())
+
+                callback(messages)
+
 
 class AgentRxQueue(ServiceQueue):
     def __route_message(self, message):
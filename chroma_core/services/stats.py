@@ -3,12 +3,15 @@
 # license that can be found in the LICENSE file.
 
 
+import time
 import traceback
 from django import db
 from django.utils import dateparse
 from chroma_core.models import Stats
 from chroma_core.services import ChromaService, log_register, queue
 
+import settings
+
 
 log = log_register(__name__)
 
@@ -21,24 +24,90 @@ class StatsQueue(queue.ServiceQueue):
 
 
 class Service(ChromaService):
+    """Write samples from StatsQueue to the Stats tables.
+
+    Samples are written behind: the messages received within STATS_INSERT_BATCH_LATENCY
+    (up to STATS_INSERT_BATCH_SIZE of them) are flushed together, so that each flush
+    is one transaction with one bulk insert per Sample table.  A flush which fails is
+    retried one message at a time, and a message which cannot be parsed is dropped alone.
+    """
+
+    def __init__(self):
+        super(Service, self).__init__()
+
+        self.flush_count = 0
+        self.sample_count = 0
+        self.outdated_count = 0
+        self.dropped_count = 0
+        self.bad_message_count = 0
+
     def run(self):
         super(Service, self).run()
 
         self.queue = StatsQueue()
         self.queue.purge()
-        self.queue.serve(callback=self.insert)
+        if settings.STATS_INSERT_BATCH_SIZE > 1:
+            self.queue.serve_batch(
+                self.insert_many, settings.STATS_INSERT_BATCH_SIZE, settings.STATS_INSERT_BATCH_LATENCY / 1000.0
+            )
+        else:
+            self.queue.serve(callback=self.insert)
 
     def insert(self, samples):
+        self.insert_many([samples])
+
+    def insert_many(self, messages):
+        batches = []
+        for message in messages:
+            try:
+                batches.append([(id, dateparse.parse_datetime(dt), value) for id, dt, value in message])
+            except:
+                # Drop only the bad message, rather than the batch or the service
+                self.bad_message_count += 1
+                log.warning("insert_many: bad message: %s" % traceback.format_exc())
+
+        samples = [sample for batch in batches for sample in batch]
+        if not samples or self._flush(samples, len(batches)):
+            return
+
+        # Retry a failed flush one message at a time, so that only the samples which fail are dropped
+        if len(batches) > 1:
+            for batch in batches:
+                if batch and not self._flush(batch, 1):
+                    self._drop(batch)
+        else:
+            self._drop(samples)
+
+    def _flush(self, samples, message_count):
+        """Write samples in one transaction, returning whether it committed"""
+        started = time.time()
         try:
-            outdated = Stats.insert((id, dateparse.parse_datetime(dt), value) for id, dt, value in samples)
+            with db.transaction.atomic():
+                outdated = Stats.insert(samples)
         except db.IntegrityError:
             log.error("Duplicate stats insert: " + db.connection.queries[-1]["sql"])
-            db.transaction.rollback()  # allow future stats to still work
         except:
             log.error("Error handling stats insert: " + traceback.format_exc())
         else:
+            self.flush_count += 1
+            self.sample_count += len(samples) - len(outdated)
+            self.outdated_count += len(outdated)
+            log.debug(
+                "Flushed %s samples from %s messages in %.3fs (%s outdated)"
+                % (len(samples), message_count, time.time() - started, len(outdated))
+            )
             if outdated:
                 log.warn("Outdated samples ignored: {0}".format(outdated))
+            return True
+
+        # The transaction was rolled back, so the cached latest points may be ahead of the database
+        for model in Stats:
+            model.cache.clear()
+        return False
+
+    def _drop(self, samples):
+        self.dropped_count += len(samples)
+        log.warning("Dropped %s samples (%s dropped in total)" % (len(samples), self.dropped_count))
 
     def stop(self):
         super(Service, self).stop()
@@ -3,12 +3,14 @@
 # license that can be found in the LICENSE file.
 
 
+import datetime
 import os
 from massiviu.context import DelayedContextFrom
 
 from django.db import transaction
 
-from chroma_core.services.syslog.parser import LogMessageParser
+from chroma_core.lib import log_partitions
+from chroma_core.services.syslog.parser import LogMessageParser, EventBatch
 from chroma_core.models.log import LogMessage
 from chroma_core.services import ChromaService, log_register
 from chroma_core.services.queue import AgentRxQueue
@@ -20,6 +22,50 @@ import settings
 log = log_register("systemd_journal")
 
 
+def ingest_log_lines(parser, fqdn, log_lines):
+    """
+    Insert a batch of journal entries from a host as LogMessages, and write the events raised
+    by the handlers of any entries the parser recognises, all in one transaction.
+
+    :return: The number of LogMessages inserted
+    """
+    inserted = 0
+    events = EventBatch()
+
+    with transaction.atomic():
+        with DelayedContextFrom(LogMessage) as log_messages:
+            for msg in log_lines:
+                try:
+                    message_class, handler = parser.classify(msg["message"])
+                    log_messages.insert(
+                        dict(
+                            fqdn=fqdn,
+                            message=msg["message"],
+                            severity=msg["severity"],
+                            facility=msg["facility"],
+                            tag=msg["source"],
+                            datetime=IMLDateTime.parse(msg["datetime"]).as_datetime,
+                            message_class=message_class,
+                        )
+                    )
+                    inserted += 1
+
+                    if handler:
+                        parser.handle(fqdn, msg, handler, events)
+                except Exception as e:
+                    log.error("Error %s ingesting systemd-journal entry: %s" % (e, msg))
+
+        event_count = len(events)
+        if event_count:
+            try:
+                with transaction.atomic():
+                    events.flush()
+            except Exception as e:
+                log.error("Error %s writing %s events from systemd-journal entries" % (e, event_count))
+
+    return inserted
+
+
 class Service(ChromaService):
     PLUGIN_NAME = "systemd_journal"
 
@@ -29,62 +75,75 @@ class Service(ChromaService):
         self._queue.purge()
         self._table_size = LogMessage.objects.count()
         self._parser = LogMessageParser()
+        self._partitioned_day = None
+        self._retention_day = None
+        self._retention_limit = settings.DBLOG_HW
+
+    def _ensure_partitions(self):
+        """Create the LogMessage partitions for yesterday through the next few days"""
+        today = IMLDateTime.utcnow().date()
+        if today == self._partitioned_day:
+            return
+
+        with transaction.atomic():
+            created = log_partitions.ensure_partitions(
+                today - datetime.timedelta(days=1), today + datetime.timedelta(days=settings.DBLOG_PARTITIONS_AHEAD)
+            )
+        if created:
+            self.log.info("Created LogMessage partitions %s" % ", ".join(created))
+
+        self._partitioned_day = today
+
+    def _apply_retention(self):
+        """
+        Apply a size limit to the table of log messages, by archiving and dropping whole
+        days of messages, oldest first, until the table is below DBLOG_LW.  Messages held
+        in the parent table rather than a partition are removed first.  Today's partition
+        and those ahead of it are never dropped.
+
+        If the table is left above DBLOG_LW, it is not checked again that day until it has
+        grown by another DBLOG_HW - DBLOG_LW messages.
+        """
+        today = IMLDateTime.utcnow().date()
+        if today != self._retention_day:
+            self._retention_limit = settings.DBLOG_HW
+
+        if self._table_size <= self._retention_limit:
+            return 0
+
+        candidates = [log_partitions.PARENT_TABLE] + [
+            name for name, day in log_partitions.list_partitions() if day < today
+        ]
 
-    def _check_size(self):
-        """Apply a size limit to the table of log messages"""
-        MAX_ROWS_PER_TRANSACTION = 10000
         removed_num_entries = 0
-        overflow_filename = os.path.join(settings.LOG_PATH, "db_log")
-
-        if self._table_size > settings.DBLOG_HW:
-            remove_num_entries = self._table_size - settings.DBLOG_LW
-
-            trans_size = min(MAX_ROWS_PER_TRANSACTION, remove_num_entries)
-            with transaction.atomic():
-                while remove_num_entries > 0:
-                    removed_entries = LogMessage.objects.all().order_by("id")[0:trans_size]
-                    self.log.debug("writing %s batch of entries" % trans_size)
-                    try:
-                        f = open(overflow_filename, "a")
-                        for line in removed_entries:
-                            f.write("%s\n" % line.__str__())
-                        LogMessage.objects.filter(id__lte=removed_entries[-1].id).delete()
-                    except Exception as e:
-                        self.log.error("error opening/writing/closing the db_log: %s" % e)
-                    finally:
-                        f.close()
-
-                    remove_num_entries -= trans_size
-                    removed_num_entries += trans_size
-                    if remove_num_entries < trans_size:
-                        trans_size = remove_num_entries
+        for name in candidates:
+            if self._table_size - removed_num_entries <= settings.DBLOG_LW:
+                break
+
+            archive_path = os.path.join(settings.LOG_PATH, "db_log-%s.csv.gz" % name)
+            try:
+                with transaction.atomic():
+                    removed = log_partitions.archive_and_drop(name, archive_path)
+            except Exception as e:
+                self.log.error("error archiving %s to %s: %s" % (name, archive_path, e))
+                break
+
+            removed_num_entries += removed
+            self.log.info("Wrote %s DB log entries to %s" % (removed, archive_path))
 
         self._table_size -= removed_num_entries
-        self.log.info("Wrote %s DB log entries to %s" % (removed_num_entries, overflow_filename))
+        if self._table_size > settings.DBLOG_LW:
+            self.log.warning("%s DB log entries remain after dropping all complete days" % self._table_size)
+
+        self._retention_day = today
+        self._retention_limit = max(settings.DBLOG_HW, self._table_size + settings.DBLOG_HW - settings.DBLOG_LW)
 
         return removed_num_entries
 
     def on_data(self, fqdn, body):
-        with transaction.atomic():
-            with DelayedContextFrom(LogMessage) as log_messages:
-                for msg in body["log_lines"]:
-                    try:
-                        log_messages.insert(
-                            dict(
-                                fqdn=fqdn,
-                                message=msg["message"],
-                                severity=msg["severity"],
-                                facility=msg["facility"],
-                                tag=msg["source"],
-                                datetime=IMLDateTime.parse(msg["datetime"]).as_datetime,
-                                message_class=LogMessage.get_message_class(msg["message"]),
-                            )
-                        )
-                        self._table_size += 1
-
-                        self._parser.parse(fqdn, msg)
-                    except Exception as e:
-                        self.log.error("Error %s ingesting systemd-journal entry: %s" % (e, msg))
+        self._ensure_partitions()
+        self._table_size += ingest_log_lines(self._parser, fqdn, body["log_lines"])
+        self._apply_retention()
 
     def run(self):
         super(Service, self).run()
@@ -3,9 +3,13 @@
 # license that can be found in the LICENSE file.
 
 
+from collections import defaultdict
+
 from chroma_core.services import log_register
 from chroma_core.models import SyslogEvent, ClientConnectEvent, ManagedHost
+from chroma_core.models.log import MessageClass
 from django.db import transaction
+from django.utils import timezone
 import logging
 import re
 
@@ -43,6 +47,82 @@ def _plain_find_one_in_many(haystack, needles):
 find_one_in_many = _plain_find_one_in_many
 
 
+class EventWriter(object):
+    """Writes the events raised by handlers as they are raised"""
+
+    def register_event(self, event_class, alert_item, **kwargs):
+        event_class.register_event(alert_item, **kwargs)
+
+    def latest(self, event_class, lustre_pid):
+        """The most recent event of event_class for a Lustre process, or None"""
+        try:
+            return event_class.objects.filter(lustre_pid=lustre_pid).order_by("-id")[0]
+        except IndexError:
+            return None
+
+    def save(self, event):
+        event.save()
+
+
+class EventBatch(EventWriter):
+    """
+    Holds the events raised by handlers while a batch of log messages is parsed, to be
+    written together with one insert per event class by flush().
+    """
+
+    def __init__(self):
+        self._events = []
+
+    def __len__(self):
+        return len(self._events)
+
+    def register_event(self, event_class, alert_item, **kwargs):
+        # The row written is the one AlertStateBase.register_event leaves behind: an alert
+        # which began and ended at the same moment.
+        if hasattr(alert_item, "not_deleted") and alert_item.not_deleted != True:
+            return
+
+        if kwargs.get("lustre_pid") is not None:
+            kwargs["lustre_pid"] = int(kwargs["lustre_pid"])
+        kwargs.setdefault("severity", event_class.default_severity)
+
+        now = timezone.now()
+        event = event_class(
+            active=None,
+            dismissed=False,
+            alert_item=alert_item,
+            alert_type=event_class.__name__,
+            begin=now,
+            end=now,
+            **kwargs
+        )
+        event._message = event.alert_message()
+        self._events.append(event)
+
+    def latest(self, event_class, lustre_pid):
+        for event in reversed(self._events):
+            if event.__class__ is event_class and event.lustre_pid == int(lustre_pid):
+                return event
+
+        return super(EventBatch, self).latest(event_class, lustre_pid)
+
+    def save(self, event):
+        if event.pk is None:
+            # Still in the batch: its message is written with it
+            event._message = event.alert_message()
+        else:
+            event.save()
+
+    def flush(self):
+        events_by_class = defaultdict(list)
+        for event in self._events:
+            events_by_class[event.__class__].append(event)
+        self._events = []
+
+        for event_class, events in events_by_class.items():
+            event_class.objects.bulk_create(events)
+
+
 def _get_word_after(string, after):
     s = string.find(after) + len(after)
     l = string[s:].find(" ")
@@ -53,8 +133,10 @@ def _get_word_after(string, after):
 # acceptor port is already being used
 #
 # LustreError: 122-1: Can't start acceptor on port 988: port already in use
-def port_used_handler(message, host):
-    SyslogEvent.register_event(severity=logging.ERROR, alert_item=host, message_str="Lustre port already being used")
+def port_used_handler(message, host, events=EventWriter()):
+    events.register_event(
+        SyslogEvent, severity=logging.ERROR, alert_item=host, message_str="Lustre port already being used"
+    )
 
 
 #
@@ -64,7 +146,7 @@ def port_used_handler(message, host):
 # Lustre: 27559:0:(ldlm_lib.c:871:target_handle_connect()) lustre-OST0001: connection from 26959b68-1208-1fca-1f07-da2dc872c55f@192.168.122.218@tcp t0 exp 0000000000000000 cur 1317994930 last 0
 # Lustre: 9150:0:(ldlm_lib.c:871:target_handle_connect()) lustre-OST0000: connection from 26959b68-1208-1fca-1f07-da2dc872c55f@192.168.122.218@tcp t0 exp 0000000000000000 cur 1317994930 last 0
 # Lustre: 31793:0:(ldlm_lib.c:877:target_handle_connect()) MGS:            connection from e5232e74-1e61-fad1-b59b-6e4a7d674016@192.168.122.218@tcp t0 exp 0000000000000000 cur 1317994928 last 0
-def client_connection_handler(message, host):
+def client_connection_handler(message, host, events=EventWriter()):
     sev = logging.INFO
     # get the client NID out of the string
     nid_start = message.find("@") + 1
@@ -82,26 +164,24 @@ def client_connection_handler(message, host):
     )
     lustre_pid = message[9 : 9 + message[9:].find(":")]
 
-    ClientConnectEvent.register_event(severity=sev, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    events.register_event(ClientConnectEvent, severity=sev, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
 
 
 #
 # Lustre: 5629:0:(sec.c:1474:sptlrpc_import_sec_adapt()) import lustre-MDT0000->NET_0x20000c0a87ada_UUID netid 20000: select flavor null
 # Lustre: 20380:0:(sec.c:1474:sptlrpc_import_sec_adapt()) import MGC192.168.122.105@tcp->MGC192.168.122.105@tcp_0 netid 20000: select flavor null
 #
-def server_security_flavor_handler(message, host):
+def server_security_flavor_handler(message, host, events=EventWriter()):
     # get the flavour out of the string
     flavour_start = message.rfind(" ") + 1
     flavour = message[flavour_start:]
     lustre_pid = message[9 : 9 + message[9:].find(":")]
 
     # Associate this with a previous client connect event if possible
-    try:
-        event = ClientConnectEvent.objects.filter(lustre_pid=lustre_pid).order_by("-id")[0]
+    event = events.latest(ClientConnectEvent, lustre_pid)
+    if event is not None:
         event.message_str = "%s with security flavor %s" % (event.message_str, flavour)
-        event.save()
-    except IndexError:
-        pass
+        events.save(event)
 
 
 #
@@ -109,25 +189,29 @@ def server_security_flavor_handler(message, host):
 #
 # Lustre: 2689:0:(genops.c:1379:obd_export_evict_by_uuid()) lustre-OST0001: evicting 26959b68-1208-1fca-1f07-da2dc872c55f at adminstrative request
 #
-def admin_client_eviction_handler(message, host):
+def admin_client_eviction_handler(message, host, events=EventWriter()):
     uuid = _get_word_after(message, "evicting ")
     msg = "client %s evicted by the administrator" % uuid
     lustre_pid = message[9 : 9 + message[9:].find(":")]
-    ClientConnectEvent.register_event(severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    events.register_event(
+        ClientConnectEvent, severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid
+    )
 
 
 #
 # real eviction
 #
 # LustreError: 0:0:(ldlm_lockd.c:356:waiting_locks_callback()) ### lock callback timer expired after 101s: evicting client at 0@lo ns: mdt-ffff8801cd5be000 lock: ffff880126f8f480/0xe99a593b682aed45 lrc: 3/0,0 mode: PR/PR res: 8589935876/10593 bits 0x3 rrc: 2 type: IBT flags: 0x4000020 remote: 0xe99a593b682aecea expref: 14 pid: 3636 timeout: 4389324308'
-def client_eviction_handler(message, host):
+def client_eviction_handler(message, host, events=EventWriter()):
     s = message.find("### ") + 4
     l = message[s:].find(": evicting client at ")
     reason = message[s : s + l]
     client = _get_word_after(message, ": evicting client at ")
     msg = "client %s evicted: %s" % (client, reason)
     lustre_pid = _get_word_after(message, "pid: ")
-    ClientConnectEvent.register_event(severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    events.register_event(
+        ClientConnectEvent, severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid
+    )
 
 
 class LogMessageParser(object):
@@ -140,9 +224,30 @@ class LogMessageParser(object):
         ": evicting client at ": client_eviction_handler,
     }
 
+    message_classes = {"LustreError": MessageClass.LUSTRE_ERROR, "Lustre": MessageClass.LUSTRE}
+
     def __init__(self):
         self._hosts = {}
 
+        # One pass over a message finds both its class, from a prefix like that matched
+        # by LogMessage.get_message_class (looked ahead for, so that the search for a
+        # selector still starts at the beginning), and the first selector in it.
+        self._classifier = re.compile(
+            r"(?:(?=(?:\[[\d\.]*\])? ?(?P<message_class>LustreError|Lustre):)|)(?:.*?(?P<selector>%s))?"
+            % "|".join(re.escape(selector) for selector in self.selectors),
+            re.DOTALL,
+        )
+
+    def classify(self, message):
+        """Return the MessageClass of a log message string and the handler for it, or None"""
+        match = self._classifier.match(message)
+        message_class, selector = match.group("message_class", "selector")
+
+        return (
+            self.message_classes.get(message_class, MessageClass.NORMAL),
+            self.selectors[selector] if selector else None,
+        )
+
     # FIXME: need to update this cache of hosts when a host is removed
     def get_host(self, fqdn):
         try:
@@ -155,14 +260,16 @@ class LogMessageParser(object):
             except ManagedHost.DoesNotExist:
                 return None
 
-    @transaction.atomic
-    def parse(self, fqdn, message):
-        hit = find_one_in_many(message["message"], self.selectors.keys())
-        if hit:
-            h = self.get_host(fqdn)
-            if h is None:
-                return
+    def handle(self, fqdn, message, handler, events):
+        """Run the handler which classify() found for a message, raising its events through events"""
+        h = self.get_host(fqdn)
+        if h is None:
+            return
 
-            fn = self.selectors[hit]
+        with transaction.atomic():
+            handler(message["message"], h, events)
 
-            fn(message["message"], h)
+    def parse(self, fqdn, message):
+        message_class, handler = self.classify(message["message"])
+        if handler:
+            self.handle(fqdn, message, handler, EventWriter())
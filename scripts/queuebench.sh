@@ -0,0 +1,3 @@
+
+./manage.py benchqueue
+./manage.py benchqueue --batch-window 10
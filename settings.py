@@ -165,6 +165,12 @@ BROKER_URL = "amqp://{}:{}@{}:{}/{}".format(
     AMQP_BROKER_USER, AMQP_BROKER_PASSWORD, AMQP_BROKER_HOST, AMQP_BROKER_PORT, AMQP_BROKER_VHOST
 )
 
+# Number of pooled broker connections used for publishing to service queues
+AMQP_PUBLISH_CONNECTIONS = 10
+# Time (milliseconds) to hold messages published to service queues so that they
+# are sent together (0 to send each message immediately)
+AMQP_PUBLISH_BATCH_WINDOW = 0
+
 INSTALLED_APPS = (
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -262,6 +268,11 @@ STATS_5_MINUTE_EXPIRATION = {"days": 7}  # Expiration must be multiple of 5 minu
 STATS_1_HOUR_EXPIRATION = {"days": 30}  # Expiration must be multiple of 1 hour.
 STATS_1_DAY_EXPIRATION = {"weeks": 10000}  # Expiration must be multiple of 1 day
 STATS_FLUSH_RATE = 20  # Flush 20 times per expiration interval - for 10 seconds sample flush every 1day/20.
+# Maximum number of points held, across all series, for deriving rates of change
+# incrementally as a window of stats is selected again (0 to disable).  This counts the
+# selected points along with the reduced and rate points derived from them, at up to a
+# couple of hundred bytes each, and applies to each process serving stats separately.
+STATS_RATE_CACHE_SIZE = 250000
 
 # When agent sends VPD 0x80 and 0x83 serial numbers, which do we prefer to use
 # for the canonical device serial on the manager?  Favorite first.
@@ -292,6 +303,33 @@ AGENT_CLOCK_TOLERANCE = 20
 # to chroma_api
 ALLOW_ANONYMOUS_READ = True
 
+# Maximum number of job_scheduler notifications applied together in one
+# transaction.  Set to 1 to apply each notification as it arrives.
+JOB_SCHEDULER_NOTIFICATION_BATCH_SIZE = 100
+# Maximum time (milliseconds) to wait for a batch of notifications to fill
+JOB_SCHEDULER_NOTIFICATION_BATCH_LATENCY = 100
+# File in which job_scheduler keeps the state transition routes it computes at
+# startup, reused while the StateChangeJob definitions are unchanged (None to disable)
+JOB_SCHEDULER_ROUTE_CACHE = None
+# Bytes of log and console output a job step may accumulate before it is
+# written to the database
+STEP_OUTPUT_FLUSH_SIZE = 65536
+# Maximum time (milliseconds) that job step output is held before it is written
+STEP_OUTPUT_FLUSH_LATENCY = 1000
+
+# Maximum number of stats messages whose samples are written together in one
+# transaction.  Set to 1 to write the samples of each message as it arrives.
+STATS_INSERT_BATCH_SIZE = 1000
+# Maximum time (milliseconds) to hold stats messages before writing them
+STATS_INSERT_BATCH_LATENCY = 1000
+
+# Limits on the messages sent to an agent in response to one GET, the
+# remainder are left queued for its next GET
+HTTP_AGENT_TX_MAX_MESSAGES = 1000
+HTTP_AGENT_TX_MAX_BYTES = 4 * 1024 * 1024
+# Responses to agents larger than this many bytes are gzipped (0 to disable)
+HTTP_AGENT_TX_GZIP_THRESHOLD = 64 * 1024
+
 # Long poll timeout Seconds
 LONG_POLL_TIMEOUT_SECONDS = 60 * 5
 
@@ -299,12 +337,22 @@ LONG_POLL_TIMEOUT_SECONDS = 60 * 5
 # Realtime service
 SESSION_COOKIE_HTTPONLY = False
 
-# The value at which log entries in the database will be aged out to a
-# flat text file in /var/log/chroma/db_log
+# The value at which log entries in the database will be aged out, a day
+# at a time, to compressed files in /var/log/chroma/db_log-*.csv.gz
 DBLOG_HW = 1200000
-# The value at which we stop aging database log entries out to a flat
-# text file
+# The value at which we stop aging database log entries out of the database
 DBLOG_LW = 1000000
+# How many days ahead of today to create log entry partitions for
+DBLOG_PARTITIONS_AHEAD = 2
+# Seconds for which a process may use its indexes of host NIDs and target
+# names (used to resolve names in log messages) before reloading them
+NAME_RESOLVER_TTL = 10
+# Seconds after which the corosync service processes a report from a host
+# even if it is identical to the last one it processed from that host
+COROSYNC_REPORT_REFRESH_INTERVAL = 60
+# Number of audits of a host after which the lustre_audit service applies the
+# state of all its target mounts, even those which have not changed
+LUSTRE_AUDIT_RECONCILE_CYCLES = 10
 
 # In development, where to serve repos from
 DEV_REPO_PATH = os.path.join(os.path.dirname(os.path.abspath(sys.modules["settings"].__file__)), "repo")
@@ -319,6 +367,10 @@ DEVICE_AGGREGATOR_URL = os.getenv(
     "DEVICE_AGGREGATOR_URL", "http://{}:{}/device-aggregator".format(PROXY_HOST, DEVICE_AGGREGATOR_PORT)
 )
 
+# Seconds for which the device aggregator's content, once fetched, serves the storage
+# plugin's agent session starts without fetching it again
+DEVICE_AGGREGATOR_MAX_AGE = 5
+
 # Supported power control agents
 SUPPORTED_FENCE_AGENTS = ["fence_apc", "fence_apc_snmp", "fence_ipmilan", "fence_virsh", "fence_vbox"]
 
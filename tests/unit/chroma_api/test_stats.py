@@ -2,11 +2,14 @@ import os
 import json
 import collections
 import operator
+from datetime import datetime
+
+from django.utils.timezone import utc
 
 from chroma_core.lib.cache import ObjectCache
 from chroma_core.lib import metrics
 from chroma_core.models import ManagedTarget, ManagedTargetMount, ManagedMgs, ManagedMdt, ManagedOst, ManagedFilesystem
-from chroma_core.models import Stats
+from chroma_core.models import Series, Stats
 from .chroma_api_test_case import ChromaApiTestCase
 from tests.unit.chroma_core.helpers import synthetic_host, synthetic_volume_full
 
@@ -42,6 +45,7 @@ class TestStats(ChromaApiTestCase):
                 Stats.insert(store.serialize(value, timestamp, **kwargs))
         for model in Stats:
             model.cache.clear()
+        Stats.rate_cache.clear()
 
     def fetch(self, path, **params):
         response = self.api_client.get("/api/" + path, data=params)
@@ -215,3 +219,14 @@ class TestStats(ChromaApiTestCase):
         for (data,) in content.values():
             prefixes = set(name.split("_")[0] for name in data["data"])
             self.assertEqual(prefixes, set(["mem", "cpu"]))
+
+    def test_select_many(self):
+        "Selecting many series together returns the same points as selecting each series."
+        ids = list(Series.objects.values_list("id", flat=True))
+        rate_ids = set(Series.objects.filter(type__in=["Counter", "Derive"]).values_list("id", flat=True))
+        begin, end = datetime(2013, 4, 19, 20, 33, tzinfo=utc), datetime(2013, 4, 19, 20, 34, 30, tzinfo=utc)
+        for maxlen, fixed in [(float("inf"), 0), (2, 0), (float("inf"), 3)]:
+            self.assertEqual(
+                Stats.select_many(ids, begin, end, rate_ids, maxlen, fixed),
+                dict((id, Stats.select(id, begin, end, id in rate_ids, maxlen, fixed)) for id in ids),
+            )
@@ -0,0 +1,140 @@
+import threading
+import time
+
+import mock
+from django.db import IntegrityError
+from django.test import SimpleTestCase
+
+from chroma_core.models import StorageResourceRecord, StorageResourceStatistic
+from chroma_core.services.plugin_runner.resource_manager import PluginSession, ScopeLocks
+from tests.unit.chroma_core.lib.storage_plugin.resource_manager.test_resource_manager import ResourceManagerTestCase
+
+
+def _run_threads(targets, timeout=10):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(timeout)
+
+    return [thread for thread in threads if thread.is_alive()]
+
+
+class TestScopeLocks(SimpleTestCase):
+    def setUp(self):
+        self.locks = ScopeLocks()
+        self.holders = []
+        self.overlaps = []
+
+    def _hold(self, context, name):
+        with context:
+            if self.holders and (name == "exclusive" or "exclusive" in self.holders or name in self.holders):
+                self.overlaps.append((name, list(self.holders)))
+            self.holders.append(name)
+            time.sleep(0.001)
+            self.holders.remove(name)
+
+    def test_exclusion(self):
+        """Operations in the same scope, and exclusive operations, never overlap with any they should not"""
+
+        def scope_op(scope_id):
+            def run():
+                for _ in range(20):
+                    self._hold(self.locks.scope(scope_id), scope_id)
+
+            return run
+
+        def exclusive_op():
+            for _ in range(20):
+                self._hold(self.locks.exclusive(), "exclusive")
+
+        self.assertEqual(_run_threads([scope_op(n % 4) for n in range(16)] + [exclusive_op] * 2), [])
+        self.assertEqual(self.overlaps, [])
+
+    def test_scopes_concurrent(self):
+        """A slow operation in one scope does not hold up operations in another"""
+        entered = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            with self.locks.scope(1):
+                entered.set()
+                release.wait(10)
+
+        def other():
+            with self.locks.scope(2):
+                pass
+
+        thread = threading.Thread(target=slow)
+        thread.start()
+        entered.wait(10)
+        try:
+            self.assertEqual(_run_threads([other], timeout=1), [])
+        finally:
+            release.set()
+            thread.join()
+
+
+class TestResourceManagerConcurrency(ResourceManagerTestCase):
+    SESSIONS = 20
+    CALLS = 5
+    DELAY = 0.01
+
+    def setUp(self):
+        super(TestResourceManagerConcurrency, self).setUp()
+
+        for scannable_id in range(1, self.SESSIONS + 1):
+            session = PluginSession(self.plugin, scannable_id, 10)
+            session.local_id_to_global_id[1] = scannable_id
+            self.resource_manager._sessions[scannable_id] = session
+
+        def get_stats(record_pk, update_data):
+            time.sleep(self.DELAY)
+            return []
+
+        mock.patch.object(self.resource_manager, "_get_stats", side_effect=get_stats).start()
+
+    def test_many_sessions(self):
+        """Stats from many sessions are handled concurrently, interleaved with exclusive operations,
+        without deadlock"""
+
+        def session(scannable_id):
+            def run():
+                for _ in range(self.CALLS):
+                    self.resource_manager.session_get_stats(scannable_id, 1, {})
+                    # The parent is unknown, so this takes the exclusive lock and returns
+                    self.resource_manager.session_resource_add_parent(scannable_id, 1, 2)
+
+            return run
+
+        begin = time.time()
+        self.assertEqual(_run_threads([session(n) for n in range(1, self.SESSIONS + 1)]), [])
+        elapsed = time.time() - begin
+
+        self.assertEqual(self.resource_manager._get_stats.call_count, self.SESSIONS * self.CALLS)
+        # Serially this would take SESSIONS * CALLS * DELAY
+        self.assertLess(elapsed, self.SESSIONS * self.CALLS * self.DELAY / 2)
+
+
+class TestSharedStatistics(ResourceManagerTestCase):
+    def test_concurrent_creation(self):
+        """A statistic created by a session in another scope first is used rather than failing"""
+        record = mock.Mock()
+        record.get_statistic_properties.return_value.sample_period = 10
+        created = mock.Mock()
+        created.sample_period = 10
+        created.update.return_value = ["sample"]
+
+        objects = mock.Mock()
+        objects.get.side_effect = [StorageResourceStatistic.DoesNotExist, created]
+        objects.create.side_effect = IntegrityError
+
+        with mock.patch.object(StorageResourceRecord, "objects"), mock.patch.object(
+            StorageResourceStatistic, "objects", objects
+        ):
+            StorageResourceRecord.objects.get.return_value = record
+            self.assertEqual(self.resource_manager._get_stats(1, {"temperature": []}), ["sample"])
+
+        self.assertEqual(objects.create.call_count, 1)
+        created.update.assert_called_once_with("temperature", record.get_statistic_properties.return_value, [])
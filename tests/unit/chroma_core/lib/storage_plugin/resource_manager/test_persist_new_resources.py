@@ -0,0 +1,111 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from chroma_core.models.storage_plugin import StorageResourceAttributeSerialized, StorageResourceRecord
+from chroma_core.services.plugin_runner.resource_manager import PluginSession
+from tests.unit.chroma_core.lib.storage_plugin.resource_manager.test_resource_manager import ResourceManagerTestCase
+
+
+class TestPersistNewResources(ResourceManagerTestCase):
+    def setUp(self):
+        super(TestPersistNewResources, self).setUp("example_plugin")
+
+        couplet_record, couplet_resource = self._make_global_resource(
+            "example_plugin", "Couplet", {"address_1": "foo", "address_2": "bar"}
+        )
+        self.scannable_id = couplet_record.pk
+        other_record, other_resource = self._make_global_resource(
+            "example_plugin", "Couplet", {"address_1": "baz", "address_2": "qux"}
+        )
+        self.other_scannable_id = other_record.pk
+        self.lun_count = 0
+        self.device_count = 0
+
+    def _resources(self, drive_count, capacity=1024):
+        drives = [
+            self._make_local_resource(
+                "example_plugin", "HardDrive", serial_number="drive%d_%d" % (self.lun_count, n), capacity=capacity
+            )
+            for n in range(drive_count)
+        ]
+        lun = self._make_local_resource(
+            "example_plugin",
+            "Lun",
+            parents=drives,
+            serial="lun%d" % self.lun_count,
+            local_id=self.lun_count,
+            size=capacity * drive_count,
+            name="LUN_%d" % self.lun_count,
+        )
+        self.lun_count += 1
+
+        return drives + [lun]
+
+    def _devices(self, count):
+        devices = [
+            self._make_local_resource("linux", "ScsiDevice", serial="device%d" % (self.device_count + n), size=1024)
+            for n in range(count)
+        ]
+        self.device_count += count
+
+        return devices
+
+    def _persist(self, resources, scannable_id=None):
+        session = PluginSession(self.plugin, scannable_id or self.scannable_id, 60)
+        with CaptureQueriesContext(connection) as queries:
+            self.resource_manager._persist_new_resources(session, resources)
+
+        return session, len(queries)
+
+    def test_constant_queries(self):
+        """Adding many resources costs the same number of queries as adding a few"""
+        session, few_queries = self._persist(self._resources(10))
+        session, many_queries = self._persist(self._resources(1000))
+
+        self.assertEqual(many_queries, few_queries)
+
+        lun_pk = session.local_id_to_global_id[max(session.local_id_to_global_id)]
+        self.assertEqual(StorageResourceRecord.objects.get(pk=lun_pk).parents.count(), 1000)
+
+    def test_existing_resources(self):
+        """Resources which already have records are matched to them, and only their changed attributes updated"""
+        session, queries = self._persist(self._resources(10))
+        record_count = StorageResourceRecord.objects.count()
+        attribute_count = StorageResourceAttributeSerialized.objects.count()
+
+        self.lun_count = 0
+        resources = self._resources(10, capacity=2048)
+        new_session, queries = self._persist(resources)
+
+        self.assertEqual(
+            sorted(new_session.local_id_to_global_id.values()), sorted(session.local_id_to_global_id.values())
+        )
+        self.assertEqual(StorageResourceRecord.objects.count(), record_count)
+        self.assertEqual(StorageResourceAttributeSerialized.objects.count(), attribute_count)
+
+        drive_pk = new_session.local_id_to_global_id[resources[0]._handle]
+        self.assertEqual(StorageResourceRecord.objects.get(pk=drive_pk).to_resource().capacity, 2048)
+
+    def _reported_by(self, scannable_id):
+        return StorageResourceRecord.reported_by.through.objects.filter(to_storageresourcerecord_id=scannable_id)
+
+    def test_reported_by(self):
+        """GlobalId resources record each scannable which reports them, at a constant number of queries"""
+
+        def report_twice(count):
+            devices = self._devices(count)
+            self._persist(devices)
+            # The same devices, seen from another scannable
+            return self._persist(devices, self.other_scannable_id)[1]
+
+        few_queries = report_twice(10)
+        many_queries = report_twice(100)
+        self.assertEqual(many_queries, few_queries)
+
+        self.assertEqual(self._reported_by(self.scannable_id).count(), 110)
+        self.assertEqual(self._reported_by(self.other_scannable_id).count(), 110)
+
+        # Reporting them again adds nothing
+        self.device_count = 0
+        self._persist(self._devices(110), self.other_scannable_id)
+        self.assertEqual(self._reported_by(self.other_scannable_id).count(), 110)
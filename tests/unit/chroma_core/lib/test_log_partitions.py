@@ -0,0 +1,89 @@
+import csv
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from chroma_core.lib import log_partitions
+from chroma_core.models.log import LogMessage, MessageClass
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+DAY = datetime.date(2018, 1, 2)
+
+
+class TestLogPartitions(IMLUnitTestCase):
+    def setUp(self):
+        super(TestLogPartitions, self).setUp()
+
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+
+    def _create(self, day, message="message"):
+        return LogMessage.objects.create(
+            datetime=datetime.datetime.combine(day, datetime.time(12)).replace(tzinfo=timezone.utc),
+            fqdn="myaddress",
+            severity=6,
+            facility=3,
+            tag="kernel",
+            message=message,
+            message_class=MessageClass.NORMAL,
+        )
+
+    def _count(self, table, only=False):
+        cursor = connection.cursor()
+        cursor.execute("SELECT count(*) FROM %s%s" % ("ONLY " if only else "", table))
+        return cursor.fetchone()[0]
+
+    def test_ensure_partitions(self):
+        created = log_partitions.ensure_partitions(DAY, DAY + datetime.timedelta(days=1))
+        self.assertEqual(created, ["chroma_core_logmessage_20180102", "chroma_core_logmessage_20180103"])
+
+        self.assertEqual(
+            log_partitions.ensure_partitions(DAY, DAY + datetime.timedelta(days=2)), ["chroma_core_logmessage_20180104"]
+        )
+        self.assertEqual(
+            [day for name, day in log_partitions.list_partitions()],
+            [DAY + datetime.timedelta(days=n) for n in range(3)],
+        )
+
+    def test_routing(self):
+        """Messages are stored in the partition for their day, or in the parent table when there is none"""
+        log_partitions.ensure_partitions(DAY, DAY)
+
+        routed = self._create(DAY)
+        unrouted = self._create(DAY + datetime.timedelta(days=1))
+
+        self.assertEqual(self._count(log_partitions.partition_name(DAY)), 1)
+        self.assertEqual(self._count(log_partitions.PARENT_TABLE, only=True), 1)
+        self.assertEqual(sorted(LogMessage.objects.values_list("id", flat=True)), sorted([routed.id, unrouted.id]))
+
+    def test_archive_and_drop(self):
+        log_partitions.ensure_partitions(DAY, DAY + datetime.timedelta(days=1))
+        self._create(DAY, "first")
+        self._create(DAY, "second")
+        kept = self._create(DAY + datetime.timedelta(days=1))
+
+        name = log_partitions.partition_name(DAY)
+        archive_path = os.path.join(self.archive_dir, "%s.csv.gz" % name)
+        self.assertEqual(log_partitions.archive_and_drop(name, archive_path), 2)
+
+        self.assertEqual([day for name, day in log_partitions.list_partitions()], [DAY + datetime.timedelta(days=1)])
+        self.assertEqual(list(LogMessage.objects.values_list("id", flat=True)), [kept.id])
+
+        rows = list(csv.DictReader(gzip.open(archive_path)))
+        self.assertEqual(sorted(row["message"] for row in rows), ["first", "second"])
+
+    def test_empty_parent_not_truncated(self):
+        """TRUNCATE blocks readers, so the parent table is left alone when it holds no rows"""
+        archive_path = os.path.join(self.archive_dir, "parent.csv.gz")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(log_partitions.archive_and_drop(log_partitions.PARENT_TABLE, archive_path), 0)
+
+        self.assertFalse([query for query in queries if "TRUNCATE" in query["sql"]])
+        self.assertFalse(os.path.exists(archive_path))
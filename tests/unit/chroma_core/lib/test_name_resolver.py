@@ -0,0 +1,42 @@
+from chroma_core.models import ManagedHost, NetworkInterface, Nid
+from tests.unit.chroma_core.helpers import synthetic_host
+from tests.unit.chroma_core.helpers import load_default_profile
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestNameResolver(IMLUnitTestCase):
+    def setUp(self):
+        super(TestNameResolver, self).setUp()
+        load_default_profile()
+        self.host = synthetic_host("myaddress", nids=[Nid.Nid("192.168.0.1", "tcp", 0)])
+
+    def test_get_by_nid(self):
+        self.assertEqual(ManagedHost.get_by_nid("192.168.0.1@tcp0", cached=True), self.host)
+
+        # Once loaded, lookups are answered from the indexes
+        with self.assertNumQueries(0):
+            self.assertEqual(ManagedHost.get_by_nid("192.168.0.1@tcp0", cached=True), self.host)
+            with self.assertRaises(ManagedHost.DoesNotExist):
+                ManagedHost.get_by_nid("192.168.0.2@tcp0", cached=True)
+
+    def test_invalidated_on_save(self):
+        with self.assertRaises(ManagedHost.DoesNotExist):
+            ManagedHost.get_by_nid("192.168.0.2@tcp0", cached=True)
+
+        other = synthetic_host("otheraddress", nids=[Nid.Nid("192.168.0.2", "tcp", 0)])
+        self.assertEqual(ManagedHost.get_by_nid("192.168.0.2@tcp0", cached=True), other)
+
+        synthetic_host("thirdaddress", nids=[Nid.Nid("192.168.0.2", "tcp", 0)])
+        with self.assertRaises(ManagedHost.MultipleObjectsReturned):
+            ManagedHost.get_by_nid("192.168.0.2@tcp0", cached=True)
+
+    def test_uncached_by_default(self):
+        """Interfaces are written by other processes, whose changes only the database reflects"""
+        self.assertEqual(ManagedHost.get_by_nid("192.168.0.1@tcp0", cached=True), self.host)
+
+        # update() sends no signals, as with a write in another process
+        NetworkInterface.objects.filter(host=self.host).update(inet4_address="192.168.0.2")
+
+        self.assertEqual(ManagedHost.get_by_nid("192.168.0.2@tcp0"), self.host)
+        with self.assertRaises(ManagedHost.DoesNotExist):
+            ManagedHost.get_by_nid("192.168.0.2@tcp0", cached=True)
@@ -1,8 +1,14 @@
+import mock
+
+from tests.unit.chroma_core.helpers import synthetic_host
+from tests.unit.chroma_core.helpers import load_default_profile
 from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
 
 from chroma_core.models import CommandRunningAlert
 from chroma_core.models import CommandCancelledAlert
 from chroma_core.models import AlertState
+from chroma_core.models import HostContactAlert
+from chroma_core.models.alert import active_alert_index
 
 
 class TestAlert(IMLUnitTestCase):
@@ -24,3 +30,67 @@ class TestAlert(IMLUnitTestCase):
         alerts = AlertState.objects.all()
         self.assertEqual(len(alerts), 1)
         self.assertEqual(alerts[0].message(), "Command Houston we have a problem cancelled")
+
+
+class TestActiveAlertIndex(IMLUnitTestCase):
+    def setUp(self):
+        super(TestActiveAlertIndex, self).setUp()
+        load_default_profile()
+        self.host = synthetic_host("myaddress")
+
+        # Each test runs in a transaction, in which the index would not trust its updates
+        mock.patch("chroma_core.models.alert.connection", in_atomic_block=False).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_redundant_notifications_skipped(self):
+        HostContactAlert.notify(self.host, False)
+        alert = HostContactAlert.notify(self.host, True)
+        self.assertEqual(active_alert_index.stats, {"skipped": 1, "executed": 1, "active": 1})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(HostContactAlert.notify(self.host, True), alert)
+        self.assertEqual(active_alert_index.stats["skipped"], 2)
+
+        HostContactAlert.notify(self.host, False)
+        self.assertEqual(HostContactAlert.filter_by_item(self.host).count(), 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(HostContactAlert.notify(self.host, False), None)
+        self.assertEqual(active_alert_index.stats, {"skipped": 3, "executed": 2, "active": 0})
+
+    def test_loaded_from_database(self):
+        HostContactAlert.notify(self.host, True)
+        active_alert_index.clear()
+
+        with self.assertNumQueries(1):
+            HostContactAlert.notify(self.host, True)
+        self.assertEqual(active_alert_index.stats, {"skipped": 1, "executed": 0, "active": 1})
+
+    def test_unknown_after_transaction(self):
+        """An alert raised within a transaction is checked against the database next time"""
+        with mock.patch("chroma_core.models.alert.connection", in_atomic_block=True):
+            HostContactAlert.notify(self.host, True)
+
+        HostContactAlert.notify(self.host, True)
+        self.assertEqual(active_alert_index.stats["executed"], 2)
+        self.assertEqual(HostContactAlert.filter_by_item(self.host).count(), 1)
+
+    def test_deferred(self):
+        """Updates within deferred() are applied when it completes, and dropped if it raises"""
+        with mock.patch("chroma_core.models.alert.connection", in_atomic_block=True):
+            with active_alert_index.deferred():
+                HostContactAlert.notify(self.host, True)
+                HostContactAlert.notify(self.host, True)
+                self.assertEqual(active_alert_index.stats["executed"], 2)
+
+            with self.assertNumQueries(0):
+                HostContactAlert.notify(self.host, True)
+            self.assertEqual(active_alert_index.stats["skipped"], 1)
+
+            with self.assertRaises(RuntimeError):
+                with active_alert_index.deferred():
+                    HostContactAlert.notify(self.host, False)
+                    raise RuntimeError()
+
+            HostContactAlert.notify(self.host, False)
+            self.assertEqual(active_alert_index.stats["executed"], 4)
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+
+import mock
+
+from chroma_core.lib.util import all_subclasses
+from chroma_core.models.jobs import StatefulObject
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+def all_routes(begin_state, transition_options):
+    """Every route without repeated states from begin_state, for comparison with the shortest routes"""
+    routes = []
+
+    def explore(route):
+        for next_state in transition_options.get(route[-1], []):
+            if next_state not in route:
+                routes.append(route + (next_state,))
+                explore(route + (next_state,))
+
+    explore((begin_state,))
+    return routes
+
+
+class TestRouteMaps(IMLUnitTestCase):
+    def setUp(self):
+        super(TestRouteMaps, self).setUp()
+
+        self.roots = [
+            klass
+            for klass in all_subclasses(StatefulObject)
+            if not klass._meta.abstract and StatefulObject.so_root(klass) is klass and klass.states
+        ]
+
+        fd, self.cache_path = tempfile.mkstemp()
+        os.close(fd)
+        os.unlink(self.cache_path)
+        self.addCleanup(lambda: os.path.exists(self.cache_path) and os.unlink(self.cache_path))
+
+    def _reset(self):
+        for klass in self.roots:
+            klass.route_map = klass.transition_map = klass.job_class_map = None
+
+    def test_shortest_routes(self):
+        """Each route is made of StateChangeJobs and is no longer than any other route between its states"""
+        StatefulObject.build_all_maps()
+
+        for klass in self.roots:
+            transition_options, job_class_map = StatefulObject._transition_options(klass)
+            for begin_state in klass.states:
+                shortest = {}
+                for route in all_routes(begin_state, transition_options):
+                    shortest[route[-1]] = min(shortest.get(route[-1], len(route)), len(route))
+
+                self.assertEqual(set(klass.transition_map[begin_state]), set(shortest))
+                for end_state, length in shortest.items():
+                    route = klass.get_route(begin_state, end_state)
+                    self.assertEqual(len(route), length)
+                    self.assertEqual((route[0], route[-1]), (begin_state, end_state))
+                    for step in zip(route, route[1:]):
+                        self.assertIn(step, klass.job_class_map)
+
+    def test_cache_file(self):
+        """Routes are read back from the cache file until the StateChangeJob definitions change"""
+        signature = StatefulObject.build_all_maps(self.cache_path)
+        route_maps = dict((klass, klass.route_map) for klass in self.roots)
+
+        self._reset()
+        with mock.patch.object(StatefulObject, "_shortest_routes") as shortest_routes:
+            self.assertEqual(StatefulObject.build_all_maps(self.cache_path), signature)
+            self.assertFalse(shortest_routes.called)
+        self.assertEqual(dict((klass, klass.route_map) for klass in self.roots), route_maps)
+
+        self._reset()
+        with mock.patch("chroma_core.models.jobs.hashlib.sha1") as sha1:
+            sha1.return_value.hexdigest.return_value = "changed"
+            self.assertEqual(StatefulObject.build_all_maps(self.cache_path), "changed")
+        with open(self.cache_path) as f:
+            self.assertEqual(json.load(f)["signature"], "changed")
+        self.assertEqual(dict((klass, klass.route_map) for klass in self.roots), route_maps)
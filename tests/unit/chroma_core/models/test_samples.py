@@ -1,4 +1,5 @@
 import itertools
+import threading
 import time
 import contextlib
 import operator
@@ -11,7 +12,7 @@ from django.utils.unittest import skipIf
 
 from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
 from chroma_core.models import Point, Stats
-from chroma_core.models.stats import total_seconds
+from chroma_core.models.stats import total_seconds, Cache, PointRing, RateCache
 from chroma_core.lib.util import chroma_settings
 
 
@@ -206,6 +207,78 @@ class TestModels(IMLUnitTestCase):
         for model in Stats:
             self.assertListEqual(list(model.select(id)), [])
 
+    def test_rate_cache(self):
+        Stats.insert((id, point.dt, point.sum) for point in points)
+        for model in Stats:
+            model.cache.clear()
+        hits = Stats.rate_cache.hits
+        for offset in range(0, 60, 7):
+            start = now + timedelta(seconds=Stats[0].step * offset)
+            stop = start + timedelta(minutes=5)
+            selection = Stats.select(id, start, stop, rate=True)
+            with mock.patch.object(Stats, "rate_cache", RateCache(0)):
+                self.assertListEqual(selection, Stats.select(id, start, stop, rate=True))
+        self.assertEqual(Stats.rate_cache.hits - hits, len(range(0, 60, 7)) - 1)
+
+    def test_rate_cache_size(self):
+        "The cache's budget counts the points derived from the selected points."
+        Stats.insert((id, point.dt, point.sum) for point in points)
+        with mock.patch.object(Stats, "rate_cache", RateCache(1000000)):
+            Stats.select(id, now, now + timedelta(minutes=5), rate=True)
+            (window,) = Stats.rate_cache.windows.values()
+        self.assertGreater(window.size, window.selected + len(window.rates))
+
+        cache = RateCache(window.selected)
+        cache.put(id, window)
+        self.assertEqual(cache.stats, {"hits": 0, "misses": 0, "windows": 0, "points": 0})
+
+
+class TestCache(IMLUnitTestCase):
+    "Test the in-memory cache of recent points."
+
+    def test_point_ring(self):
+        ring = PointRing(3)
+        self.assertFalse(ring)
+        ring += points[:5]
+        self.assertEqual(len(ring), 3)
+        self.assertListEqual(list(ring), points[2:5])
+        self.assertEqual((ring[0], ring[-1]), (points[2], points[4]))
+        self.assertListEqual(list(ring.between(points[3].dt, points[4].dt)), [points[3]])
+        self.assertEqual(ring.nbytes, 3 * 24)
+        with self.assertRaises(IndexError):
+            ring[3]
+
+    def test_lru(self):
+        cache = Cache(list)
+        cache.SIZE = 2
+        cache[1], cache[2]
+        cache[1]
+        cache[3]
+        self.assertItemsEqual(cache, [1, 3])
+        cache.pop(1)
+        cache[4]
+        self.assertItemsEqual(cache, [3, 4])
+
+    def test_concurrent_reads(self):
+        cache = Cache(list)
+        cache.SIZE = 10
+        errors = []
+
+        def read():
+            try:
+                for key in itertools.islice(itertools.cycle(range(20)), 10000):
+                    cache[key]
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertListEqual(errors, [])
+        self.assertLessEqual(len(cache), 10)
+
 
 @skipIf(True, "Monster Data Tests Not Normally Run")
 class TestMonsterData(IMLUnitTestCase):
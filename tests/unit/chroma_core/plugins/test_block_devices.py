@@ -0,0 +1,68 @@
+import json
+
+import mock
+
+from chroma_core.plugins import block_devices
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestGetDevices(IMLUnitTestCase):
+    def setUp(self):
+        super(TestGetDevices, self).setUp()
+
+        block_devices._snapshot = None
+        self.addCleanup(setattr, block_devices, "_snapshot", None)
+        self.get = mock.patch("requests.get").start()
+        self.addCleanup(mock.patch.stopall)
+        self._serve({"host0": {"devs": {"8:0": {"path": "/dev/sda"}}}, "host1": {"devs": {}}})
+
+    def _serve(self, content, etag=None, status_code=200):
+        payload = json.dumps(content)
+        self.get.return_value = mock.Mock(
+            status_code=status_code, text=payload, content=payload, headers={"ETag": etag} if etag else {}
+        )
+
+    def test_parsed_once(self):
+        with mock.patch.object(block_devices, "AggregatorSnapshot", wraps=block_devices.AggregatorSnapshot) as parse:
+            self.assertEqual(block_devices.get_devices("host0"), {"devs": {"8:0": {"path": "/dev/sda"}}})
+            self.assertEqual(block_devices.get_devices("host1"), {"devs": {}})
+            self.assertEqual(parse.call_count, 1)
+
+            self._serve({"host0": {"devs": {}}})
+            self.assertEqual(block_devices.get_devices("host0"), {"devs": {}})
+            self.assertEqual(block_devices.get_devices("host1"), {})
+            self.assertEqual(parse.call_count, 2)
+
+    def test_copies(self):
+        """Each caller may modify the devices it is given"""
+        block_devices.get_devices("host0")["devs"]["8:0"]["serial_80"] = None
+        self.assertEqual(block_devices.get_devices("host0"), {"devs": {"8:0": {"path": "/dev/sda"}}})
+
+    def test_not_modified(self):
+        self._serve({"host0": {"devs": {}}}, etag='"1"')
+        block_devices.get_devices("host0")
+
+        self._serve({}, status_code=304)
+        self.assertEqual(block_devices.get_devices("host0"), {"devs": {}})
+        self.assertEqual(self.get.call_args[1]["headers"], {"If-None-Match": '"1"'})
+
+    def test_reused_within_max_age(self):
+        block_devices.get_devices("host0", max_age=60)
+        self._serve({"host0": {"devs": {}}})
+        self.assertEqual(block_devices.get_devices("host0", max_age=60), {"devs": {"8:0": {"path": "/dev/sda"}}})
+        self.assertEqual(self.get.call_count, 1)
+
+        self.assertEqual(block_devices.get_devices("host0"), {"devs": {}})
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_fetched_without_lock(self):
+        """Callers do not wait on one another's requests to the aggregator"""
+        response = self.get.return_value
+
+        def get(url, headers):
+            self.assertTrue(block_devices._snapshot_lock.acquire(False))
+            block_devices._snapshot_lock.release()
+            return response
+
+        self.get.side_effect = get
+        self.assertEqual(block_devices.get_devices("host1"), {"devs": {}})
@@ -224,3 +224,22 @@ class TestAvailableTransitions(IMLUnitTestCase):
         avail_jobs = job_scheduler.available_jobs([(ct_id, host_id)])[composite_id]
         self.assertTrue(self.host.state, "managed")
         self.assertTrue(len(avail_jobs) == 3)  # Three states from configured -> Force Remove. Reboot, Shutdown
+
+    def test_many_objects(self):
+        """Objects are loaded with one query for each content type, and give the same transitions as one by one"""
+        mgs = ManagedMgs.objects.create(volume=self.volume)
+        objects = [self.host, synthetic_host(), synthetic_host(), mgs]
+        object_list = [(ContentType.objects.get_for_model(obj).id, obj.id) for obj in objects]
+        # An object which does not exist
+        object_list.append((object_list[0][0], max(obj.id for obj in objects[:3]) + 1))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.js._load_stateful_objects(object_list)), len(objects))
+
+        transitions = self.js.available_transitions(object_list)
+        for obj_key, obj_id in object_list:
+            composite_id = "{}:{}".format(obj_key, obj_id)
+            self.assertEqual(
+                transitions[composite_id], self.js.available_transitions([(obj_key, obj_id)])[composite_id]
+            )
+        self.assertEqual(transitions["{}:{}".format(*object_list[-1])], [])
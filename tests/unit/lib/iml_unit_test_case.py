@@ -2,7 +2,9 @@ import mock
 
 from django.test import TestCase
 
+from chroma_core.lib.name_resolver import NameResolver
 from chroma_core.models import Command
+from chroma_core.models.alert import active_alert_index
 from chroma_core.services.log import log_register
 
 log = log_register("iml_test_case")
@@ -15,6 +17,9 @@ class IMLUnitTestCase(TestCase):
         mock.patch("chroma_core.services.job_scheduler.job_scheduler.LockQueue.put").start()
         mock.patch("chroma_core.services.dbutils.exit_if_in_transaction").start()
 
+        NameResolver.clear()
+        active_alert_index.clear()
+
     def make_command(self, complete=False, created_at=None, errored=True, message="test"):
 
         """
@@ -0,0 +1,92 @@
+import gzip
+import json
+from cStringIO import StringIO
+
+import mock
+from django.test.client import RequestFactory
+
+from chroma_agent_comms.views import MessageView, ValidatedClientView
+from chroma_core.services.http_agent.queues import HostQueueCollection
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+from tests.utils import patch
+import settings
+
+
+FQDN = "myserver.mycompany.com"
+START_TIME = "2018-01-01T00:00:00+00:00"
+
+
+class TestMessageViewGet(IMLUnitTestCase):
+    """Test that MessageView.get sends queued messages to the agent in bounded batches"""
+
+    def setUp(self):
+        super(TestMessageViewGet, self).setUp()
+
+        self.queues = HostQueueCollection()
+        sessions = mock.Mock()
+        sessions.get.side_effect = KeyError
+        hosts = mock.Mock()
+        hosts.update.return_value = False
+
+        for name, value in [("queues", self.queues), ("sessions", sessions), ("hosts", hosts)]:
+            mock.patch.object(MessageView, name, value).start()
+        mock.patch.object(ValidatedClientView, "valid_certs", {"1": FQDN}, create=True).start()
+        mock.patch.object(MessageView, "LONG_POLL_TIMEOUT", 0).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _get(self, **headers):
+        request = RequestFactory().get(
+            "/agent/message/",
+            {"server_boot_time": START_TIME, "client_start_time": START_TIME},
+            HTTP_X_SSL_CLIENT_SERIAL="1",
+            HTTP_X_SSL_CLIENT_NAME=FQDN,
+            **headers
+        )
+        response = MessageView().get(request)
+        if response.get("Content-Encoding") == "gzip":
+            return json.loads(gzip.GzipFile(fileobj=StringIO(response.content)).read())["messages"]
+        return json.loads(response.content)["messages"]
+
+    def _send(self, count, body=None):
+        for i in range(count):
+            self.queues.send(
+                {
+                    "fqdn": FQDN,
+                    "type": "DATA",
+                    "plugin": "test",
+                    "session_id": None,
+                    "session_seq": i,
+                    "body": body,
+                }
+            )
+
+    def test_empty(self):
+        self.assertEqual(self._get(), [])
+
+    def test_max_messages(self):
+        self._send(5)
+
+        with patch(settings, HTTP_AGENT_TX_MAX_MESSAGES=3):
+            self.assertEqual([m["session_seq"] for m in self._get()], [0, 1, 2])
+            self.assertEqual([m["session_seq"] for m in self._get()], [3, 4])
+
+    def test_max_bytes(self):
+        self._send(3, body="x" * 1000)
+
+        with patch(settings, HTTP_AGENT_TX_MAX_BYTES=2500):
+            self.assertEqual([m["session_seq"] for m in self._get()], [0, 1])
+            self.assertEqual([m["session_seq"] for m in self._get()], [2])
+
+    def test_barrier(self):
+        """Messages after a barrier for a different agent instance are left for that instance"""
+        self.queues.send({"fqdn": FQDN, "type": "TX_BARRIER", "client_start_time": "other"})
+        self._send(1)
+
+        self.assertEqual(self._get(), [])
+        self.assertEqual(self.queues.get(FQDN).tx_len, 1)
+
+    def test_gzip(self):
+        self._send(10, body="x" * 1000)
+
+        with patch(settings, HTTP_AGENT_TX_GZIP_THRESHOLD=1000):
+            self.assertEqual(len(self._get(HTTP_ACCEPT_ENCODING="gzip, deflate")), 10)
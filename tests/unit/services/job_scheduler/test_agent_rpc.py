@@ -0,0 +1,108 @@
+import threading
+import time
+
+import mock
+
+from chroma_core.services.job_scheduler.agent_rpc import AgentRpcMessenger, AgentCancellation, CancelEvent
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+FQDN = "myserver"
+
+
+class TestAgentRpcMessengerWaits(IMLUnitTestCase):
+    """Test that waits for sessions and RPCs are woken by messages and cancellation, not polling"""
+
+    def setUp(self):
+        super(TestAgentRpcMessengerWaits, self).setUp()
+
+        mock.patch("chroma_core.services.job_scheduler.agent_rpc.AgentRxQueue").start()
+        mock.patch("chroma_core.services.job_scheduler.agent_rpc.HttpAgentRpc").start()
+        self.tx_queue = mock.patch("chroma_core.services.job_scheduler.agent_rpc.AgentTxQueue").start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.messenger = AgentRpcMessenger()
+
+    def _in_thread(self, fn, *args):
+        outcome = {}
+
+        def run():
+            try:
+                outcome["result"] = fn(*args)
+            except Exception as e:
+                outcome["exception"] = e
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread, outcome
+
+    def _session_create(self, session_id):
+        self.messenger.on_rx({"type": "SESSION_CREATE", "fqdn": FQDN, "session_id": session_id})
+
+    def _wait_for_request(self):
+        for _ in range(100):
+            if self.tx_queue.return_value.put.called:
+                return self.tx_queue.return_value.put.call_args[0][0]
+            time.sleep(0.01)
+        self.fail("No request sent")
+
+    def test_await_session(self):
+        thread, outcome = self._in_thread(self.messenger.await_session, FQDN, 10)
+        self._session_create("session_1")
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(outcome["result"] > 0)
+
+    def test_await_session_timeout(self):
+        self.assertEqual(self.messenger.await_session(FQDN, 0.1), 0)
+
+    def test_await_restart(self):
+        self._session_create("session_1")
+        thread, outcome = self._in_thread(self.messenger.await_restart, FQDN, 10, "session_1")
+        self._session_create("session_2")
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.messenger.get_session_id(FQDN), "session_2")
+
+    def test_call_complete(self):
+        self._session_create("session_1")
+        thread, outcome = self._in_thread(self.messenger.call, FQDN, "an_action", {}, CancelEvent())
+        request = self._wait_for_request()
+        self.assertEqual(self.messenger.get_stats()[FQDN]["in_flight"], 1)
+
+        self.messenger.on_rx(
+            {
+                "type": "DATA",
+                "fqdn": FQDN,
+                "session_id": "session_1",
+                "body": {
+                    "type": "ACTION_COMPLETE",
+                    "id": request["body"]["id"],
+                    "exception": None,
+                    "result": 42,
+                    "subprocesses": [],
+                },
+            }
+        )
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(outcome["result"][0], 42)
+        stats = self.messenger.get_stats()[FQDN]
+        self.assertEqual((stats["in_flight"], stats["count"]), (0, 1))
+
+    def test_call_cancelled(self):
+        self._session_create("session_1")
+        cancel_event = CancelEvent()
+        thread, outcome = self._in_thread(self.messenger.call, FQDN, "an_action", {}, cancel_event)
+        self._wait_for_request()
+
+        cancel_event.set()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertIsInstance(outcome["exception"], AgentCancellation)
+        self.assertEqual(self.tx_queue.return_value.put.call_args[0][0]["body"]["type"], "ACTION_CANCEL")
+        self.assertEqual(self.messenger.get_stats()[FQDN]["in_flight"], 0)
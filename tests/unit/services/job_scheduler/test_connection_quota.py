@@ -0,0 +1,70 @@
+import mock
+
+from chroma_core.services.job_scheduler.job_scheduler import ConnectionPool, SimpleConnectionQuota
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestConnectionPool(IMLUnitTestCase):
+    """Test that connections given up by steps are validated and reused"""
+
+    def setUp(self):
+        super(TestConnectionPool, self).setUp()
+
+        self.pool = ConnectionPool(2)
+        self.connect = mock.Mock(side_effect=lambda: mock.Mock())
+
+    def _wrapper(self, raw_connection, in_atomic_block=False):
+        return mock.Mock(connection=raw_connection, in_atomic_block=in_atomic_block)
+
+    def test_reuse(self):
+        raw_connection = self.pool.checkout(self.connect)
+        wrapper = self._wrapper(raw_connection)
+
+        self.assertTrue(self.pool.checkin(wrapper))
+        self.assertEqual(wrapper.connection, None)
+        self.assertTrue(raw_connection.rollback.called)
+        self.assertEqual(self.pool.idle, 1)
+
+        self.assertIs(self.pool.checkout(self.connect), raw_connection)
+        self.assertEqual(self.connect.call_count, 1)
+        self.assertEqual((self.pool.created_count, self.pool.reused_count), (1, 1))
+
+    def test_validate_on_checkout(self):
+        broken = mock.Mock()
+        broken.cursor.side_effect = Exception("server closed the connection unexpectedly")
+        self.pool.checkin(self._wrapper(broken))
+
+        raw_connection = self.pool.checkout(self.connect)
+        self.assertIsNot(raw_connection, broken)
+        self.assertTrue(broken.close.called)
+        self.assertEqual(self.pool.discarded_count, 1)
+
+    def test_refused(self):
+        """Connections in a transaction, or beyond the idle limit, are not kept"""
+        self.assertFalse(self.pool.checkin(self._wrapper(mock.Mock(), in_atomic_block=True)))
+
+        for _ in range(2):
+            self.assertTrue(self.pool.checkin(self._wrapper(mock.Mock())))
+        self.assertFalse(self.pool.checkin(self._wrapper(mock.Mock())))
+        self.assertEqual(self.pool.idle, 2)
+
+        self.pool.close()
+        self.assertEqual(self.pool.idle, 0)
+        self.assertEqual(self.pool.discarded_count, 2)
+
+
+class TestSimpleConnectionQuota(IMLUnitTestCase):
+    def test_stats(self):
+        quota = SimpleConnectionQuota(2)
+
+        with mock.patch("chroma_core.services.job_scheduler.job_scheduler._disable_database") as disable_database:
+            quota.acquire()
+            quota.acquire()
+            self.assertEqual(quota.stats["busy"], 2)
+
+            quota.release(None)
+            quota.release(None)
+
+        self.assertEqual(disable_database.call_args[0][0], quota.pool)
+        self.assertEqual(quota.stats["busy"], 0)
+        self.assertEqual(quota.stats["acquired"], 2)
@@ -0,0 +1,79 @@
+import json
+
+import mock
+
+from chroma_core.services.job_scheduler.job_scheduler import JobCollection
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class FakeJob(object):
+    def __init__(self, id, state="pending", wait_for=[]):
+        self.id = id
+        self.state = state
+        self.wait_for_json = json.dumps(wait_for)
+
+
+class TestJobCollection(IMLUnitTestCase):
+    """Test that JobCollection tracks dependencies between jobs as they change state"""
+
+    def setUp(self):
+        super(TestJobCollection, self).setUp()
+
+        mock.patch("chroma_core.services.job_scheduler.job_scheduler.Job.objects").start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.job_collection = JobCollection()
+
+    def _ready_ids(self):
+        return sorted([j.id for j in self.job_collection.ready_jobs])
+
+    def test_no_dependencies(self):
+        self.job_collection.add(FakeJob(1))
+        self.job_collection.add(FakeJob(2))
+
+        self.assertEqual(self._ready_ids(), [1, 2])
+
+    def test_chain(self):
+        jobs = [FakeJob(1), FakeJob(2, wait_for=[1]), FakeJob(3, wait_for=[2])]
+        for job in jobs:
+            self.job_collection.add(job)
+
+        self.assertEqual(self._ready_ids(), [1])
+
+        self.job_collection.update_many([jobs[0]], "tasked")
+        self.assertEqual(self._ready_ids(), [])
+
+        self.job_collection.update(jobs[0], "complete")
+        self.assertEqual(self._ready_ids(), [2])
+
+        self.job_collection.update_many([jobs[1]], "tasked")
+        self.job_collection.update(jobs[1], "complete")
+        self.assertEqual(self._ready_ids(), [3])
+
+    def test_multiple_dependencies(self):
+        jobs = [FakeJob(1), FakeJob(2), FakeJob(3, wait_for=[1, 2])]
+        for job in jobs:
+            self.job_collection.add(job)
+
+        self.job_collection.update(jobs[0], "complete")
+        self.assertEqual(self._ready_ids(), [2])
+
+        self.job_collection.update(jobs[1], "complete")
+        self.assertEqual(self._ready_ids(), [3])
+
+    def test_dependency_already_complete(self):
+        self.job_collection.add(FakeJob(1, state="complete"))
+        self.job_collection.add(FakeJob(2, wait_for=[1]))
+
+        self.assertEqual(self._ready_ids(), [2])
+
+    def test_cancelled_dependent(self):
+        """A pending job which is cancelled is no longer ready when its dependencies complete"""
+        jobs = [FakeJob(1), FakeJob(2, wait_for=[1])]
+        for job in jobs:
+            self.job_collection.add(job)
+
+        self.job_collection.update(jobs[1], "complete", cancelled=True)
+        self.job_collection.update(jobs[0], "complete")
+
+        self.assertEqual(self._ready_ids(), [])
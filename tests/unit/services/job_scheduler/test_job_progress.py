@@ -0,0 +1,59 @@
+import mock
+
+from chroma_core.services.job_scheduler.job_scheduler import JobProgress
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestJobProgressOutput(IMLUnitTestCase):
+    """Test that step log and console output is buffered and written in chunks"""
+
+    def setUp(self):
+        super(TestJobProgressOutput, self).setUp()
+
+        self.step_result = mock.patch("chroma_core.services.job_scheduler.job_scheduler.StepResult").start()
+        self.step_result.return_value.log = ""
+        self.console_chunk = mock.patch("chroma_core.services.job_scheduler.job_scheduler.StepConsoleChunk").start()
+        mock.patch("settings.STEP_OUTPUT_FLUSH_SIZE", 10).start()
+        mock.patch("settings.STEP_OUTPUT_FLUSH_LATENCY", 1000).start()
+        self.time = mock.patch("chroma_core.services.job_scheduler.job_scheduler.time.time", return_value=0).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.job_progress = JobProgress(mock.Mock())
+        self.job_progress._start_step(1, step_index=0, step_count=1)
+        self.result = self.step_result.return_value
+
+    def _chunks(self):
+        return [(call[1]["sequence"], call[1]["content"]) for call in self.console_chunk.objects.create.call_args_list]
+
+    def test_flush_on_completion(self):
+        self.job_progress._log(1, "a")
+        self.job_progress._console(1, "b")
+        self.job_progress._console(1, "c")
+        self.assertEqual(self._chunks(), [])
+
+        self.job_progress._step_success(1, None)
+        self.assertEqual(self.result.log, "a")
+        self.assertEqual(self._chunks(), [(0, "bc")])
+
+    def test_flush_on_size(self):
+        self.job_progress._console(1, "12345")
+        self.job_progress._console(1, "67890")
+        self.assertEqual(self._chunks(), [(0, "1234567890")])
+
+        self.job_progress._console(1, "abc")
+        self.job_progress._step_failure(1, "backtrace")
+        self.assertEqual(self._chunks(), [(0, "1234567890"), (1, "abc")])
+
+    def test_flush_on_time(self):
+        self.job_progress._console(1, "a")
+        self.assertEqual(self.job_progress._buffer_timeout(), 1)
+
+        self.time.return_value = 0.5
+        self.job_progress._flush_expired_output()
+        self.assertEqual(self._chunks(), [])
+        self.assertEqual(self.job_progress._buffer_timeout(), 0.5)
+
+        self.time.return_value = 1
+        self.job_progress._flush_expired_output()
+        self.assertEqual(self._chunks(), [(0, "a")])
+        self.assertEqual(self.job_progress._buffer_timeout(), 1)
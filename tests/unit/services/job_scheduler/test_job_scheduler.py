@@ -2,6 +2,7 @@ import datetime
 
 import mock
 import django.utils.timezone
+from django.contrib.contenttypes.models import ContentType
 
 from chroma_core.lib.cache import ObjectCache
 from chroma_core.models.jobs import SchedulingError, Job
@@ -149,6 +150,32 @@ class TestStateManager(JobTestCaseWithHost):
         job_scheduler_notify.notify(freshen(self.lnet_configuration), now, {"state": "lnet_down"}, ["lnet_up"])
         self.assertEqual(freshen(self.lnet_configuration).state, "lnet_down")
 
+    def test_guarded_notification_chain(self):
+        """A batch of state notifications, each guarded by the state the one before leaves, is applied in full"""
+        self.lnet_configuration = self.assertState(self.lnet_configuration, "lnet_up")
+        content_type = ContentType.objects.get_for_model(self.lnet_configuration).natural_key()
+        now = django.utils.timezone.now()
+
+        self.job_scheduler.notify_many(
+            [
+                (
+                    content_type,
+                    self.lnet_configuration.id,
+                    (now + datetime.timedelta(seconds=10)).isoformat(),
+                    {"state": "lnet_down"},
+                    ["lnet_up"],
+                ),
+                (
+                    content_type,
+                    self.lnet_configuration.id,
+                    (now + datetime.timedelta(seconds=20)).isoformat(),
+                    {"state": "lnet_unloaded"},
+                    ["lnet_down"],
+                ),
+            ]
+        )
+        self.assertEqual(freshen(self.lnet_configuration).state, "lnet_unloaded")
+
     def test_late_notification(self):
         """Test that notifications are droppped when they are older than
         the last change to an objects state"""
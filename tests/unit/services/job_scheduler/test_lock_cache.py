@@ -0,0 +1,59 @@
+import mock
+
+from chroma_core.models import StateLock
+from chroma_core.services.job_scheduler.lock_cache import LockCache
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class FakeJob(object):
+    def __init__(self, id):
+        self.id = id
+
+
+class TestLockCache(IMLUnitTestCase):
+    def setUp(self):
+        super(TestLockCache, self).setUp()
+
+        mock.patch.object(LockCache, "lock_change_receivers", []).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.lock_cache = LockCache()
+        self.item = object()
+        self.jobs = [FakeJob(id) for id in range(1, 6)]
+
+    def _lock(self, job, write, item=None):
+        lock = StateLock(job=job, locked_item=item or self.item, write=write)
+        self.lock_cache.add(lock)
+        return lock
+
+    def test_latest_write(self):
+        self.assertEqual(self.lock_cache.get_latest_write(self.item), None)
+
+        # Added out of job order
+        locks = [self._lock(self.jobs[i], True) for i in [1, 0, 3, 2]]
+
+        self.assertIs(self.lock_cache.get_latest_write(self.item), locks[2])
+        self.assertIs(self.lock_cache.get_latest_write(self.item, not_job=self.jobs[3]), locks[3])
+        self.assertIs(self.lock_cache.get_write_by_locked_item()[self.item], locks[2])
+
+    def test_read_locks_after(self):
+        locks = [self._lock(job, False) for job in self.jobs]
+
+        self.assertEqual(self.lock_cache.get_read_locks(self.item, after=3, not_job=None), locks[2:])
+        self.assertEqual(self.lock_cache.get_read_locks(self.item, after=3, not_job=self.jobs[3]), [locks[2], locks[4]])
+        self.assertEqual(self.lock_cache.get_read_locks(object(), after=0, not_job=None), [])
+
+    def test_remove_job(self):
+        other_item = object()
+        write_lock = self._lock(self.jobs[0], True)
+        self._lock(self.jobs[1], True)
+        self._lock(self.jobs[1], False, other_item)
+
+        self.assertEqual(self.lock_cache.remove_job(self.jobs[1]), 2)
+
+        self.assertIs(self.lock_cache.get_latest_write(self.item), write_lock)
+        self.assertEqual(list(self.lock_cache.get_by_locked_item(self.item)), [write_lock])
+        self.assertFalse(self.lock_cache.get_by_locked_item(other_item))
+        self.assertFalse(self.lock_cache.get_by_job(self.jobs[1]))
+        self.assertEqual(self.lock_cache.write_locks, [write_lock])
+        self.assertEqual(self.lock_cache.read_locks, [])
@@ -0,0 +1,88 @@
+import mock
+
+from chroma_core.services.job_scheduler import QueueHandler
+from chroma_core.services.job_scheduler.job_scheduler import coalesce_notifications
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+HOST_KEY = ["chroma_core", "managedhost"]
+TARGET_KEY = ["chroma_core", "managedtarget"]
+
+
+class TestCoalesceNotifications(IMLUnitTestCase):
+    def test_latest_per_attribute_set(self):
+        """Only the latest unguarded notification for each object and set of attributes is kept"""
+        notifications = [
+            (HOST_KEY, 1, 1, {"needs_update": False}, []),
+            (HOST_KEY, 1, 2, {"boot_time": 2}, []),
+            (HOST_KEY, 1, 3, {"needs_update": True}, []),
+            (HOST_KEY, 2, 4, {"needs_update": False}, []),
+            (TARGET_KEY, 1, 5, {"active_mount_id": 1}, []),
+        ]
+
+        self.assertEqual(
+            coalesce_notifications(notifications),
+            [
+                (HOST_KEY, 1, 2, {"boot_time": 2}, []),
+                (HOST_KEY, 1, 3, {"needs_update": True}, []),
+                (HOST_KEY, 2, 4, {"needs_update": False}, []),
+                (TARGET_KEY, 1, 5, {"active_mount_id": 1}, []),
+            ],
+        )
+
+    def test_state_changes_kept(self):
+        """State changes and guarded notifications are all kept in order, and trimming does not cross them"""
+        notifications = [
+            (HOST_KEY, 1, 1, {"needs_update": False}, []),
+            (HOST_KEY, 1, 2, {"state": "a"}, ["s0"]),
+            (HOST_KEY, 1, 3, {"needs_update": True}, []),
+            (HOST_KEY, 1, 4, {"state": "b"}, ["a"]),
+            (TARGET_KEY, 1, 5, {"active_mount_id": 1}, ["mounted"]),
+            (TARGET_KEY, 1, 6, {"active_mount_id": 2}, ["mounted"]),
+            (HOST_KEY, 1, 7, {"state": "c"}, []),
+        ]
+
+        self.assertEqual(
+            coalesce_notifications(notifications),
+            [
+                (HOST_KEY, 1, 1, {"needs_update": False}, []),
+                (HOST_KEY, 1, 2, {"state": "a"}, ["s0"]),
+                (HOST_KEY, 1, 3, {"needs_update": True}, []),
+                (HOST_KEY, 1, 4, {"state": "b"}, ["a"]),
+                (HOST_KEY, 1, 7, {"state": "c"}, []),
+                (TARGET_KEY, 1, 5, {"active_mount_id": 1}, ["mounted"]),
+                (TARGET_KEY, 1, 6, {"active_mount_id": 2}, ["mounted"]),
+            ],
+        )
+
+
+class TestQueueHandlerBatch(IMLUnitTestCase):
+    def setUp(self):
+        super(TestQueueHandlerBatch, self).setUp()
+
+        mock.patch("chroma_core.services.job_scheduler.job_scheduler_notify.NotificationQueue").start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.job_scheduler = mock.Mock()
+        self.job_scheduler.notify_many.return_value = 1
+        self.queue_handler = QueueHandler(self.job_scheduler)
+
+    def _message(self, state):
+        return {
+            "instance_natural_key": HOST_KEY,
+            "instance_id": 1,
+            "time": "2018-01-01T00:00:00+00:00",
+            "update_attrs": {"state": state},
+            "from_states": [],
+        }
+
+    def test_one_call_per_batch(self):
+        self.queue_handler.on_messages([self._message("lnet_up"), self._message("lnet_down")])
+
+        self.assertEqual(self.job_scheduler.notify_many.call_count, 1)
+        self.assertEqual(self.job_scheduler.notify.call_count, 0)
+        self.assertEqual(len(self.job_scheduler.notify_many.call_args[0][0]), 2)
+
+        self.assertEqual(self.queue_handler.batch_count, 1)
+        self.assertEqual(self.queue_handler.message_count, 2)
+        self.assertEqual(self.queue_handler.applied_count, 1)
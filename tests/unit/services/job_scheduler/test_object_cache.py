@@ -0,0 +1,44 @@
+from chroma_core.lib.cache import ObjectCache
+from chroma_core.models import ManagedTarget, ManagedTargetMount
+from tests.unit.services.job_scheduler.job_test_case import JobTestCaseWithHost
+
+
+class TestObjectCacheIndexes(JobTestCaseWithHost):
+    """Test that ObjectCache lookups are answered from its secondary indexes"""
+
+    def setUp(self):
+        super(TestObjectCacheIndexes, self).setUp()
+
+        self.create_simple_filesystem(self.host, start=False)
+
+    def test_filesystem_targets(self):
+        targets = ObjectCache.get_targets_by_filesystem(self.fs.id)
+
+        self.assertEqual([t.id for t in targets], [self.mgt.id, self.mdt.id, self.ost.id])
+        self.assertEqual([t.id for t in ObjectCache.fs_targets(self.fs.id)], [self.mdt.id, self.ost.id])
+
+    def test_host_targets(self):
+        with self.assertNumQueries(0):
+            targets = ObjectCache.host_targets(self.host.id)
+
+        self.assertEqual(set([t.id for t in targets]), set([self.mgt.id, self.mdt.id, self.ost.id]))
+        self.assertEqual(ObjectCache.host_targets(-1), [])
+
+    def test_target_primary_server(self):
+        self.assertEqual(ObjectCache.target_primary_server(self.ost).id, self.host.id)
+
+    def test_purge(self):
+        ObjectCache.purge(ManagedTarget, lambda t: t.id == self.ost.id)
+        ObjectCache.purge(ManagedTargetMount, lambda mtm: mtm.target_id == self.ost.id)
+
+        self.assertEqual([t.id for t in ObjectCache.fs_targets(self.fs.id)], [self.mdt.id])
+        self.assertEqual(set([t.id for t in ObjectCache.host_targets(self.host.id)]), set([self.mgt.id, self.mdt.id]))
+
+    def test_stats(self):
+        ObjectCache.host_targets(self.host.id)
+        ObjectCache.host_targets(-1)
+
+        stats = ObjectCache.stats()["indexes"]["host_target_mounts"]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 3)
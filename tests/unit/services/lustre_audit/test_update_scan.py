@@ -0,0 +1,131 @@
+import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from chroma_core.models import ManagedFilesystem, ManagedMgs, ManagedOst, ManagedTargetMount
+from chroma_core.services.lustre_audit.topology import TopologySnapshot
+from chroma_core.services.lustre_audit.update_scan import UpdateScan, target_mount_states
+from tests.unit.chroma_core.helpers import synthetic_host, synthetic_volume_full
+from tests.unit.chroma_core.helpers import load_default_profile
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class UpdateScanTestCase(IMLUnitTestCase):
+    def setUp(self):
+        super(UpdateScanTestCase, self).setUp()
+
+        mock.patch("chroma_core.services.job_scheduler.job_scheduler_notify.notify").start()
+        mock.patch("chroma_core.services.lustre_audit.update_scan.StatsQueue").start()
+        self.addCleanup(mock.patch.stopall)
+
+        load_default_profile()
+        mgs_host = synthetic_host("mgs")
+        self.mgs = self._create_target(ManagedMgs, mgs_host, name="MGS")
+        self.fs = ManagedFilesystem.objects.create(mgs=self.mgs, name="testfs")
+        self.ost_index = 0
+
+    def _create_target(self, klass, host, **kwargs):
+        volume = synthetic_volume_full(host)
+        target = klass.objects.create(volume=volume, state="mounted", **kwargs)
+        target.ha_label = "%s_%s" % (target.name, target.id)
+        target.uuid = "uuid_%s" % target.id
+        target.active_mount = ManagedTargetMount.objects.create(
+            host=host, target=target, volume_node=volume.volumenode_set.get(), primary=True
+        )
+        target.save()
+
+        return target
+
+    def _create_oss(self, address, target_count):
+        host = synthetic_host(address)
+        targets = []
+        for _ in range(target_count):
+            targets.append(
+                self._create_target(
+                    ManagedOst,
+                    host,
+                    filesystem=self.fs,
+                    index=self.ost_index,
+                    name="testfs-OST%04x" % self.ost_index,
+                )
+            )
+            self.ost_index += 1
+
+        return host, targets
+
+    def _host_data(self, host, targets):
+        return {
+            "started_at": "2018-01-01T00:00:00+00:00",
+            "mounts": None,
+            "resource_locations": dict((target.ha_label, host.nodename) for target in targets),
+            "metrics": {"raw": {"lustre": {"target": dict((target.name, {"filesfree": 1}) for target in targets)}}},
+        }
+
+
+class TestUpdateScanQueries(UpdateScanTestCase):
+    def _audit_queries(self, host, targets):
+        UpdateScan().run(host.id, self._host_data(host, targets))
+
+        with CaptureQueriesContext(connection) as queries:
+            UpdateScan().run(host.id, self._host_data(host, targets))
+
+        return len(queries)
+
+    def test_constant_queries(self):
+        """A steady state audit costs the same number of queries however many targets the host has"""
+        small_host, small_targets = self._create_oss("oss1", 1)
+        large_host, large_targets = self._create_oss("oss2", 20)
+
+        self.assertEqual(self._audit_queries(large_host, large_targets), self._audit_queries(small_host, small_targets))
+
+    def test_rebuilt_on_change(self):
+        host, targets = self._create_oss("oss1", 1)
+        snapshot = TopologySnapshot.current()
+        self.assertEqual(TopologySnapshot.current(), snapshot)
+
+        self._create_oss("oss2", 1)
+        self.assertNotEqual(TopologySnapshot.current(), snapshot)
+        self.assertEqual(len(TopologySnapshot.current().targets), 3)
+
+
+class TestUpdateTargetMounts(UpdateScanTestCase):
+    def setUp(self):
+        super(TestUpdateTargetMounts, self).setUp()
+
+        target_mount_states.clear()
+        self.alert_notify = mock.patch(
+            "chroma_core.services.lustre_audit.update_scan.TargetRecoveryAlert.notify"
+        ).start()
+        self.host, self.targets = self._create_oss("oss1", 2)
+
+    def _audit(self, recovery_status={}):
+        UpdateScan().run(
+            self.host.id,
+            {
+                "started_at": "2018-01-01T00:00:00+00:00",
+                "mounts": [{"fs_uuid": target.uuid, "recovery_status": recovery_status} for target in self.targets],
+                "resource_locations": None,
+                "metrics": {"raw": {}},
+            },
+        )
+
+    def test_unchanged_mounts_skipped(self):
+        self._audit()
+        self.assertEqual(target_mount_states.stats(), {"applied": 2, "skipped": 0})
+        self.assertEqual(self.alert_notify.call_count, 2)
+
+        self._audit()
+        self.assertEqual(target_mount_states.stats(), {"applied": 2, "skipped": 2})
+        self.assertEqual(self.alert_notify.call_count, 2)
+
+        self._audit({"status": "RECOVERING"})
+        self.assertEqual(target_mount_states.stats(), {"applied": 4, "skipped": 2})
+        self.assertEqual(self.alert_notify.call_args[0][1], True)
+
+    def test_periodic_reconcile(self):
+        with mock.patch("settings.LUSTRE_AUDIT_RECONCILE_CYCLES", 2):
+            for _ in range(4):
+                self._audit()
+
+        self.assertEqual(target_mount_states.stats(), {"applied": 4, "skipped": 4})
@@ -0,0 +1,71 @@
+from chroma_core.models.event import ClientConnectEvent
+from chroma_core.models.log import LogMessage, MessageClass
+from chroma_core.services.syslog import ingest_log_lines
+from chroma_core.services.syslog.parser import (
+    LogMessageParser,
+    EventBatch,
+    client_connection_handler,
+    server_security_flavor_handler,
+    port_used_handler,
+)
+from tests.unit.chroma_core.helpers import synthetic_host
+from tests.unit.chroma_core.helpers import load_default_profile
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+CONNECT = " Lustre: 5629:0:(ldlm_lib.c:877:target_handle_connect()) lustre-MDT0000: connection from 26959b68-1208-1fca-1f07-da2dc872c55f@192.168.122.218@tcp t0 exp 0000000000000000 cur 1317994929 last 0"
+FLAVOR = " Lustre: 5629:0:(sec.c:1474:sptlrpc_import_sec_adapt()) import lustre-MDT0000->NET_0x20000c0a87ada_UUID netid 20000: select flavor null"
+PORT_USED = "[1234.5] LustreError: 122-1: Can't start acceptor on port 988: port already in use"
+
+
+class TestLogMessageParser(IMLUnitTestCase):
+    def setUp(self):
+        super(TestLogMessageParser, self).setUp()
+        load_default_profile()
+        self.host = synthetic_host("myaddress")
+        self.parser = LogMessageParser()
+
+    def _log_line(self, message):
+        return {
+            "message": message,
+            "severity": 6,
+            "facility": 0,
+            "source": "kernel",
+            "datetime": "2018-01-01T00:00:00.000000+00:00",
+        }
+
+    def test_classify(self):
+        """One scan gives the same class as LogMessage.get_message_class, and the handler"""
+        for message, handler in [
+            (CONNECT, client_connection_handler),
+            (FLAVOR, server_security_flavor_handler),
+            (PORT_USED, port_used_handler),
+            ("LustreError: something went wrong", None),
+            ("kernel: eth0 link up", None),
+        ]:
+            self.assertEqual(self.parser.classify(message), (LogMessage.get_message_class(message), handler))
+
+        self.assertEqual(self.parser.classify(PORT_USED)[0], MessageClass.LUSTRE_ERROR)
+
+    def test_event_batch(self):
+        """Events are held until flushed, and can be correlated while held"""
+        events = EventBatch()
+        client_connection_handler(CONNECT, self.host, events)
+        server_security_flavor_handler(FLAVOR, self.host, events)
+        self.assertEqual(ClientConnectEvent.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            events.flush()
+
+        event = ClientConnectEvent.objects.get()
+        self.assertEqual(event.lustre_pid, 5629)
+        self.assertEqual(event.active, None)
+        self.assertEqual(event.begin, event.end)
+        self.assertTrue(event.message().endswith("with security flavor null"))
+
+    def test_ingest(self):
+        log_lines = [self._log_line(message) for message in [CONNECT, FLAVOR, PORT_USED, "kernel: eth0 link up"]]
+
+        self.assertEqual(ingest_log_lines(self.parser, self.host.fqdn, log_lines), 4)
+        self.assertEqual(LogMessage.objects.filter(message_class=MessageClass.LUSTRE).count(), 2)
+        self.assertEqual(LogMessage.objects.filter(message_class=MessageClass.LUSTRE_ERROR).count(), 1)
+        self.assertEqual(ClientConnectEvent.objects.count(), 1)
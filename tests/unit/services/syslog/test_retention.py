@@ -0,0 +1,42 @@
+import datetime
+
+import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from chroma_core.services.syslog import Service
+from iml_common.lib.date_time import IMLDateTime
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestRetention(IMLUnitTestCase):
+    def setUp(self):
+        super(TestRetention, self).setUp()
+
+        mock.patch("chroma_core.services.syslog.AgentRxQueue").start()
+        mock.patch("settings.DBLOG_HW", 20).start()
+        mock.patch("settings.DBLOG_LW", 10).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.service = Service()
+        self.service.log = mock.Mock()
+        self.service._ensure_partitions()
+
+    def _retention_queries(self, table_size):
+        self.service._table_size = table_size
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.service._apply_retention(), 0)
+        return len(queries)
+
+    def test_today_over_limit(self):
+        """When today's messages alone exceed DBLOG_HW, retention is not retried for every batch"""
+        self.assertTrue(self._retention_queries(25))
+        self.assertEqual(self.service.log.warning.call_count, 1)
+
+        self.assertEqual(self._retention_queries(34), 0)
+        self.assertTrue(self._retention_queries(36))
+
+        self.service._retention_day = IMLDateTime.utcnow().date() - datetime.timedelta(days=1)
+        self.assertTrue(self._retention_queries(37))
+        self.assertEqual(self.service.log.warning.call_count, 3)
+
@@ -10,7 +10,9 @@ from chroma_core.models import StonithNotEnabledAlert
 from chroma_core.models import CorosyncConfiguration
 from chroma_core.services.job_scheduler import job_scheduler_notify
 from chroma_core.models import PacemakerConfiguration
+from chroma_core.models.alert import active_alert_index
 from chroma_core.services.corosync import Service as CorosyncService
+from iml_common.lib.date_time import IMLDateTime
 
 log = logging.getLogger(__name__)
 
@@ -345,3 +347,96 @@ class CorosyncTests(CorosyncTestCase):
 
         alerts_raised = StonithNotEnabledAlert.objects.count()
         self.assertEqual(alerts_raised, 1)
+
+
+class CorosyncReportDeduplicationTests(CorosyncTestCase):
+    """Test that reports identical to the last one processed from a host are skipped"""
+
+    def setUp(self):
+        super(CorosyncReportDeduplicationTests, self).setUp()
+
+        self.node1 = self.make_managed_host("node1")
+        self.node2 = self.make_managed_host("node2")
+
+    def test_identical_report_skipped(self):
+        nodes = ((self.node1, ONLINE), (self.node2, OFFLINE))
+        self.corosync_service.on_data(self.node1.fqdn, self.get_test_message("2013-01-11T19:04:07+00:00", nodes))
+        job_scheduler_notify.notify.reset_mock()
+
+        with self.assertNumQueries(0):
+            self.corosync_service.on_data(self.node1.fqdn, self.get_test_message("2013-01-11T19:04:08+00:00", nodes))
+
+        self.assertEqual(job_scheduler_notify.notify.call_count, 0)
+        self.assertEqual((self.corosync_service.processed_count, self.corosync_service.skipped_count), (1, 1))
+
+        # The skipped report still counts as the latest status of the peers
+        self.assertEqual(
+            self.corosync_service._host_status[self.node2.nodename].datetime,
+            IMLDateTime.parse("2013-01-11T19:04:08+00:00"),
+        )
+
+    def test_changed_report_processed(self):
+        self.corosync_service.on_data(
+            self.node1.fqdn,
+            self.get_test_message("2013-01-11T19:04:07+00:00", ((self.node1, ONLINE), (self.node2, ONLINE))),
+        )
+        self.corosync_service.on_data(
+            self.node1.fqdn,
+            self.get_test_message("2013-01-11T19:04:08+00:00", ((self.node1, ONLINE), (self.node2, OFFLINE))),
+        )
+
+        self.assertEqual((self.corosync_service.processed_count, self.corosync_service.skipped_count), (2, 0))
+        self.assertEqual(HostOfflineAlert.objects.filter(active=True).count(), 1)
+
+    def test_peer_report_invalidates(self):
+        """A changed report from a peer means the next report from the host is processed, identical or not"""
+        nodes = ((self.node1, ONLINE), (self.node2, ONLINE))
+        self.corosync_service.on_data(self.node1.fqdn, self.get_test_message("2013-01-11T19:04:07+00:00", nodes))
+        self.corosync_service.on_data(
+            self.node2.fqdn,
+            self.get_test_message("2013-01-11T19:04:08+00:00", ((self.node1, OFFLINE), (self.node2, ONLINE))),
+        )
+        self.corosync_service.on_data(self.node1.fqdn, self.get_test_message("2013-01-11T19:04:09+00:00", nodes))
+
+        self.assertEqual((self.corosync_service.processed_count, self.corosync_service.skipped_count), (3, 0))
+
+    def test_alternating_peers_skipped(self):
+        """Peers which keep reporting the same view of the cluster have their reports skipped"""
+        nodes = ((self.node1, ONLINE), (self.node2, ONLINE))
+        for second in range(6):
+            node = [self.node1, self.node2][second % 2]
+            self.corosync_service.on_data(
+                node.fqdn, self.get_test_message("2013-01-11T19:04:%02d+00:00" % second, nodes)
+            )
+
+        # node2's first report is new, so node1's next is processed, after which both are skipped
+        self.assertEqual((self.corosync_service.processed_count, self.corosync_service.skipped_count), (3, 3))
+
+    def test_refresh_interval(self):
+        nodes = ((self.node1, ONLINE), (self.node2, ONLINE))
+        self.corosync_service.on_data(self.node1.fqdn, self.get_test_message("2013-01-11T19:04:07+00:00", nodes))
+
+        with mock.patch("settings.COROSYNC_REPORT_REFRESH_INTERVAL", 0):
+            self.corosync_service.on_data(self.node1.fqdn, self.get_test_message("2013-01-11T19:04:08+00:00", nodes))
+
+        self.assertEqual((self.corosync_service.processed_count, self.corosync_service.skipped_count), (2, 0))
+
+    def test_processed_report_alerts_indexed(self):
+        """The alerts notified within a processed report's transaction are indexed once it commits"""
+        nodes = ((self.node1, ONLINE), (self.node2, OFFLINE))
+
+        with mock.patch("settings.COROSYNC_REPORT_REFRESH_INTERVAL", 0):
+            self.corosync_service.on_data(
+                self.node1.fqdn, self.get_test_message("2013-01-11T19:04:07+00:00", nodes, stonith_enabled=False)
+            )
+            executed = active_alert_index.stats["executed"]
+
+            self.corosync_service.on_data(
+                self.node1.fqdn, self.get_test_message("2013-01-11T19:04:08+00:00", nodes, stonith_enabled=False)
+            )
+
+        self.assertEqual((self.corosync_service.processed_count, self.corosync_service.skipped_count), (2, 0))
+        self.assertEqual(active_alert_index.stats["executed"], executed)
+        self.assertGreater(active_alert_index.stats["skipped"], 0)
+        self.assertEqual(HostOfflineAlert.objects.filter(active=True).count(), 1)
+        self.assertEqual(StonithNotEnabledAlert.objects.filter(active=True).count(), 1)
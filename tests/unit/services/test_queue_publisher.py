@@ -0,0 +1,51 @@
+import mock
+from kombu import BrokerConnection
+
+from chroma_core.services.queue import QueuePublisher
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestQueuePublisher(IMLUnitTestCase):
+    def setUp(self):
+        super(TestQueuePublisher, self).setUp()
+
+        # One in-memory broker shared by the publisher and the test's consumer
+        self.connection = BrokerConnection("memory://")
+        mock.patch(
+            "chroma_core.services.queue._amqp_connection", side_effect=lambda: BrokerConnection("memory://")
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _received(self, name):
+        queue = self.connection.SimpleQueue(
+            name, serializer="json", exchange_opts={"durable": False}, queue_opts={"durable": False}
+        )
+        received = []
+        while queue.qsize():
+            message = queue.get(block=False)
+            message.ack()
+            received.append(message.payload)
+        return received
+
+    def test_put(self):
+        """Messages are delivered in order as SimpleQueue.put would deliver them"""
+        publisher = QueuePublisher()
+        publisher.put("test_a", {"seq": 1})
+        publisher.put("test_b", {"seq": 2})
+        publisher.put("test_a", {"seq": 3})
+
+        self.assertEqual(self._received("test_a"), [{"seq": 1}, {"seq": 3}])
+        self.assertEqual(self._received("test_b"), [{"seq": 2}])
+        self.assertEqual(publisher.published_count, 3)
+
+    def test_batch_window(self):
+        """Messages are held until the batch window ends, then published together"""
+        publisher = QueuePublisher(batch_window=60)
+        publisher.put("test_c", {"seq": 1})
+        publisher.put("test_c", {"seq": 2})
+
+        self.assertEqual(publisher.published_count, 0)
+
+        publisher.flush()
+        self.assertEqual(self._received("test_c"), [{"seq": 1}, {"seq": 2}])
+        self.assertEqual(publisher.flush_count, 1)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import mock
+from django.utils.timezone import utc
+
+from chroma_core.models import Point, Stats
+from chroma_core.services.stats import Service
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestStatsService(IMLUnitTestCase):
+    def setUp(self):
+        super(TestStatsService, self).setUp()
+
+        for model in Stats:
+            model.cache.clear()
+        self.service = Service()
+
+    def _message(self, id, *seconds):
+        start = datetime(2018, 1, 1, tzinfo=utc)
+        return [(id, str(start + timedelta(seconds=s)), float(s)) for s in seconds]
+
+    def test_insert_many(self):
+        """Samples from several messages are written in one flush, repeated samples are outdated"""
+        self.service.insert_many([self._message(1, 0, 10), self._message(2, 0), self._message(1, 10, 20)])
+
+        self.assertEqual(self.service.flush_count, 1)
+        self.assertEqual(self.service.sample_count, 4)
+        self.assertEqual(self.service.outdated_count, 1)
+        self.assertEqual([point.sum for point in Stats[0].select(1)], [0.0, 10.0, 20.0])
+        self.assertEqual(list(Stats[0].select(2)), [Point(datetime(2018, 1, 1, tzinfo=utc), 0.0, 1)])
+
+    def test_insert_error(self):
+        """Samples of a failed flush are counted as dropped"""
+        with mock.patch("chroma_core.services.stats.Stats.insert", side_effect=RuntimeError):
+            self.service.insert_many([self._message(1, 0, 10)])
+
+        self.assertEqual(self.service.flush_count, 0)
+        self.assertEqual(self.service.dropped_count, 2)
+
+    def test_bad_message(self):
+        """A message which cannot be parsed is dropped, and the rest of the batch written"""
+        self.service.insert_many([self._message(1, 0), [(2, "2018-01-01")], self._message(3, 0)])
+
+        self.assertEqual(self.service.bad_message_count, 1)
+        self.assertEqual((self.service.flush_count, self.service.sample_count), (1, 2))
+
+    def test_insert_error_retried(self):
+        """A failed flush is retried one message at a time, dropping only the messages which fail"""
+        insert = Stats.insert
+
+        def fail_series_2(samples):
+            if any(id == 2 for id, dt, value in samples):
+                raise RuntimeError()
+            return insert(samples)
+
+        with mock.patch("chroma_core.services.stats.Stats.insert", side_effect=fail_series_2):
+            self.service.insert_many([self._message(1, 0, 10), self._message(2, 0), self._message(3, 0)])
+
+        self.assertEqual((self.service.flush_count, self.service.sample_count), (2, 3))
+        self.assertEqual(self.service.dropped_count, 1)
+        self.assertEqual(len(list(Stats[0].select(3))), 1)